@@ -0,0 +1,227 @@
+"""
+Drives concurrent /book and /cancel traffic through the application and checks the booking invariants afterwards.
+
+The application runs in process behind httpx's ASGI transport, against the database of DATABASE_URL: a local
+PostgreSQL database, or a SQLite file as a stand-in. Every contention level seeds its own members and items, named
+after the run, then spreads the traffic over that many items. The results are written as JSON, one document per run,
+and the exit status is 1 when an invariant does not hold:
+    DATABASE_URL=postgresql://... SECRET_KEY=... python -m benchmarks.booking_load_benchmark \\
+        --members 1000 --items 100 --contention 1,10,100 --output booking_load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import func, select
+
+from configuration.config import DATABASE_URL, MAX_BOOKINGS
+from configuration.database_config import engine
+from main import app
+from models.db_bookings import DbBooking
+from models.db_holds import DbHold
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from services.booking_service import BookingService
+
+PASSWORD = "benchmark1"
+
+
+def percentile(durations: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted durations, in milliseconds."""
+    if not durations:
+        return 0.0
+    return round(durations[max(int(len(durations) * fraction + 0.5) - 1, 0)] * 1000, 3)
+
+
+def latency_summary(durations: List[float]) -> Dict:
+    durations = sorted(durations)
+    return {"count": len(durations), "p50_ms": percentile(durations, 0.5), "p95_ms": percentile(durations, 0.95),
+            "p99_ms": percentile(durations, 0.99), "max_ms": percentile(durations, 1.0)}
+
+
+def lock_wait_delta(before, after) -> Dict:
+    """The booking lock waits observed between two BookingService.lock_wait readings, with bucket bounds in ms."""
+    (buckets_before, total_before, count_before), (buckets_after, total_after, count_after) = before, after
+    count = count_after - count_before
+    buckets = [(bound, cumulative - previous)
+               for (bound, cumulative), (_, previous) in zip(buckets_after, buckets_before)]
+
+    def upper_bound(fraction: float):
+        for bound, cumulative in buckets:
+            if cumulative >= count * fraction:
+                return None if bound == float("inf") else bound * 1000
+        return None
+
+    return {"count": count, "mean_ms": round((total_after - total_before) / count * 1000, 3) if count else 0.0,
+            "p50_upper_bound_ms": upper_bound(0.5), "p99_upper_bound_ms": upper_bound(0.99)}
+
+
+async def authenticate(client: httpx.AsyncClient, username: str) -> Dict:
+    await client.post("/create", json={"username": username, "password": PASSWORD, "fullname": username,
+                                       "email": username + "@benchmark.local"})
+    response = await client.post("/login", data={"username": username, "password": PASSWORD})
+    return {"Authorization": "Bearer " + response.json()["data"]["access_token"]}
+
+
+async def seed(client: httpx.AsyncClient, headers: Dict, prefix: str, members: int, items: int, stock: int):
+    members_csv = "name,surname,booking_count,date_joined\n" + \
+                  "".join(f"{prefix}-m{index},Benchmark,0,2024-01-01T10:00:00\n" for index in range(members))
+    items_csv = "title,description,remaining_count,expiration_date\n" + \
+                "".join(f"{prefix}-i{index},benchmark item,{stock},01/01/2099\n" for index in range(items))
+    for path, content in (("/upload-members?bulk_update=true", members_csv),
+                          ("/upload-inventories?bulk_update=true", items_csv)):
+        body = (await client.post(path, files={"file": ("seed.csv", content)}, headers=headers)).json()
+        if body.get("status") != 200:
+            raise RuntimeError(f"Seeding {path} failed: {body}")
+
+
+async def drive(client: httpx.AsyncClient, headers: Dict, prefix: str, members: int, hot_items: int,
+                requests: int, concurrency: int, cancel_ratio: float) -> Dict:
+    """
+        Sends the requests from concurrent workers. A worker picks a random member and cancels one of its bookings
+        with the probability cancel_ratio, or when the member reached MAX_BOOKINGS, and books a random hot item
+        otherwise.
+    """
+    held: Dict[int, List[str]] = {index: [] for index in range(members)}
+    latencies: Dict[str, List[float]] = {"book": [], "cancel": []}
+    outcomes: Dict[str, Dict[str, int]] = {"book": {}, "cancel": {}}
+    remaining = requests
+
+    async def send(operation: str, payload: Dict) -> Dict:
+        started = time.perf_counter()
+        response = await client.post("/" + operation, json=payload, headers=headers)
+        latencies[operation].append(time.perf_counter() - started)
+        body = response.json()
+        status = str(body.get("status", response.status_code))
+        outcomes[operation][status] = outcomes[operation].get(status, 0) + 1
+        return body
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            member = random.randrange(members)
+            identity = {"member_name": f"{prefix}-m{member}", "member_surname": "Benchmark"}
+            if held[member] and (len(held[member]) >= MAX_BOOKINGS or random.random() < cancel_ratio):
+                reference = held[member].pop(random.randrange(len(held[member])))
+                body = await send("cancel", {**identity, "booking_reference": reference})
+                if body.get("status") != 200:
+                    held[member].append(reference)
+            else:
+                body = await send("book", {**identity, "item_name": f"{prefix}-i{random.randrange(hot_items)}"})
+                if body.get("status") == 200:
+                    held[member].append(body["data"]["booking_reference"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {"elapsed_seconds": round(elapsed, 3), "throughput_rps": round(requests / elapsed, 1),
+            "book": {**latency_summary(latencies["book"]), "outcomes": outcomes["book"]},
+            "cancel": {**latency_summary(latencies["cancel"]), "outcomes": outcomes["cancel"]},
+            "held_bookings": sum(len(references) for references in held.values())}
+
+
+def check_invariants(prefix: str, stock: int, held_bookings: int) -> List[str]:
+    """
+        The violations of the booking invariants among the seeded rows: no item below zero, no member above
+        MAX_BOOKINGS, and the counters of every member and item matching its Bookings and Holds rows.
+    """
+    violations = []
+    bookings_per_member = select(DbBooking.member_id, func.count().label("total")) \
+        .group_by(DbBooking.member_id).subquery()
+    holds_per_member = select(DbHold.member_id, func.count().label("total")).group_by(DbHold.member_id).subquery()
+    bookings_per_item = select(DbBooking.inventory_id, func.count().label("total")) \
+        .group_by(DbBooking.inventory_id).subquery()
+    holds_per_item = select(DbHold.inventory_id, func.count().label("total")).group_by(DbHold.inventory_id).subquery()
+    with engine.connect() as connection:
+        members = connection.execute(
+            select(DbMember.name, DbMember.booking_count,
+                   func.coalesce(bookings_per_member.c.total, 0), func.coalesce(holds_per_member.c.total, 0))
+            .outerjoin(bookings_per_member, bookings_per_member.c.member_id == DbMember.id)
+            .outerjoin(holds_per_member, holds_per_member.c.member_id == DbMember.id)
+            .where(DbMember.name.like(prefix + "-m%"))).all()
+        items = connection.execute(
+            select(DbInventory.title, DbInventory.remaining_count,
+                   func.coalesce(bookings_per_item.c.total, 0), func.coalesce(holds_per_item.c.total, 0))
+            .outerjoin(bookings_per_item, bookings_per_item.c.inventory_id == DbInventory.id)
+            .outerjoin(holds_per_item, holds_per_item.c.inventory_id == DbInventory.id)
+            .where(DbInventory.title.like(prefix + "-i%"))).all()
+
+    for name, booking_count, bookings, holds in members:
+        if booking_count > MAX_BOOKINGS:
+            violations.append(f"member {name} has {booking_count} bookings, above {MAX_BOOKINGS}")
+        if booking_count != bookings + holds:
+            violations.append(f"member {name} counts {booking_count} bookings for {bookings} bookings "
+                              f"and {holds} holds")
+    for title, remaining_count, bookings, holds in items:
+        if remaining_count < 0:
+            violations.append(f"item {title} has a negative remaining count {remaining_count}")
+        if remaining_count + bookings + holds != stock:
+            violations.append(f"item {title} has {remaining_count} remaining with {bookings} bookings "
+                              f"and {holds} holds out of {stock}")
+    booked = sum(bookings for _, _, bookings, _ in members)
+    if booked != held_bookings:
+        violations.append(f"{booked} bookings stored while the clients hold {held_bookings}")
+    return violations
+
+
+async def run(args) -> Dict:
+    run_id = datetime.utcnow().strftime("bench%Y%m%d%H%M%S")
+    lock_wait = BookingService().lock_wait
+    results = {"run_id": run_id, "started_at": datetime.utcnow().isoformat(),
+               "database": engine.dialect.name, "max_bookings": MAX_BOOKINGS,
+               "parameters": vars(args), "levels": [], "passed": True}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        headers = await authenticate(client, run_id)
+        for hot_items in args.contention:
+            prefix = f"{run_id}-c{hot_items}"
+            await seed(client, headers, prefix, args.members, max(args.items, hot_items), args.stock)
+            before = lock_wait.cumulative()
+            level = await drive(client, headers, prefix, args.members, hot_items, args.requests,
+                                args.concurrency, args.cancel_ratio)
+            level = {"hot_items": hot_items, **level, "lock_wait": lock_wait_delta(before, lock_wait.cumulative())}
+            level["violations"] = check_invariants(prefix, args.stock, level["held_bookings"])
+            results["passed"] = results["passed"] and not level["violations"]
+            results["levels"].append(level)
+            print(f"{hot_items} hot items: {level['throughput_rps']} req/s, book p99 {level['book']['p99_ms']} ms, "
+                  f"lock wait mean {level['lock_wait']['mean_ms']} ms, {len(level['violations'])} violations",
+                  file=sys.stderr, flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--items", type=int, default=100, help="items seeded per contention level")
+    parser.add_argument("--stock", type=int, default=50, help="units of every item")
+    parser.add_argument("--contention", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 10, 100], help="comma separated numbers of items receiving the traffic")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per contention level")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--cancel-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=None, help="seed of the traffic generator")
+    parser.add_argument("--output", help="file the JSON results are written to, stdout when omitted")
+    args = parser.parse_args()
+    if not DATABASE_URL:
+        parser.error("DATABASE_URL must be set")
+    random.seed(args.seed)
+
+    results = asyncio.run(run(args))
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(document + "\n")
+    else:
+        print(document)
+    sys.exit(0 if results["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
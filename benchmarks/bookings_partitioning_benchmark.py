@@ -0,0 +1,120 @@
+"""
+Compares reference lookups and time range listings on a plain and on a monthly partitioned bookings table.
+
+Run from the project root against a PostgreSQL database, the tables are created in a separate "benchmark" schema:
+    DATABASE_URL=postgresql://... python -m benchmarks.bookings_partitioning_benchmark --rows 50000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+from configuration.config import DATABASE_URL
+from repositories.booking_partition_repo import month_start
+from repositories.booking_repo import BookingRepo
+
+# Same layout as utils.utilities.new_reference: 48 bits of milliseconds, version 7, random bits
+REFERENCE_EXPRESSION = """
+    substr(lpad(to_hex((extract(epoch FROM booked_at) * 1000)::bigint), 12, '0'), 1, 8) || '-' ||
+    substr(lpad(to_hex((extract(epoch FROM booked_at) * 1000)::bigint), 12, '0'), 9, 4) || '-7' ||
+    substr(gen_random_uuid()::text, 16)
+"""
+
+
+def create_tables(connection, first_month: datetime, months: int):
+    connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+    connection.execute(text("CREATE SCHEMA benchmark"))
+    connection.execute(text("""
+        CREATE TABLE benchmark.bookings_plain (
+            id BIGSERIAL PRIMARY KEY, member_id INTEGER, inventory_id INTEGER,
+            booked_at TIMESTAMP NOT NULL, booking_reference VARCHAR NOT NULL UNIQUE)
+    """))
+    connection.execute(text("""
+        CREATE TABLE benchmark.bookings_partitioned (
+            id BIGSERIAL, member_id INTEGER, inventory_id INTEGER,
+            booked_at TIMESTAMP NOT NULL, booking_reference VARCHAR NOT NULL,
+            PRIMARY KEY (id, booked_at), UNIQUE (booking_reference, booked_at)
+        ) PARTITION BY RANGE (booked_at)
+    """))
+    for offset in range(months):
+        start = month_start(first_month, offset)
+        connection.execute(text(
+            f"CREATE TABLE benchmark.bookings_{start.year:04d}_{start.month:02d} "
+            f"PARTITION OF benchmark.bookings_partitioned "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{month_start(start, 1).isoformat()}')"))
+
+
+def load_rows(connection, rows: int, first_month: datetime, months: int):
+    per_month = rows // months
+    for offset in range(months):
+        start = month_start(first_month, offset)
+        seconds = (month_start(start, 1) - start).total_seconds()
+        for table in ("bookings_plain", "bookings_partitioned"):
+            connection.execute(text(f"""
+                INSERT INTO benchmark.{table} (member_id, inventory_id, booked_at, booking_reference)
+                SELECT member_id, inventory_id, booked_at, {REFERENCE_EXPRESSION}
+                FROM (SELECT (random() * 100000)::int AS member_id, (random() * 1000)::int AS inventory_id,
+                             :start + random() * :seconds * interval '1 second' AS booked_at
+                      FROM generate_series(1, :count)) generated
+            """), {"start": start, "seconds": seconds, "count": per_month})
+        print(f"loaded {start:%Y-%m}: {per_month} rows per table", flush=True)
+    connection.execute(text("ANALYZE benchmark.bookings_plain"))
+    connection.execute(text("ANALYZE benchmark.bookings_partitioned"))
+
+
+def measure(connection, statement: str, parameters: list) -> dict:
+    durations = []
+    for values in parameters:
+        started = time.perf_counter()
+        connection.execute(text(statement), values).fetchall()
+        durations.append((time.perf_counter() - started) * 1000)
+    plan = connection.execute(text("EXPLAIN " + statement), parameters[0]).scalars().all()
+    scanned = sum(1 for line in plan if "Scan" in line and " on " in line and "Bitmap Index Scan" not in line)
+    durations.sort()
+    return {"median_ms": round(statistics.median(durations), 3),
+            "p95_ms": round(durations[int(len(durations) * 0.95) - 1], 3),
+            "relations_scanned": scanned}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--skip-load", action="store_true", help="reuse the tables of a previous run")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    last_month = month_start(datetime.utcnow(), -1)
+    first_month = month_start(last_month, -(args.months - 1))
+    if not args.skip_load:
+        with engine.begin() as connection:
+            create_tables(connection, first_month, args.months)
+        with engine.begin() as connection:
+            load_rows(connection, args.rows, first_month, args.months)
+
+    with engine.connect() as connection:
+        references = connection.execute(text(
+            "SELECT booking_reference FROM benchmark.bookings_partitioned TABLESAMPLE SYSTEM (1) "
+            "WHERE booked_at >= :start LIMIT :samples"), {"start": last_month, "samples": args.samples}).scalars().all()
+        lookups = [{"reference": reference, "booked_after": BookingRepo.booked_after([reference])}
+                   for reference in references]
+        months = [{"start": month_start(last_month, -random.randrange(args.months)), "end": None}
+                  for _ in range(min(args.samples, 20))]
+        for values in months:
+            values["end"] = month_start(values["start"], 1)
+
+        for table in ("bookings_plain", "bookings_partitioned"):
+            lookup = measure(connection, f"SELECT * FROM benchmark.{table} "
+                                         f"WHERE booking_reference = :reference AND booked_at >= :booked_after",
+                             lookups)
+            listing = measure(connection, f"SELECT count(*) FROM benchmark.{table} "
+                                          f"WHERE booked_at >= :start AND booked_at < :end", months)
+            print(f"{table}: reference lookup {lookup}, month listing {listing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Generates member and inventory CSV files in the layout of /upload-members and /upload-inventories, with a share of
+defective rows: dates in the wrong or an impossible format, empty values, rows repeating an earlier row of the file,
+and rows colliding with the rows already in the database, named after existing_name.
+
+Run from the project root, the defect counts are printed as JSON:
+    python -m benchmarks.csv_generator members --rows 1000000 --defect-rate 0.05 --output members.csv
+"""
+import argparse
+import csv
+import json
+import random
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+MEMBER_HEADERS = ["name", "surname", "booking_count", "date_joined"]
+INVENTORY_HEADERS = ["title", "description", "remaining_count", "expiration_date"]
+MEMBER_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+INVENTORY_DATE_FORMAT = "%d/%m/%Y"
+
+MALFORMED_DATE = "malformed_date"
+NULL = "null"
+DUPLICATE = "duplicate"
+COLLISION = "db_collision"
+DEFECTS = (MALFORMED_DATE, NULL, DUPLICATE, COLLISION)
+
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+               "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+SURNAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+            "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+ADJECTIVES = ["Weekend", "Guided", "Private", "Sunset", "Family", "Deluxe", "Express", "Historic", "Coastal", "Alpine"]
+NOUNS = ["Tour", "Cruise", "Workshop", "Tasting", "Concert", "Retreat", "Safari", "Class", "Festival", "Hike"]
+
+# Dates parsed by neither format, or in the format of the other file
+MALFORMED_MEMBER_DATES = ["{:%d/%m/%Y}", "{:%Y-%m-%d}", "{:%Y-%m-%dT%H:%M}", "{:%Y}-02-30T10:00:00", "not a date"]
+MALFORMED_INVENTORY_DATES = ["{:%Y-%m-%dT%H:%M:%S}", "{:%m-%d-%Y}", "31/{:%m}/2099x", "30/02/{:%Y}", "soon"]
+
+# Rows of the file that duplicates are drawn from
+RECENT_ROWS = 1000
+
+
+def existing_name(prefix: str, index: int) -> str:
+    """
+        Name of the index-th row expected in the database, members with this name and the surname "Existing" or
+        items with this title, which the db_collision rows collide with.
+    """
+    return f"{prefix}-existing-{index}"
+
+
+def member_row(prefix: str, index: int, rng: random.Random) -> List[str]:
+    joined = datetime(2015, 1, 1) + timedelta(seconds=rng.randrange(10 * 365 * 24 * 3600))
+    return [f"{rng.choice(FIRST_NAMES)}-{prefix}-{index}", rng.choice(SURNAMES), str(rng.randrange(3)),
+            joined.strftime(MEMBER_DATE_FORMAT)]
+
+
+def inventory_row(prefix: str, index: int, rng: random.Random) -> List[str]:
+    adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+    expires = datetime.utcnow() + timedelta(days=rng.randrange(-30, 730))
+    return [f"{adjective} {noun} {prefix}-{index}", f"{adjective.lower()} {noun.lower()} for up to 20 people",
+            str(rng.randrange(1, 500)), expires.strftime(INVENTORY_DATE_FORMAT)]
+
+
+def generate_rows(kind: str, rows: int, defect_rate: float, prefix: str, collisions: int, rng: random.Random,
+                  defects: Counter) -> Iterator[List[str]]:
+    """
+        Yields the rows of a members or inventories file, a defect_rate share of them defective, counting the
+        defects. The db_collision rows are drawn among the first `collisions` existing rows.
+    """
+    is_member = kind == "members"
+    make_row = member_row if is_member else inventory_row
+    date_column = 3
+    malformed_dates = MALFORMED_MEMBER_DATES if is_member else MALFORMED_INVENTORY_DATES
+    recent = deque(maxlen=RECENT_ROWS)
+    kinds = [defect for defect in DEFECTS if defect != COLLISION or collisions > 0]
+    for index in range(rows):
+        row = make_row(prefix, index, rng)
+        if rng.random() < defect_rate:
+            defect = rng.choice(kinds if recent else [defect for defect in kinds if defect != DUPLICATE])
+            if defect == MALFORMED_DATE:
+                date = datetime(2000 + rng.randrange(30), 1 + rng.randrange(12), 1 + rng.randrange(28))
+                row[date_column] = rng.choice(malformed_dates).format(date)
+            elif defect == NULL:
+                row[rng.randrange(len(row))] = ""
+            elif defect == DUPLICATE:
+                row = list(rng.choice(recent))
+            else:
+                existing = existing_name(prefix, rng.randrange(collisions))
+                if is_member:
+                    row[0], row[1] = existing, "Existing"
+                else:
+                    row[0] = existing
+            defects[defect] += 1
+        else:
+            recent.append(row)
+        yield row
+
+
+def write_csv(path: str, kind: str, rows: int, defect_rate: float, prefix: str, collisions: int = 0,
+              seed: int = None) -> Dict[str, int]:
+    """Writes a members or inventories file and returns the number of rows of every defect."""
+    rng = random.Random(seed)
+    defects = Counter()
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(MEMBER_HEADERS if kind == "members" else INVENTORY_HEADERS)
+        writer.writerows(generate_rows(kind, rows, defect_rate, prefix, collisions, rng, defects))
+    return {defect: defects[defect] for defect in DEFECTS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=["members", "inventories"])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--defect-rate", type=float, default=0.05)
+    parser.add_argument("--prefix", default="gen", help="makes the names unique across files")
+    parser.add_argument("--collisions", type=int, default=0,
+                        help="number of existing rows the db_collision rows are drawn from, none when 0")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    print(json.dumps(write_csv(args.output, args.kind, args.rows, args.defect_rate, args.prefix, args.collisions,
+                               args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Measures the CSV uploads of members and inventories stage by stage: parsing (validate_csv_return_dataframe),
+validation (validate_member_data / validate_inventory_data) and loading (the bulk_update=true and the row by row
+repository insert paths), with the time and the peak resident memory of every stage.
+
+The files are generated by benchmarks.csv_generator. Every case runs in a fresh process against the database of
+DATABASE_URL, after inserting the rows its db_collision rows collide with, and its rows are named after the run so
+repeated runs do not collide. The results are written as JSON:
+    DATABASE_URL=postgresql://... SECRET_KEY=... python -m benchmarks.csv_ingest_benchmark \\
+        --kinds members,inventories --rows 1000,100000,1000000 --defect-rate 0.05 --output csv_ingest.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict
+
+from fastapi import UploadFile
+from sqlalchemy import func, select
+
+import main  # noqa: F401, creates the tables and declares every model
+from benchmarks.csv_generator import write_csv, existing_name
+from configuration.config import DATABASE_URL
+from configuration.database_config import SessionLocal, engine
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from services.inventory_service import InventoryService
+from services.member_service import MemberService
+from utils.utilities import validate_csv_return_dataframe
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident memory of the process in bytes, its peak so far where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class PeakRss:
+    """Samples the resident memory from a background thread while the block runs, keeping the peak."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stopped.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+async def measure_case(kind: str, path: str, prefix: str, collisions: int, bulk_update: bool) -> Dict:
+    is_member = kind == "members"
+    model = DbMember if is_member else DbInventory
+    service = MemberService() if is_member else InventoryService()
+    repo = service.member_repo if is_member else service.inventory_repo
+    stages = {}
+    db = SessionLocal()
+    try:
+        if collisions:
+            existing = [DbMember(name=existing_name(prefix, index), surname="Existing", booking_count=0,
+                                 date_joined=datetime(2024, 1, 1)) if is_member else
+                        DbInventory(title=existing_name(prefix, index), description="existing item",
+                                    remaining_count=1, expiration_date=datetime(2099, 1, 1))
+                        for index in range(collisions)]
+            db.bulk_save_objects(existing)
+            db.commit()
+
+        with open(path, "rb") as file, PeakRss() as rss:
+            started = time.perf_counter()
+            df, invalid_rows = await validate_csv_return_dataframe(UploadFile(file, filename=os.path.basename(path)),
+                                                                   "member" if is_member else "inventory")
+            stages["parse"] = (time.perf_counter() - started, rss)
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            if is_member:
+                valid, failed = service.validate_member_data(df)
+            else:
+                valid, failed = service.validate_inventory_data(df)
+            stages["validate"] = (time.perf_counter() - started, rss)
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            failures = []
+            if is_member:
+                await (repo.add_members_bulk if bulk_update else repo.add_member_synchronously)(valid, db, failures)
+            else:
+                await (repo.add_inventory_bulk if bulk_update else repo.add_inventory_synchronously)(valid, db,
+                                                                                                     failures)
+            stages["load"] = (time.perf_counter() - started, rss)
+
+        name = model.name if is_member else model.title
+        pattern = f"%-{prefix}-%" if is_member else f"% {prefix}-%"
+        loaded = db.execute(select(func.count()).select_from(model).where(name.like(pattern))).scalar()
+    finally:
+        db.close()
+
+    result = {"rejected_on_parse": len(invalid_rows), "rejected_on_validate": len(failed),
+              "valid": len(valid), "failed_on_load": len(failures), "loaded": loaded}
+    for stage, (duration, rss) in stages.items():
+        result[stage] = {"seconds": round(duration, 3), "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+                         "rss_growth_mb": round((rss.peak - rss.start) / 2 ** 20, 1)}
+    result["total_seconds"] = round(sum(duration for duration, _ in stages.values()), 3)
+    return result
+
+
+def run_case(kind: str, path: str, prefix: str, collisions: int, bulk_update: bool) -> Dict:
+    """Entry point of the process running one case."""
+    return asyncio.run(measure_case(kind, path, prefix, collisions, bulk_update))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", default="members,inventories", type=lambda value: value.split(","))
+    parser.add_argument("--rows", default=[1000, 10000, 100000],
+                        type=lambda value: [int(rows) for rows in value.split(",")])
+    parser.add_argument("--defect-rate", type=float, default=0.05)
+    parser.add_argument("--collision-pool", type=int, default=100,
+                        help="existing rows inserted before every case for the db_collision rows, none when 0")
+    parser.add_argument("--modes", default=[True, False],
+                        type=lambda value: [mode.strip().lower() == "true" for mode in value.split(",")],
+                        help="bulk_update values to measure, e.g. true,false")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--data-dir", help="directory the generated files are kept in, a temporary one by default")
+    parser.add_argument("--output", help="file the JSON results are written to, stdout when omitted")
+    args = parser.parse_args()
+    if not DATABASE_URL:
+        parser.error("DATABASE_URL must be set")
+
+    run_id = datetime.utcnow().strftime("ingest%Y%m%d%H%M%S")
+    results = {"run_id": run_id, "started_at": datetime.utcnow().isoformat(),
+               "database": engine.dialect.name, "parameters": vars(args), "cases": []}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temporary:
+        data_dir = args.data_dir or temporary
+        for kind in args.kinds:
+            for rows in args.rows:
+                for bulk_update in args.modes:
+                    prefix = f"{run_id}{len(results['cases'])}"
+                    path = os.path.join(data_dir, f"{prefix}-{kind}.csv")
+                    started = time.perf_counter()
+                    defects = write_csv(path, kind, rows, args.defect_rate, prefix, args.collision_pool, args.seed)
+                    case = {"kind": kind, "rows": rows, "bulk_update": bulk_update, "defects": defects,
+                            "file_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+                            "generate_seconds": round(time.perf_counter() - started, 3)}
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        case.update(executor.submit(run_case, kind, path, prefix, args.collision_pool,
+                                                    bulk_update).result())
+                    if not args.data_dir:
+                        os.remove(path)
+                    results["cases"].append(case)
+                    print(f"{kind} x {rows}, bulk_update={bulk_update}: parse {case['parse']['seconds']} s, "
+                          f"validate {case['validate']['seconds']} s, load {case['load']['seconds']} s, "
+                          f"{case['loaded']} rows loaded", file=sys.stderr, flush=True)
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(document + "\n")
+    else:
+        print(document)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,146 @@
+"""
+Measures the per call cost of the hot lookups of the booking path: the member, inventory, booking and user lookups
+built as legacy Query objects on every call, as they were, against the prebuilt statements the repositories
+execute now, and against the SQL those statements compile to executed straight on the driver connection, which
+leaves the database round trip and the driver as the floor. The difference with the floor is the Python
+overhead of SQLAlchemy.
+
+Run from the project root, the rows looked up are inserted first, named after the run:
+    DATABASE_URL=postgresql://... SECRET_KEY=... python -m benchmarks.lookup_statement_benchmark --iterations 5000
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+import main  # noqa: F401, creates the tables and configures the mappers
+from configuration.database_config import SessionLocal
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from models.db_user import DbUser
+from repositories.booking_repo import BookingRepo, BOOKING_BY_REFERENCE_STATEMENT
+from repositories.inventory_repo import INVENTORY_BY_TITLE_STATEMENT
+from repositories.member_repo import MEMBER_BY_NAME_STATEMENT
+from repositories.user_repo import USER_BY_USERNAME_STATEMENT
+from utils.utilities import new_reference
+
+
+def seed(db, prefix: str, rows: int) -> dict:
+    members = [DbMember(name=f"{prefix}-member-{i}", surname="Benchmark", booking_count=1,
+                        date_joined=datetime.utcnow()) for i in range(rows)]
+    items = [DbInventory(title=f"{prefix}-item-{i}", description="benchmark", remaining_count=rows,
+                         expiration_date=datetime(2099, 1, 1)) for i in range(rows)]
+    users = [DbUser(username=f"{prefix}-user-{i}", fullname="Benchmark", email=None, password="x")
+             for i in range(rows)]
+    db.add_all(members + items + users)
+    db.flush()
+    bookings = [DbBooking(member_id=member.id, inventory_id=item.id, booking_reference=new_reference(datetime.utcnow()))
+                for member, item in zip(members, items)]
+    db.add_all(bookings)
+    db.commit()
+    return {"members": [(member.name, member.surname) for member in members],
+            "items": [item.title for item in items],
+            "bookings": [booking.booking_reference for booking in bookings],
+            "users": [user.username for user in users]}
+
+
+def lookups(keys: dict) -> dict:
+    """The statement, its parameters per key and the legacy Query it replaced, for every lookup."""
+    return {
+        "get_member_from_name": (
+            MEMBER_BY_NAME_STATEMENT,
+            [{"member_name": name, "member_surname": surname} for name, surname in keys["members"]],
+            lambda db, values: db.query(DbMember).filter(DbMember.name.like(values["member_name"]),
+                                                         DbMember.surname.like(values["member_surname"]))
+            .with_for_update().first()),
+        "get_inventory_from_name": (
+            INVENTORY_BY_TITLE_STATEMENT,
+            [{"title": title} for title in keys["items"]],
+            lambda db, values: db.query(DbInventory).filter(DbInventory.title.like(values["title"]),
+                                                            ~DbInventory.is_expired, DbInventory.remaining_count > 0)
+            .with_for_update().first()),
+        "get_booking_from_reference": (
+            BOOKING_BY_REFERENCE_STATEMENT,
+            [{"reference": reference, "booked_after": BookingRepo.booked_after([reference])}
+             for reference in keys["bookings"]],
+            lambda db, values: db.query(DbBooking).filter(DbBooking.booking_reference.like(values["reference"]),
+                                                          DbBooking.booked_at >= values["booked_after"]).first()),
+        "get_user": (
+            USER_BY_USERNAME_STATEMENT,
+            [{"username": username} for username in keys["users"]],
+            lambda db, values: db.query(DbUser).filter(DbUser.username.like(values["username"])).first()),
+    }
+
+
+def driver_call(db, statement):
+    """Executes the SQL the statement compiles to on the driver connection, skipping the ORM and the compiler."""
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    sql = str(compiled)
+
+    def call(values: dict):
+        parameters = {**compiled.params, **values}
+        if compiled.positiontup:
+            parameters = tuple(parameters[name] for name in compiled.positiontup)
+        return db.connection().exec_driver_sql(sql, parameters).fetchall()
+    return call
+
+
+def measure(db, call, parameters: list, iterations: int, warmup: int) -> dict:
+    durations = []
+    for i in range(warmup + iterations):
+        values = parameters[i % len(parameters)]
+        started = time.perf_counter()
+        found = call(values)
+        elapsed = time.perf_counter() - started
+        db.rollback()
+        if not found:
+            raise AssertionError(f"lookup of {values} found nothing")
+        if i >= warmup:
+            durations.append(elapsed * 1_000_000)
+    durations.sort()
+    return {"median_us": round(statistics.median(durations), 1),
+            "p95_us": round(durations[int(len(durations) * 0.95) - 1], 1)}
+
+
+def main_benchmark(iterations: int, warmup: int, rows: int) -> dict:
+    db = SessionLocal()
+    try:
+        keys = seed(db, f"lookup-{uuid.uuid4().hex[:8]}", rows)
+        results = {"dialect": db.get_bind().dialect.name, "iterations": iterations, "lookups": {}}
+        for name, (statement, parameters, legacy) in lookups(keys).items():
+            variants = {
+                "legacy_query": measure(db, lambda values: legacy(db, values), parameters, iterations, warmup),
+                "prebuilt_statement": measure(db, lambda values: db.execute(statement, values).scalars().first(),
+                                              parameters, iterations, warmup),
+                "driver": measure(db, driver_call(db, statement), parameters, iterations, warmup),
+            }
+            floor = variants["driver"]["median_us"]
+            for variant in ("legacy_query", "prebuilt_statement"):
+                variants[variant]["overhead_us"] = round(variants[variant]["median_us"] - floor, 1)
+            results["lookups"][name] = variants
+        return results
+    finally:
+        db.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100, help="rows inserted and looked up in turn per table")
+    parser.add_argument("--output", help="file the JSON results are written to, stdout when omitted")
+    args = parser.parse_args()
+
+    results = json.dumps(main_benchmark(args.iterations, args.warmup, args.rows), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -7,3 +7,70 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 MAX_BOOKINGS = 2
 SECRET_KEY = os.environ.get("SECRET_KEY")
+INVENTORY_CACHE_MAX_SIZE = int(os.environ.get("INVENTORY_CACHE_MAX_SIZE", 1024))
+INVENTORY_CACHE_TTL_SECONDS = float(os.environ.get("INVENTORY_CACHE_TTL_SECONDS", 5))
+AVAILABILITY_SNAPSHOT_RECONCILE_SECONDS = float(os.environ.get("AVAILABILITY_SNAPSHOT_RECONCILE_SECONDS", 30))
+IDEMPOTENCY_BACKEND = os.environ.get("IDEMPOTENCY_BACKEND", "memory")  # "memory" or "database"
+IDEMPOTENCY_CACHE_MAX_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_MAX_SIZE", 10000))
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = float(
+    os.environ.get("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 60))  # a pending key this old was abandoned, it is taken over
+IDEMPOTENCY_PENDING_POLL_SECONDS = float(os.environ.get("IDEMPOTENCY_PENDING_POLL_SECONDS", 0.1))
+FAST_CANCEL_ENABLED = os.environ.get("FAST_CANCEL_ENABLED", "true").lower() == "true"
+HOLD_TTL_SECONDS = int(os.environ.get("HOLD_TTL_SECONDS", 300))
+HOLD_SWEEP_INTERVAL_SECONDS = float(os.environ.get("HOLD_SWEEP_INTERVAL_SECONDS", 30))
+HOLD_SWEEP_BATCH_SIZE = int(os.environ.get("HOLD_SWEEP_BATCH_SIZE", 500))
+WAITLIST_SCAN_LIMIT = int(os.environ.get("WAITLIST_SCAN_LIMIT", 50))
+AVAILABILITY_STREAM_COALESCE_SECONDS = float(os.environ.get("AVAILABILITY_STREAM_COALESCE_SECONDS", 0.25))
+AVAILABILITY_STREAM_KEEPALIVE_SECONDS = float(os.environ.get("AVAILABILITY_STREAM_KEEPALIVE_SECONDS", 15))
+AVAILABILITY_NOTIFY_CHANNEL = os.environ.get("AVAILABILITY_NOTIFY_CHANNEL", "")  # empty disables LISTEN/NOTIFY
+INVENTORY_EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.environ.get("INVENTORY_EXPIRY_SWEEP_INTERVAL_SECONDS", 60))
+INVENTORY_EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get("INVENTORY_EXPIRY_SWEEP_BATCH_SIZE", 500))
+BOOKINGS_PARTITIONING_ENABLED = os.environ.get("BOOKINGS_PARTITIONING_ENABLED", "false").lower() == "true"
+BOOKINGS_PARTITIONS_AHEAD = int(os.environ.get("BOOKINGS_PARTITIONS_AHEAD", 3))
+BOOKINGS_RETENTION_MONTHS = int(os.environ.get("BOOKINGS_RETENTION_MONTHS", 0))  # 0 keeps every partition
+BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS = float(
+    os.environ.get("BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS", 60 * 60))
+BOOKINGS_PARTITION_LOCK_TIMEOUT_MS = int(
+    os.environ.get("BOOKINGS_PARTITION_LOCK_TIMEOUT_MS", 2000))  # the DDL gives up, it is retried on the next run
+DATABASE_REPLICA_URLS = [url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url]
+REPLICA_SELECTION = os.environ.get("REPLICA_SELECTION", "round_robin")  # "round_robin" or "least_latency"
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get("REPLICA_CHECK_INTERVAL_SECONDS", 5))
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 30 * 60))  # -1 never recycles
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_USE_LIFO = os.environ.get("DB_POOL_USE_LIFO", "false").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 0))  # 0 disables the slow query log
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 100))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0))  # share of the requests traced, 0 to 1
+TRACING_EXPORT_PATH = os.environ.get("TRACING_EXPORT_PATH", "")  # empty keeps traces in the Server-Timing header only
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "booking-api")
+ADMIN_USERNAMES = [name for name in os.environ.get("ADMIN_USERNAMES", "").split(",") if name]
+AUTH_USER_CACHE_MAX_SIZE = int(os.environ.get("AUTH_USER_CACHE_MAX_SIZE", 10000))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL_SECONDS", 30))  # 0 disables the cache
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))  # share of PROFILING_ENDPOINTS requests
+PROFILING_ENDPOINTS = [name for name in os.environ.get("PROFILING_ENDPOINTS", "").split(",") if name]  # "POST /book"
+PROFILING_MODE = os.environ.get("PROFILING_MODE", "cprofile")  # "cprofile" or "sampler"
+PROFILING_STORE_SIZE = int(os.environ.get("PROFILING_STORE_SIZE", 20))
+PROFILING_SAMPLER_INTERVAL_SECONDS = float(os.environ.get("PROFILING_SAMPLER_INTERVAL_SECONDS", 0.005))
+ADMISSION_RATE_PER_SECOND = float(os.environ.get("ADMISSION_RATE_PER_SECOND", 0))  # per user, 0 disables the limit
+ADMISSION_BURST = int(os.environ.get("ADMISSION_BURST", 10))
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 200))  # 0 disables the limit
+ADMISSION_QUEUE_BUDGET_MS = float(os.environ.get("ADMISSION_QUEUE_BUDGET_MS", 2000))  # 0 disables the limit
+ADMISSION_MAX_PRINCIPALS = int(os.environ.get("ADMISSION_MAX_PRINCIPALS", 100000))
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", 0))  # 0 leaves the other routes unbounded
+REQUEST_ROUTE_TIMEOUTS = {route.strip(): float(seconds) for route, _, seconds in
+                          (item.rpartition("=") for item in os.environ.get(
+                              "REQUEST_ROUTE_TIMEOUTS", "POST /book=10,POST /cancel=10,POST /hold=10").split(",")
+                           if item)}  # "<method> <route template>=<seconds>"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = {name.strip(): level.strip().upper() for name, _, level in
+              (item.rpartition("=") for item in os.environ.get("LOG_LEVELS", "").split(",") if item)
+              }  # "<logger>=<level>", e.g. "repositories.booking_repo=DEBUG,sqlalchemy.engine=WARNING"
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))  # records beyond it are dropped, not waited for
@@ -1,13 +1,18 @@
-from sqlalchemy import create_engine
+from typing import Optional
+
+from fastapi import Header
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from configuration.config import DATABASE_URL
+from configuration.database_pool import create_pooled_engine
+from configuration.database_router import ReplicaRouter
+from utils.deadline import attach_deadline
 
-engine = create_engine(
-    DATABASE_URL
-)
+engine = create_pooled_engine(DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine)
+# Every transaction of a request is bounded by the request deadline
+attach_deadline(SessionLocal)
 
 # async_engine = create_async_engine(ASYNC_DATABASE_URL)
 
@@ -22,6 +27,19 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db(x_read_primary: Optional[str] = Header(None)):
+    """
+        Session for read-only endpoints, on a read replica when one is configured and not lagging behind.
+        Sending the X-Read-Primary: true header forces the read to the primary, e.g. to read one's own writes.
+        Writes and locking reads (FOR UPDATE) must use get_db.
+    """
+    replica = None if (x_read_primary or "").lower() == "true" else ReplicaRouter().select()
+    db = replica.session_factory() if replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # async def get_async_db():
 #     async_session = AsyncSessionLocal()
 #     try:
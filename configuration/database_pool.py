@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from configuration.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, \
+    DB_POOL_PRE_PING, DB_POOL_USE_LIFO
+from utils.metrics import Histogram, current_endpoint, track_queries
+from utils.slow_query_log import SlowQueryLog
+from utils.utilities import Singleton
+
+
+class PoolStats:
+    """Measurements of the connection pool of one engine."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.wait_time = Histogram()
+        self.checkout_time: Dict[str, Histogram] = defaultdict(Histogram)
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict:
+        pool = self.engine.pool
+        stats = {"pool": type(pool).__name__, "status": pool.status()}
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                         overflow=pool.overflow(), max_overflow=pool._max_overflow, timeout=pool.timeout())
+        stats.update(timeouts=self.timeouts, wait_time=self.wait_time.snapshot(),
+                     checkout_time={endpoint: histogram.snapshot()
+                                    for endpoint, histogram in sorted(self.checkout_time.items())})
+        return stats
+
+
+class PoolMetrics(metaclass=Singleton):
+    """
+       Registry of the pool measurements of every engine: the time spent waiting for a connection, the pool timeouts
+       and how long each endpoint keeps its connections checked out.
+    """
+
+    def __init__(self):
+        self.pools: Dict[str, PoolStats] = {}
+
+    def register(self, name: str, engine: Engine):
+        stats = self.pools[name] = PoolStats(engine)
+        engine.pool.stats = stats
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            connection_record.info["checked_out_at"] = time.perf_counter()
+            connection_record.info["endpoint"] = current_endpoint.get()
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            checked_out_at = connection_record.info.pop("checked_out_at", None)
+            if checked_out_at is not None:
+                stats.checkout_time[connection_record.info.pop("endpoint")] \
+                    .observe(time.perf_counter() - checked_out_at)
+
+    def snapshot(self) -> Dict:
+        return {name: stats.snapshot() for name, stats in self.pools.items()}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long every checkout waited for a connection and the checkouts that timed out."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        stats = getattr(self, "stats", None)
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            if stats:
+                with stats._lock:
+                    stats.timeouts += 1
+            raise
+        finally:
+            if stats:
+                stats.wait_time.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = getattr(self, "stats", None)
+        return pool
+
+
+def create_pooled_engine(url: str, name: str) -> Engine:
+    """
+        Creates an engine with the pool configured by the DB_POOL_* settings, instrumented under the given name.
+        In-memory SQLite databases keep their per-thread connection, the pool settings do not apply to them.
+        The queries run on the engine are accounted to the request being served and the slow ones are recorded.
+    """
+    options = dict(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE)
+    parsed = make_url(url)
+    if not (parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")):
+        options.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_use_lifo=DB_POOL_USE_LIFO)
+    engine = create_engine(url, **options)
+    PoolMetrics().register(name, engine)
+    track_queries(name, engine)
+    SlowQueryLog().attach(name, engine)
+    return engine
@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+
+from configuration.config import DATABASE_REPLICA_URLS, REPLICA_SELECTION, REPLICA_MAX_LAG_SECONDS, \
+    REPLICA_CHECK_INTERVAL_SECONDS
+from configuration.database_pool import create_pooled_engine
+from utils.deadline import attach_deadline
+from utils.utilities import Singleton
+
+# Replay lag of a standby, 0 when it replayed everything it received (an idle primary produces no transactions to
+# compare timestamps with) and on a server that is not in recovery
+POSTGRES_LAG_STATEMENT = text("""
+    SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+LATENCY_SMOOTHING = 0.3
+
+
+class Replica:
+    """A read replica with its session factory and the lag and latency seen by its last probe."""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine: Engine = create_pooled_engine(url, self.name)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=True, bind=self.engine)
+        attach_deadline(self.session_factory)
+        self.lag: Optional[float] = None  # None until a probe succeeded
+        self.latency: Optional[float] = None
+
+    @property
+    def is_usable(self) -> bool:
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def probe(self):
+        """Measures the replication lag and the round trip time, marks the replica unusable if it fails."""
+        try:
+            started = time.perf_counter()
+            with self.engine.connect() as connection:
+                if self.engine.dialect.name == "postgresql":
+                    lag = float(connection.execute(POSTGRES_LAG_STATEMENT).scalar())
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+            latency = time.perf_counter() - started
+        except Exception:
+            self.lag = None
+            raise
+        self.lag = lag
+        self.latency = latency if self.latency is None \
+            else LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency
+
+
+class ReplicaRouter(metaclass=Singleton):
+    """
+       Routes the read-only endpoints to the read replicas configured in DATABASE_REPLICA_URLS, in round robin or to
+       the replica with the lowest latency (REPLICA_SELECTION).
+       Replicas are probed every REPLICA_CHECK_INTERVAL_SECONDS, a replica lagging more than REPLICA_MAX_LAG_SECONDS,
+       failing its probe or not probed yet is skipped, and reads fall back to the primary when none is usable.
+    """
+
+    def __init__(self):
+        self.replicas: List[Replica] = [Replica(url) for url in DATABASE_REPLICA_URLS]
+        self._next = itertools.count()
+        self.logger = logging.getLogger(__name__)
+
+    def select(self) -> Optional[Replica]:
+        """
+                Picks the replica serving the next read.
+
+                :return: The replica, None when the read has to go to the primary.
+        """
+        usable = [replica for replica in self.replicas if replica.is_usable]
+        if not usable:
+            return None
+        if REPLICA_SELECTION == "least_latency":
+            return min(usable, key=lambda replica: replica.latency)
+        return usable[next(self._next) % len(usable)]
+
+    def probe_replicas(self):
+        for replica in self.replicas:
+            try:
+                replica.probe()
+            except Exception as ex:
+                self.logger.warning("Replica %s is not usable: %s", replica.name, ex)
+            else:
+                if not replica.is_usable:
+                    self.logger.warning("Replica %s lags %.1fs behind the primary", replica.name, replica.lag)
+
+    async def run_replica_monitor(self):
+        """
+                Background task probing the replicas, when replicas are configured.
+        """
+        if not self.replicas:
+            return
+        while True:
+            await asyncio.get_running_loop().run_in_executor(None, self.probe_replicas)
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL_SECONDS)
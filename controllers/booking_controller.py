@@ -1,33 +1,50 @@
+from typing import Optional
 
-from fastapi import APIRouter, Depends,  status
+from fastapi import APIRouter, Depends, status, Header, Response
 from sqlalchemy.orm import Session
 
-from configuration.database_config import get_db
+from configuration.database_config import get_db, get_read_db
 from dto.base_dto import BaseDTO
 
 
-from dto.booking_dto import ItemCancelRequest, ItemBookRequestBody
+from dto.booking_dto import ItemCancelRequest, ItemBookRequestBody, BulkCancelRequest, BookingQuery, \
+    BookingStatsQuery
 from models.db_bookings import DbBooking
-from schemas.bookings import BookingBase
+from models.db_user import DbUser
+from schemas.bookings import BookingBase, BookingDetails
+from services.admission_service import AdmissionService
 from services.auth_service import AuthService
 from services.booking_service import BookingService
+from services.idempotency_service import IdempotencyService
+from utils.tracing import span
+from utils.utilities import build_etag, etag_matches
 from utils.exceptions import  MemberNotFoundException, \
     MemberExhaustedLimitException, ItemNotFoundException, ItemDepletedException, ItemExpiredException, \
-    BookingNotFoundException
+    BookingNotFoundException, WaitlistEntryNotFoundException, DeadlineExceededException
 
 auth_service:AuthService = AuthService()
+admission_service:AdmissionService = AdmissionService()
 
 router = APIRouter(
   tags=['bookings'],
     dependencies=[Depends(auth_service.validate_token)]
 )
 
-@router.post("/book", response_model=BaseDTO)
-async def book_inventory(request:ItemBookRequestBody, db:Session = Depends(get_db)):
+@router.post("/book", response_model=BaseDTO, dependencies=[Depends(admission_service.admit)])
+async def book_inventory(request:ItemBookRequestBody, idempotency_key: Optional[str] = Header(None),
+                         user: DbUser = Depends(auth_service.validate_token), db:Session = Depends(get_db)):
+    if idempotency_key:
+        return await IdempotencyService().execute(idempotency_key, "book:" + str(user.id), request,
+                                                  lambda: _book_inventory(request, db), db)
+    return await _book_inventory(request, db)
+
+
+async def _book_inventory(request:ItemBookRequestBody, db:Session) -> BaseDTO:
     booking_service = BookingService()
     try:
         booking_elem = await booking_service.book_an_item(request, db)
-        order:BookingBase = BookingBase.model_validate(booking_elem)
+        with span("serialize"):
+            order:BookingBase = BookingBase.model_validate(booking_elem)
         return BaseDTO(data=order)
 
     except MemberNotFoundException as ex:
@@ -37,6 +54,8 @@ async def book_inventory(request:ItemBookRequestBody, db:Session = Depends(get_d
         return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
 
     except ItemDepletedException as ex:
+        if request.join_waitlist:
+            return await _join_waitlist(request, db)
         return BaseDTO(status=status.HTTP_406_NOT_ACCEPTABLE, message=str(ex))
 
     except MemberExhaustedLimitException as ex:
@@ -45,12 +64,71 @@ async def book_inventory(request:ItemBookRequestBody, db:Session = Depends(get_d
     except ItemExpiredException as ex:
         return BaseDTO(status=status.HTTP_412_PRECONDITION_FAILED, message=str(ex))
 
+    except DeadlineExceededException as ex:
+        return BaseDTO(status=status.HTTP_504_GATEWAY_TIMEOUT, message=str(ex))
+
     except Exception as ex:
         return BaseDTO(status=500, message="Some issue occurred while booking an item due to: " + str(ex))
 
 
-@router.post("/cancel", response_model=BaseDTO)
-async def cancel_booking(request:ItemCancelRequest,db:Session = Depends(get_db)):
+async def _join_waitlist(request:ItemBookRequestBody, db:Session) -> BaseDTO:
+    booking_service = BookingService()
+    try:
+        entry = await booking_service.join_waitlist(request, db)
+        if entry.booking_reference:
+            return BaseDTO(message="item back in stock, booked from the waitlist", data=entry)
+        return BaseDTO(status=status.HTTP_202_ACCEPTED,
+                       message="item depleted, added to the waitlist, poll /waitlist/" + str(entry.id), data=entry)
+
+    except MemberNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except ItemNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except MemberExhaustedLimitException as ex:
+        return BaseDTO(status=status.HTTP_406_NOT_ACCEPTABLE, message=str(ex))
+
+    except DeadlineExceededException as ex:
+        return BaseDTO(status=status.HTTP_504_GATEWAY_TIMEOUT, message=str(ex))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while joining the waitlist due to: " + str(ex))
+
+
+@router.get("/waitlist/{entry_id}", response_model=BaseDTO)
+async def view_waitlist_entry(entry_id:int, db:Session = Depends(get_db)):
+    booking_service = BookingService()
+    try:
+        return BaseDTO(data=await booking_service.get_waitlist_entry(entry_id, db))
+
+    except WaitlistEntryNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while fetching the waitlist entry due to: " + str(ex))
+
+
+@router.get("/bookings/stats", response_model=BaseDTO)
+async def view_booking_stats(query: BookingStatsQuery = Depends(), db:Session = Depends(get_read_db)):
+    booking_service = BookingService()
+    try:
+        return BaseDTO(data=await booking_service.get_booking_stats(db, query))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while fetching the booking stats due to: " + str(ex))
+
+
+@router.post("/cancel", response_model=BaseDTO, dependencies=[Depends(admission_service.admit)])
+async def cancel_booking(request:ItemCancelRequest, idempotency_key: Optional[str] = Header(None),
+                         user: DbUser = Depends(auth_service.validate_token), db:Session = Depends(get_db)):
+    if idempotency_key:
+        return await IdempotencyService().execute(idempotency_key, "cancel:" + str(user.id), request,
+                                                  lambda: _cancel_booking(request, db), db)
+    return await _cancel_booking(request, db)
+
+
+async def _cancel_booking(request:ItemCancelRequest, db:Session) -> BaseDTO:
     booking_service = BookingService()
     try:
         await booking_service.cancel_booking(request,db)
@@ -62,15 +140,39 @@ async def cancel_booking(request:ItemCancelRequest,db:Session = Depends(get_db))
     except BookingNotFoundException as ex:
         return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
 
+    except DeadlineExceededException as ex:
+        return BaseDTO(status=status.HTTP_504_GATEWAY_TIMEOUT, message=str(ex))
+
     except Exception as ex:
         return BaseDTO(status=500, message="Some issue occurred while cancelling a booking due to: " + str(ex))
 
+@router.post("/cancel-bulk", response_model=BaseDTO, dependencies=[Depends(auth_service.validate_admin)])
+async def cancel_bookings_in_bulk(request:BulkCancelRequest, db:Session = Depends(get_db)):
+    booking_service = BookingService()
+    try:
+        results = await booking_service.bulk_cancel(request, db)
+        if any(result.status != "cancelled" for result in results):
+            return BaseDTO(status=206, message="partial cancellation successful, outcome per booking is attached",
+                           data=results)
+        return BaseDTO(data=results)
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while cancelling bookings due to: " + str(ex))
+
 @router.get("/all", response_model=BaseDTO)
-async def view_all_bookings(db:Session = Depends(get_db)):
+async def view_all_bookings(response: Response, query: BookingQuery = Depends(),
+                            if_none_match: Optional[str] = Header(None), db:Session = Depends(get_read_db)):
     booking_service = BookingService()
     try:
-        bookings = await booking_service.view_all_bookings(db)
-        all_bookings = [BookingBase.model_validate(booking) for booking in bookings]
+        version, variant = await booking_service.get_bookings_listing_version(db, query)
+        etag = build_etag(DbBooking.__tablename__, version, variant)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        bookings = await booking_service.view_all_bookings(db, query)
+        schema = BookingDetails if query.expand else BookingBase
+        all_bookings = [schema.model_validate(booking) for booking in bookings]
+        response.headers["ETag"] = etag
         return BaseDTO(data=all_bookings)
 
     except MemberNotFoundException as ex:
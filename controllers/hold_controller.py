@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from configuration.database_config import get_db
+from dto.base_dto import BaseDTO
+from dto.booking_dto import ItemBookRequestBody, HoldRequest
+from schemas.bookings import BookingBase, HoldBase
+from services.auth_service import AuthService
+from services.hold_service import HoldService
+from utils.exceptions import MemberNotFoundException, MemberExhaustedLimitException, ItemNotFoundException, \
+    ItemDepletedException, ItemExpiredException, HoldNotFoundException, HoldExpiredException, \
+    DeadlineExceededException
+
+auth_service:AuthService = AuthService()
+
+router = APIRouter(
+  tags=['holds'],
+  dependencies=[Depends(auth_service.validate_token)]
+)
+
+@router.post("/hold", response_model=BaseDTO)
+async def hold_inventory(request:ItemBookRequestBody, db:Session = Depends(get_db)):
+    hold_service = HoldService()
+    try:
+        hold = await hold_service.hold_an_item(request, db)
+        return BaseDTO(data=HoldBase.model_validate(hold))
+
+    except MemberNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except ItemNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except ItemDepletedException as ex:
+        return BaseDTO(status=status.HTTP_406_NOT_ACCEPTABLE, message=str(ex))
+
+    except MemberExhaustedLimitException as ex:
+        return BaseDTO(status=status.HTTP_406_NOT_ACCEPTABLE, message=str(ex))
+
+    except ItemExpiredException as ex:
+        return BaseDTO(status=status.HTTP_412_PRECONDITION_FAILED, message=str(ex))
+
+    except DeadlineExceededException as ex:
+        return BaseDTO(status=status.HTTP_504_GATEWAY_TIMEOUT, message=str(ex))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while holding an item due to: " + str(ex))
+
+
+@router.post("/hold/confirm", response_model=BaseDTO)
+async def confirm_hold(request:HoldRequest, db:Session = Depends(get_db)):
+    hold_service = HoldService()
+    try:
+        booking = await hold_service.confirm_hold(request, db)
+        return BaseDTO(data=BookingBase.model_validate(booking))
+
+    except MemberNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except HoldNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except HoldExpiredException as ex:
+        return BaseDTO(status=status.HTTP_410_GONE, message=str(ex))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while confirming a hold due to: " + str(ex))
+
+
+@router.post("/hold/release", response_model=BaseDTO)
+async def release_hold(request:HoldRequest, db:Session = Depends(get_db)):
+    hold_service = HoldService()
+    try:
+        await hold_service.release_hold(request, db)
+        return BaseDTO(data="Successfully released hold")
+
+    except MemberNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except HoldNotFoundException as ex:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message=str(ex))
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while releasing a hold due to: " + str(ex))
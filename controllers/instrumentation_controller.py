@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Response, status
+
+from configuration.database_pool import PoolMetrics
+from dto.base_dto import BaseDTO
+from services.auth_service import AuthService
+from utils.profiling import ProfileStore
+from utils.slow_query_log import SlowQueryLog
+
+auth_service:AuthService = AuthService()
+
+router = APIRouter(
+  prefix="/instrumentation",
+  tags=['instrumentation'],
+  dependencies=[Depends(auth_service.validate_admin)]
+)
+
+@router.get("/pool", response_model=BaseDTO)
+async def view_pool_statistics():
+    try:
+        return BaseDTO(data=PoolMetrics().snapshot())
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while fetching the pool statistics due to: " + str(ex))
+
+@router.get("/slow-queries", response_model=BaseDTO)
+async def view_slow_queries():
+    slow_query_log = SlowQueryLog()
+    try:
+        if not slow_query_log.is_enabled:
+            return BaseDTO(message="slow query log disabled, set SLOW_QUERY_THRESHOLD_MS to enable it", data=[])
+        return BaseDTO(data=slow_query_log.recent())
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while fetching the slow queries due to: " + str(ex))
+
+@router.get("/profiles", response_model=BaseDTO)
+async def view_profiles():
+    try:
+        return BaseDTO(data=ProfileStore().list())
+
+    except Exception as ex:
+        return BaseDTO(status=500, message="Some issue occurred while fetching the profiles due to: " + str(ex))
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: int):
+    profile = ProfileStore().get(profile_id)
+    if profile is None:
+        return BaseDTO(status=status.HTTP_404_NOT_FOUND, message="Profile not found, it may have been evicted")
+    return Response(content=profile.data, media_type=profile.media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{profile.filename}"'})
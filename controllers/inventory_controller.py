@@ -1,13 +1,17 @@
 
-from fastapi import APIRouter, Depends, UploadFile, File
+from typing import Optional
+
+from fastapi import APIRouter, Depends, UploadFile, File, Header, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from configuration.database_config import get_db
+from configuration.database_config import get_db, get_read_db
 from dto.base_dto import BaseDTO
-from schemas.inventory import InventoryBase
+from models.db_inventory import DbInventory
 from services.auth_service import AuthService
 from services.inventory_service import InventoryService
+from utils.utilities import build_etag, etag_matches
 
 auth_service:AuthService = AuthService()
 
@@ -16,6 +20,12 @@ router = APIRouter(
 dependencies=[Depends(auth_service.validate_token)]
 )
 
+# The availability stream stays open as long as the client listens, it must not hold a database session
+stream_router = APIRouter(
+  tags=['inventory'],
+dependencies=[Depends(auth_service.validate_token_in_own_session)]
+)
+
 @router.post("/upload-inventories", response_model=BaseDTO)
 async def upload_members(bulk_update:bool, file: UploadFile = File(...), db:Session = Depends(get_db)):
     inventory_service = InventoryService()
@@ -30,13 +40,22 @@ async def upload_members(bulk_update:bool, file: UploadFile = File(...), db:Sess
         return BaseDTO(status=500, message="Some issue occurred while bulk uploading inventories due to: " + str(ex))
 
 @router.get("/view-all", response_model=BaseDTO)
-async def get_all_inventories(db: Session = Depends(get_db)):
+async def get_all_inventories(live_only: bool = False, if_none_match: Optional[str] = Header(None),
+                              db: Session = Depends(get_read_db)):
     inventory_service = InventoryService()
     try:
-        inventories = await inventory_service.get_all_inventories(db)
-        all_inventories = [InventoryBase.model_validate(inventory) for inventory in inventories]
-        return BaseDTO(data=all_inventories)
+        version, listing = await inventory_service.get_inventories_listing(db, live_only)
+        etag = build_etag(DbInventory.__tablename__ + ("-live" if live_only else ""), version)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(content=listing, media_type="application/json", headers={"ETag": etag})
     except Exception as ex:
         return BaseDTO(status=500, message="Some issue occurred while fetching inventories due to: " + str(ex))
 
+@stream_router.get("/view-all/stream")
+async def stream_inventory_availability(last_event_id: Optional[str] = Header(None)):
+    inventory_service = InventoryService()
+    return StreamingResponse(inventory_service.stream_availability(last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends,UploadFile, File
+from typing import Optional
+
+from fastapi import APIRouter, Depends, UploadFile, File, Header, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from configuration.database_config import get_db
+from configuration.database_config import get_db, get_read_db
 from dto.base_dto import BaseDTO
+from models.db_member import DbMember
 from schemas.member import MemberBase
 
 from services.auth_service import AuthService
 from services.member_service import MemberService
+from utils.utilities import build_etag, etag_matches
 
 auth_service:AuthService = AuthService()
 
@@ -17,11 +21,17 @@ router = APIRouter(
 )
 
 @router.get("/all-members", response_model=BaseDTO)
-async def get_all_members(db: Session = Depends(get_db)):
+async def get_all_members(response: Response, if_none_match: Optional[str] = Header(None),
+                          db: Session = Depends(get_read_db)):
     member_service = MemberService()
     try:
+        etag = build_etag(DbMember.__tablename__, await member_service.get_members_version(db))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
         members = await member_service.get_all_members(db)
         all_members = [MemberBase.model_validate(member) for member in members]
+        response.headers["ETag"] = etag
         return BaseDTO(data=all_members)
     except Exception as ex:
         return BaseDTO(status=500, message="Some issue occurred while fetching members due to: " + str(ex))
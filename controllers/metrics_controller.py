@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics_service import MetricsService
+
+# Scraped by Prometheus, which does not authenticate with the API tokens
+router = APIRouter(
+  tags=['metrics']
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def view_metrics():
+    return PlainTextResponse(MetricsService().render(), media_type="text/plain; version=0.0.4")
@@ -1,12 +1,14 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, model_validator
 
 
 class ItemBookRequestBody(BaseModel):
     member_name: str
     member_surname: str
     item_name: str
+    join_waitlist: bool = False
 
     @validator('member_name', 'member_surname', 'item_name')
     def must_not_be_empty(cls, v):
@@ -24,3 +26,46 @@ class ItemCancelRequest(BaseModel):
         if not v:
             raise ValueError('Field must not be empty')
         return v
+
+class HoldRequest(BaseModel):
+    member_name: str
+    member_surname: str
+    hold_reference: str
+
+    @validator('member_name', 'member_surname', 'hold_reference')
+    def must_not_be_empty(cls, v):
+        if not v:
+            raise ValueError('Field must not be empty')
+        return v
+
+class BulkCancelRequest(BaseModel):
+    booking_references: Optional[List[str]] = None
+    member_name: Optional[str] = None
+    member_surname: Optional[str] = None
+    item_name: Optional[str] = None
+
+    @model_validator(mode='after')
+    def must_have_a_criterion(self):
+        if (self.member_name is None) != (self.member_surname is None):
+            raise ValueError('member_name and member_surname must be provided together')
+        if not self.booking_references and not self.member_name and not self.item_name:
+            raise ValueError('At least one of booking_references, member or item_name must be provided')
+        return self
+
+class BookingQuery(BaseModel):
+    member_id: Optional[int] = None
+    member_name: Optional[str] = None
+    member_surname: Optional[str] = None
+    inventory_id: Optional[int] = None
+    item_name: Optional[str] = None
+    booked_from: Optional[datetime] = None
+    booked_to: Optional[datetime] = None
+    expand: bool = False
+
+class BookingStatsQuery(BaseModel):
+    granularity: Literal["hour", "day"] = "day"
+    inventory_id: Optional[int] = None
+    member_id: Optional[int] = None
+    stats_from: Optional[datetime] = None
+    stats_to: Optional[datetime] = None
+    members_limit: int = 100
@@ -1,21 +1,52 @@
+import asyncio
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 
 
+from configuration.config import PROFILING_ENABLED
 from configuration.database_config import engine, Base
+from configuration.database_router import ReplicaRouter
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from controllers import booking_controller, inventory_controller, member_controller, auth_controller
+from controllers import booking_controller, inventory_controller, member_controller, auth_controller, \
+  hold_controller, instrumentation_controller, metrics_controller
+from dto.base_dto import BaseDTO
+from repositories.booking_partition_repo import BookingPartitionRepo
+from repositories.inventory_repo import InventoryRepo
+from services.auth_service import AuthService
+from services.booking_partition_service import BookingPartitionService
+from services.hold_service import HoldService
+from services.inventory_service import InventoryService
+from utils.deadline import DeadlineMiddleware
+from utils.exceptions import DeadlineExceededException
+from utils.logging_setup import configure_logging, RequestIdMiddleware
+from utils.metrics import RequestMetricsMiddleware
+from utils.profiling import ProfilingMiddleware
+from utils.tracing import TracingMiddleware
+
+configure_logging()
 
 app = FastAPI()
 app.include_router(booking_controller.router)
 app.include_router(inventory_controller.router)
+app.include_router(inventory_controller.stream_router)
 app.include_router(member_controller.router)
 app.include_router(auth_controller.router)
+app.include_router(hold_controller.router)
+app.include_router(instrumentation_controller.router)
+app.include_router(metrics_controller.router)
 
 
+BookingPartitionRepo().create_partitioned_table(engine)
 Base.metadata.create_all(engine,checkfirst=True)
+InventoryRepo().add_expiry_column(engine)
+# create_all skips the tables that exist, the indexes declared on them since are created here
+for table in Base.metadata.sorted_tables:
+  for index in table.indexes:
+    index.create(engine, checkfirst=True)
 
 origins = [
   '*',
@@ -28,6 +59,28 @@ app.add_middleware(
   allow_methods=['*'],
   allow_headers=['*']
 )
+if PROFILING_ENABLED:
+  app.add_middleware(ProfilingMiddleware, is_admin=AuthService().is_admin_authorization)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(RequestMetricsMiddleware, routes=app.routes)
+app.add_middleware(RequestIdMiddleware)
+
+@app.exception_handler(DeadlineExceededException)
+async def deadline_exceeded(request: Request, ex: DeadlineExceededException):
+  # raised outside of the endpoints, e.g. by the database lookup of the token validation
+  return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                      content=BaseDTO(status=status.HTTP_504_GATEWAY_TIMEOUT, message=str(ex)).model_dump(mode="json"))
+
+@app.on_event("startup")
+async def start_background_tasks():
+  # keep references to the tasks so they are not garbage collected
+  app.state.background_tasks = [asyncio.create_task(HoldService().run_hold_sweeper()),
+                                 asyncio.create_task(InventoryService().run_availability_heartbeat()),
+                                 asyncio.create_task(InventoryService().run_expiration_sweeper()),
+                                 asyncio.create_task(BookingPartitionService().run_partition_maintenance()),
+                                 asyncio.create_task(ReplicaRouter().run_replica_monitor())]
+  InventoryService().start_availability_bridge()
 
 
 if __name__ == "__main__":
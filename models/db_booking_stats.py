@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, Index
+
+from configuration.database_config import Base
+
+
+class DbBookingStats(Base):
+    __tablename__ = 'BookingStats'
+    __table_args__ = (Index('ix_booking_stats_granularity_bucket', 'granularity', 'bucket_start'),)
+
+    inventory_id = Column(Integer, ForeignKey('Inventory.id'), primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    booked = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
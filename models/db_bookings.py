@@ -1,12 +1,14 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, DateTime, String, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from configuration.database_config import Base
 
 class DbBooking(Base):
     __tablename__ = 'Bookings'
+    __table_args__ = (Index('ix_bookings_member_booked_at', 'member_id', 'booked_at'),
+                      Index('ix_bookings_inventory_booked_at', 'inventory_id', 'booked_at'))
 
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey('Members.id'))
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, String, ForeignKey
+
+from configuration.database_config import Base
+
+
+class DbHold(Base):
+    __tablename__ = 'Holds'
+
+    id = Column(Integer, primary_key=True, index=True)
+    member_id = Column(Integer, ForeignKey('Members.id'), nullable=False)
+    inventory_id = Column(Integer, ForeignKey('Inventory.id'), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    hold_reference = Column(String, nullable=False, unique=True, index=True)
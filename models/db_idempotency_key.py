@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, Text
+
+from configuration.database_config import Base
+
+
+class DbIdempotencyKey(Base):
+    __tablename__ = "IdempotencyKeys"
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
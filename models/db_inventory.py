@@ -1,16 +1,23 @@
 
-from sqlalchemy import Column, Integer, DateTime, UniqueConstraint, PrimaryKeyConstraint, String
+from sqlalchemy import Column, Integer, DateTime, UniqueConstraint, PrimaryKeyConstraint, String, Boolean, Index, \
+    false, text
 from sqlalchemy.orm import relationship
 
 from configuration.database_config import Base
 
 class DbInventory(Base):
     __tablename__ = "Inventory"
-    __table_args__ = ( UniqueConstraint('title', name="uniqueTitle"),)
+    __table_args__ = ( UniqueConstraint('title', name="uniqueTitle"),
+                       # Live items only: the expiration sweeper and live listings never touch the expired or
+                       # sold out rows
+                       Index('ix_inventory_live', 'expiration_date',
+                             postgresql_where=text('NOT is_expired AND remaining_count > 0'),
+                             sqlite_where=text('is_expired = 0 AND remaining_count > 0')),)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
     description = Column(String)
     remaining_count = Column(Integer, nullable=False)
     expiration_date = Column(DateTime, nullable=False)
+    is_expired = Column(Boolean, nullable=False, default=False, server_default=false())
     bookings = relationship("DbBooking", back_populates="inventory")
 
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String
+
+from configuration.database_config import Base
+
+
+class DbTableVersion(Base):
+    __tablename__ = "TableVersions"
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, Index, text
+
+from configuration.database_config import Base
+
+
+class DbWaitlistEntry(Base):
+    __tablename__ = 'Waitlist'
+    __table_args__ = (Index('ix_waitlist_inventory_status_id', 'inventory_id', 'status', 'id'),
+                      # a member waits at most once per item
+                      Index('ux_waitlist_member_inventory_waiting', 'member_id', 'inventory_id', unique=True,
+                            postgresql_where=text("status = 'waiting'"), sqlite_where=text("status = 'waiting'")),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    member_id = Column(Integer, ForeignKey('Members.id'), nullable=False)
+    inventory_id = Column(Integer, ForeignKey('Inventory.id'), nullable=False)
+    enqueued_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, nullable=False, default="waiting")
+    booking_reference = Column(String, nullable=True)
+    assigned_at = Column(DateTime, nullable=True)
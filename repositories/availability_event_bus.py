@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import queue
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from configuration.config import AVAILABILITY_STREAM_COALESCE_SECONDS, AVAILABILITY_NOTIFY_CHANNEL
+from utils.utilities import Singleton
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_PAYLOAD_LIMIT = 7900  # PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_QUEUE_SIZE = 1000  # notifications waiting for the sender thread, the newer ones are dropped beyond
+
+
+class AvailabilityChange(NamedTuple):
+    """Committed remaining count of one item."""
+    id: int
+    title: str
+    remaining_count: int
+
+
+class AvailabilityEventBus(metaclass=Singleton):
+    """
+       In-process bus of committed inventory availability changes, read by the availability streams.
+       The bus keeps the latest change per item tagged with a sequence number instead of a queue per subscriber:
+       a subscriber remembers the last sequence it sent and reads every item changed since, so a burst of changes
+       of one item reaches a slow subscriber as a single update and an idle subscriber costs no work on publish.
+       Waiting subscribers share one event, set at most once per AVAILABILITY_STREAM_COALESCE_SECONDS.
+       Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.sequence = 0
+        self.latest: "OrderedDict[int, Tuple[int, AvailabilityChange]]" = OrderedDict()
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._wake_scheduled = False
+
+    @property
+    def changed(self) -> asyncio.Event:
+        """The event set the next time subscribers are woken up, read it before calling changes_since."""
+        return self._changed
+
+    def publish(self, changes: Iterable[AvailabilityChange]):
+        """
+                Records committed availability changes and schedules waking up the subscribers.
+
+                :param changes: The new remaining counts of the changed items.
+        """
+        changes = list(changes)
+        if not changes:
+            return
+        self.sequence += 1
+        for change in changes:
+            self.latest[change.id] = (self.sequence, change)
+            self.latest.move_to_end(change.id)
+        self._schedule_wake()
+
+    def changes_since(self, sequence: int) -> Tuple[int, List[AvailabilityChange]]:
+        """
+                Returns the latest change of every item changed after the given sequence, oldest first.
+
+                :param sequence: The last sequence seen by the subscriber.
+                :return: The current sequence and the changes.
+        """
+        changes = []
+        for item_sequence, change in reversed(self.latest.values()):
+            if item_sequence <= sequence:
+                break
+            changes.append(change)
+        changes.reverse()
+        return self.sequence, changes
+
+    def heartbeat(self):
+        """Wakes every waiting subscriber even without changes, so idle streams can send a keepalive."""
+        self._wake()
+
+    def _schedule_wake(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._wake()
+            return
+        if not self._wake_scheduled:
+            self._wake_scheduled = True
+            loop.call_later(AVAILABILITY_STREAM_COALESCE_SECONDS, self._wake)
+
+    def _wake(self):
+        self._wake_scheduled = False
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+
+class AvailabilityNotifyBridge(metaclass=Singleton):
+    """
+       Bridges availability changes between workers with PostgreSQL LISTEN/NOTIFY on AVAILABILITY_NOTIFY_CHANNEL.
+       Every worker notifies the changes it committed and publishes the changes notified by the other workers on its
+       own bus. Disabled when the channel is not configured or the database is not PostgreSQL.
+    """
+
+    def __init__(self):
+        self.channel = AVAILABILITY_NOTIFY_CHANNEL
+        self.event_bus = AvailabilityEventBus()
+        self._engine = None
+        self._thread: Optional[threading.Thread] = None
+        self._sender: Optional[threading.Thread] = None
+        self._outbox: "queue.Queue[str]" = queue.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+
+    def start(self, engine, on_remote_changes):
+        """
+                Starts listening for the changes of the other workers, and sending the changes of this worker, on
+                background threads.
+
+                :param engine: The SQLAlchemy engine, the listener holds one of its connections.
+                :param on_remote_changes: Called on the event loop thread with the changes of another worker.
+        """
+        if not self.channel or engine.dialect.name != "postgresql" or self._thread is not None:
+            return
+        self._engine = engine
+        loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._listen, args=(loop, on_remote_changes),
+                                        name="availability-listener", daemon=True)
+        self._thread.start()
+        self._sender = threading.Thread(target=self._send_forever, name="availability-notifier", daemon=True)
+        self._sender.start()
+
+    def notify(self, changes: List[AvailabilityChange]):
+        """
+                Queues committed changes for the other workers, in as many notifications as the payload limit needs.
+                The notifications are sent by the sender thread, the caller does not wait for the database.
+
+                :param changes: The new remaining counts of the changed items.
+        """
+        if self._engine is None or not changes:
+            return
+        payloads = []
+        chunk = []
+        for change in changes:
+            chunk.append(list(change))
+            if len(self._payload(chunk)) > NOTIFY_PAYLOAD_LIMIT and len(chunk) > 1:
+                payloads.append(self._payload(chunk[:-1]))
+                chunk = chunk[-1:]
+        payloads.append(self._payload(chunk))
+        for payload in payloads:
+            try:
+                self._outbox.put_nowait(payload)
+            except queue.Full:
+                logger.warning("Dropped an availability notification, %s are waiting to be sent", NOTIFY_QUEUE_SIZE)
+
+    def _send_forever(self):
+        while True:
+            payloads = [self._outbox.get()]
+            while True:
+                try:
+                    payloads.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            self._send(payloads)
+
+    def _send(self, payloads: List[str]):
+        try:
+            with self._engine.begin() as connection:
+                for payload in payloads:
+                    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                       {"channel": self.channel, "payload": payload})
+        except Exception as ex:
+            logger.error("Failed to notify %s availability changes: %s", len(payloads), ex)
+
+    def _payload(self, chunk: list) -> str:
+        return json.dumps({"origin": self.event_bus.worker_id, "changes": chunk}, separators=(",", ":"))
+
+    def _listen(self, loop: asyncio.AbstractEventLoop, on_remote_changes):
+        while not loop.is_closed():
+            connection = None
+            try:
+                connection = self._engine.raw_connection()
+                driver_connection = connection.driver_connection
+                driver_connection.autocommit = True
+                cursor = driver_connection.cursor()
+                cursor.execute('LISTEN "' + self.channel.replace('"', '""') + '"')
+                while not loop.is_closed():
+                    if select.select([driver_connection], [], [], 5) == ([], [], []):
+                        continue
+                    driver_connection.poll()
+                    while driver_connection.notifies:
+                        notification = driver_connection.notifies.pop(0)
+                        message = json.loads(notification.payload)
+                        if message["origin"] == self.event_bus.worker_id:
+                            continue
+                        changes = [AvailabilityChange(*change) for change in message["changes"]]
+                        loop.call_soon_threadsafe(on_remote_changes, changes)
+            except Exception as ex:
+                logger.error("Availability listener failed, reconnecting: %s", ex)
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    connection.invalidate()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from configuration.config import AVAILABILITY_SNAPSHOT_RECONCILE_SECONDS
+from dto.base_dto import BaseDTO
+from models.db_inventory import DbInventory
+from utils.utilities import Singleton
+
+EPOCH = datetime(1970, 1, 1)
+MAX_MICROS = 2 ** 63 - 1
+
+
+class AvailabilitySnapshot(metaclass=Singleton):
+    """
+       Compact in-memory copy of the inventory table used to answer the inventory listing.
+       Columns are kept in arrays indexed by slot, the serialized listing is rebuilt only after the data changed.
+       The snapshot is tagged with the inventory table version it reflects: bookings done through this process
+       are applied as deltas, any other change (another worker, an upload) is picked up by a full reload as soon
+       as a newer version is seen, and a full reload also happens every AVAILABILITY_SNAPSHOT_RECONCILE_SECONDS.
+       The listing of live items only, neither expired nor sold out, is kept in its own buffer which is also rebuilt
+       once the first of its items expires.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.remaining_counts = array("q")
+        self.expiration_dates = array("q")  # microseconds since epoch
+        self.titles: List[str] = []
+        self.descriptions: List[Optional[str]] = []
+        self.slot_by_id: Dict[int, int] = {}
+        self.version: Optional[int] = None
+        self.loaded_at = 0.0
+        self._buffer: Optional[bytes] = None
+        self._live_buffer: Optional[bytes] = None
+        self._live_valid_until = 0
+        self._live_tag: Optional[str] = None
+
+    async def get_listing(self, version: int, db: Session) -> Tuple[int, bytes]:
+        """
+                Returns the serialized inventory listing, reloading the snapshot if it is older than the given version.
+
+                :param version: The current version of the inventory table.
+                :param db: The database session.
+                :return: The version the listing reflects and the serialized BaseDTO response body.
+        """
+        self._ensure_current(version, db)
+        if self._buffer is None:
+            self._buffer = self._render(range(len(self.ids)))
+        return self.version, self._buffer
+
+    async def get_live_listing(self, version: int, db: Session) -> Tuple[str, bytes]:
+        """
+                Returns the serialized listing of the items neither expired nor sold out.
+
+                :param version: The current version of the inventory table.
+                :param db: The database session.
+                :return: A tag identifying the listing content, the same in every worker, and the serialized BaseDTO
+                    response body.
+        """
+        self._ensure_current(version, db)
+        now = self._to_micros(datetime.utcnow())
+        if self._live_buffer is None or now >= self._live_valid_until:
+            slots = [slot for slot in range(len(self.ids))
+                     if self.expiration_dates[slot] > now and self.remaining_counts[slot] > 0]
+            self._live_buffer = self._render(slots)
+            self._live_valid_until = min((self.expiration_dates[slot] for slot in slots), default=MAX_MICROS)
+            # derived from the listed items and counts, a per-process counter would repeat after a restart
+            live_rows = array("q", (value for slot in slots for value in (self.ids[slot], self.remaining_counts[slot])))
+            self._live_tag = str(self.version) + "." + hashlib.sha1(live_rows.tobytes()).hexdigest()[:16]
+        return self._live_tag, self._live_buffer
+
+    def _ensure_current(self, version: int, db: Session):
+        # a version older than the snapshot comes from a lagging replica, the snapshot must not go back to it
+        if self.version is None or version > self.version or (version == self.version and
+                time.monotonic() - self.loaded_at >= AVAILABILITY_SNAPSHOT_RECONCILE_SECONDS):
+            self.load(version, db)
+
+    def load(self, version: int, db: Session):
+        """
+                Replaces the snapshot with the current content of the inventory table.
+
+                :param version: The inventory table version read before the content.
+                :param db: The database session.
+        """
+        rows = db.query(DbInventory.id, DbInventory.title, DbInventory.description,
+                        DbInventory.remaining_count, DbInventory.expiration_date).order_by(DbInventory.id).all()
+        self.ids = array("q", (row.id for row in rows))
+        self.remaining_counts = array("q", (row.remaining_count for row in rows))
+        self.expiration_dates = array("q", (self._to_micros(row.expiration_date) for row in rows))
+        self.titles = [row.title for row in rows]
+        self.descriptions = [row.description for row in rows]
+        self.slot_by_id = {inventory_id: slot for slot, inventory_id in enumerate(self.ids)}
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._clear_buffers()
+
+    def apply_delta(self, inventory_id: int, delta: int, version: Optional[int]):
+        """
+                Applies a committed change of remaining_count.
+                The delta is applied only if it directly follows the snapshot version, otherwise the snapshot is
+                marked for reload because changes from elsewhere were missed.
+
+                :param inventory_id: The id of the changed item.
+                :param delta: The change of the item's remaining count.
+                :param version: The inventory table version produced by the change, None if unknown.
+        """
+        self.apply_deltas({inventory_id: delta}, version)
+
+    def apply_deltas(self, deltas: Dict[int, int], version: Optional[int]):
+        """
+                Applies committed changes of remaining_count of several items made by one transaction.
+
+                :param deltas: The change of the remaining count per item id.
+                :param version: The inventory table version produced by the transaction.
+        """
+        slots = [self.slot_by_id.get(inventory_id) for inventory_id in deltas]
+        if self.version is None or version != self.version + 1 or None in slots:
+            self.invalidate()
+            return
+        for slot, delta in zip(slots, deltas.values()):
+            self.remaining_counts[slot] += delta
+        self.version = version
+        self._clear_buffers()
+
+    def invalidate(self):
+        self.version = None
+        self._clear_buffers()
+
+    def _clear_buffers(self):
+        self._buffer = None
+        self._live_buffer = None
+
+    def _render(self, slots: Iterable[int]) -> bytes:
+        rows = [{"title": self.titles[slot],
+                 "description": self.descriptions[slot],
+                 "remaining_count": self.remaining_counts[slot],
+                 "expiration_date": self._from_micros(self.expiration_dates[slot])}
+                for slot in slots]
+        return json.dumps(jsonable_encoder(BaseDTO(data=rows)), separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _to_micros(value: datetime) -> int:
+        return (value - EPOCH) // timedelta(microseconds=1)
+
+    @staticmethod
+    def _from_micros(value: int) -> datetime:
+        return EPOCH + timedelta(microseconds=value)
@@ -0,0 +1,211 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from configuration.config import BOOKINGS_PARTITIONING_ENABLED, BOOKINGS_PARTITION_LOCK_TIMEOUT_MS
+from configuration.database_config import Base
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.availability_event_bus import AvailabilityChange
+from repositories.inventory_repo import InventoryRepo
+from repositories.table_version_repo import TableVersionRepo
+from repositories.waitlist_repo import WaitlistRepo
+from utils.utilities import Singleton
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = "BookingsArchive"
+
+# The partition key has to be part of every unique constraint of a partitioned table, references are still unique
+# as they embed their creation time and random bits
+CREATE_PARTITIONED_BOOKINGS_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS "Bookings" (
+        id SERIAL NOT NULL,
+        member_id INTEGER REFERENCES "Members" (id),
+        inventory_id INTEGER REFERENCES "Inventory" (id),
+        booked_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+        booking_reference VARCHAR NOT NULL,
+        PRIMARY KEY (id, booked_at)
+    ) PARTITION BY RANGE (booked_at)
+    """,
+    'CREATE INDEX IF NOT EXISTS "ix_Bookings_id" ON "Bookings" (id)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS "ix_Bookings_booking_reference" ON "Bookings" (booking_reference, booked_at)',
+    'CREATE INDEX IF NOT EXISTS ix_bookings_member_booked_at ON "Bookings" (member_id, booked_at)',
+    'CREATE INDEX IF NOT EXISTS ix_bookings_inventory_booked_at ON "Bookings" (inventory_id, booked_at)',
+    'CREATE TABLE IF NOT EXISTS "Bookings_default" PARTITION OF "Bookings" DEFAULT',
+    """
+    CREATE TABLE IF NOT EXISTS "BookingsArchive" (
+        id INTEGER NOT NULL,
+        member_id INTEGER,
+        inventory_id INTEGER,
+        booked_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        booking_reference VARCHAR NOT NULL
+    ) PARTITION BY RANGE (booked_at)
+    """,
+]
+
+LIST_PARTITIONS_STATEMENT = text("""
+    SELECT child.relname FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    WHERE parent.relname = :table_name AND pg_table_is_visible(parent.oid)
+""")
+
+SET_LOCK_TIMEOUT_STATEMENT = text("SELECT set_config('lock_timeout', :lock_timeout, true)")
+
+ARCHIVED_TABLES = (DbBooking.__tablename__, DbInventory.__tablename__, DbMember.__tablename__)
+
+
+def month_start(value: datetime, months: int = 0) -> datetime:
+    """Returns the first instant of the month of the given time, shifted by the given number of months."""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+class ArchivedPartition(NamedTuple):
+    """A partition moved to the archive: its name, the units its bookings gave back per item, the items' new
+    availability and the table versions produced."""
+    name: str
+    released: Counter
+    changes: List[AvailabilityChange]
+    versions: Dict[str, int]
+
+
+class BookingPartitionRepo(metaclass=Singleton):
+    """
+       Repository maintaining the monthly range partitions of the bookings table on PostgreSQL.
+       Partitions are created ahead of time, a default partition catches anything outside of them, and the
+       partitions older than the retention period are moved to the archive table without copying rows.
+    """
+
+    def __init__(self):
+        self.inventory_repo = InventoryRepo()
+        self.waitlist_repo = WaitlistRepo()
+        self.table_version_repo = TableVersionRepo()
+
+    def is_enabled(self, bind) -> bool:
+        """Partitioning is used when enabled in the configuration and the database is PostgreSQL."""
+        return BOOKINGS_PARTITIONING_ENABLED and bind.dialect.name == "postgresql"
+
+    def create_partitioned_table(self, engine: Engine):
+        """
+                Creates the partitioned bookings table and the archive table, before the other tables are created
+                from the models. An existing bookings table is left untouched.
+
+                :param engine: The SQLAlchemy engine.
+        """
+        if not self.is_enabled(engine):
+            return
+        Base.metadata.create_all(engine, tables=[DbMember.__table__, DbInventory.__table__], checkfirst=True)
+        with engine.begin() as connection:
+            kind = connection.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('\"Bookings\"')")) \
+                .scalar()
+            if kind == "r":
+                logger.warning("Bookings table exists and is not partitioned, it has to be migrated by hand")
+                return
+            for statement in CREATE_PARTITIONED_BOOKINGS_STATEMENTS:
+                connection.execute(text(statement))
+
+    async def create_partitions(self, first_month: datetime, months: int, db: Session) -> List[str]:
+        """
+                Creates the missing monthly partitions starting with the given month, one transaction each under
+                BOOKINGS_PARTITION_LOCK_TIMEOUT_MS. Bookings of the month that landed in the default partition are
+                moved to the new partition before it is attached.
+
+                :param first_month: The first month to create a partition for.
+                :param months: The number of months.
+                :param db: The database session.
+                :return: The names of the created partitions.
+        """
+        existing = set(db.execute(LIST_PARTITIONS_STATEMENT, {"table_name": DbBooking.__tablename__}).scalars())
+        db.rollback()
+        created = []
+        for offset in range(months):
+            start = month_start(first_month, offset)
+            name = self.partition_name(DbBooking.__tablename__, start)
+            if name in existing:
+                continue
+            bounds = {"start": start, "end": month_start(start, 1)}
+            try:
+                self._set_lock_timeout(db)
+                db.execute(text(f'CREATE TABLE "{name}" (LIKE "Bookings" INCLUDING DEFAULTS)'))
+                db.execute(text(f'WITH moved AS (DELETE FROM "Bookings_default" WHERE booked_at >= :start '
+                                f'AND booked_at < :end RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'), bounds)
+                db.execute(text(f'ALTER TABLE "Bookings" ATTACH PARTITION "{name}" '
+                                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{bounds['end'].isoformat()}')"))
+                db.commit()
+            except Exception as ex:
+                db.rollback()
+                logger.error("Creating booking partition %s failed: %s", name, ex)
+                raise Exception(ex)
+            created.append(name)
+        return created
+
+    async def archive_partitions(self, before_month: datetime, db: Session) -> List[ArchivedPartition]:
+        """
+                Moves the monthly partitions of the months before the given one to the archive table, by detaching
+                and attaching them, one transaction each under BOOKINGS_PARTITION_LOCK_TIMEOUT_MS. Archived
+                bookings end: the same transaction gives their slots back to the members and their units back to
+                the items, hands the units to the waitlists and invalidates the listings. The released units are
+                not published, the caller runs outside of the event loop thread.
+                The rows are moved as they are, the archive is not compressed. DETACH PARTITION CONCURRENTLY is not
+                available, PostgreSQL refuses it on a table with a default partition, the lock timeout bounds how
+                long the bookings wait behind the detach instead.
+
+                :param before_month: The first month kept in the bookings table.
+                :param db: The database session.
+                :return: The archived partitions, to be published on the event loop thread.
+        """
+        names = sorted(db.execute(LIST_PARTITIONS_STATEMENT, {"table_name": DbBooking.__tablename__}).scalars())
+        db.rollback()
+        archived = []
+        for name in names:
+            start = self.partition_month(name)
+            if start is None or start >= before_month:
+                continue
+            archive_name = self.partition_name(ARCHIVE_TABLE, start)
+            try:
+                self._set_lock_timeout(db)
+                db.execute(text(f'ALTER TABLE "Bookings" DETACH PARTITION "{name}"'))
+                db.execute(text(f'UPDATE "Members" SET booking_count = "Members".booking_count - archived.count '
+                                f'FROM (SELECT member_id, count(*) AS count FROM "{name}" GROUP BY member_id) '
+                                f'AS archived WHERE "Members".id = archived.member_id'))
+                released = Counter(dict(db.execute(text(
+                    f'UPDATE "Inventory" SET remaining_count = "Inventory".remaining_count + archived.count '
+                    f'FROM (SELECT inventory_id, count(*) AS count FROM "{name}" GROUP BY inventory_id) '
+                    f'AS archived WHERE "Inventory".id = archived.inventory_id '
+                    f'RETURNING "Inventory".id, archived.count')).all()))
+                db.execute(text(f'ALTER TABLE "{name}" RENAME TO "{archive_name}"'))
+                db.execute(text(f'ALTER TABLE "{ARCHIVE_TABLE}" ATTACH PARTITION "{archive_name}" '
+                                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{month_start(start, 1).isoformat()}')"))
+                released.subtract(await self.waitlist_repo.assign_released_units(released, db))
+                changes = await self.inventory_repo.get_availability([DbInventory.id.in_(released)], db)
+                versions = await self.table_version_repo.commit_with_versions(ARCHIVED_TABLES, db)
+            except Exception as ex:
+                db.rollback()
+                logger.error("Archiving booking partition %s failed: %s", name, ex)
+                raise Exception(ex)
+            archived.append(ArchivedPartition(name, released, changes, versions))
+        return archived
+
+    def _set_lock_timeout(self, db: Session):
+        db.execute(SET_LOCK_TIMEOUT_STATEMENT, {"lock_timeout": f"{BOOKINGS_PARTITION_LOCK_TIMEOUT_MS}ms"})
+
+    @staticmethod
+    def partition_name(table_name: str, month: datetime) -> str:
+        return f"{table_name}_{month.year:04d}_{month.month:02d}"
+
+    @staticmethod
+    def partition_month(name: str):
+        """Returns the month of a monthly partition from its name, None for the default partition."""
+        try:
+            return datetime.strptime(name[len(DbBooking.__tablename__) + 1:], "%Y_%m")
+        except ValueError:
+            return None
@@ -1,14 +1,60 @@
-import uuid
 import logging
-from typing import List, Type
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Type
 
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.orm import Session, contains_eager
 
 from configuration.database_config import get_db
 from models.db_bookings import DbBooking
 from models.db_inventory import DbInventory
 from models.db_member import DbMember
-from utils.utilities import Singleton
+from repositories.booking_stats_repo import BookingStatsRepo, BOOKED, CANCELLED
+from repositories.inventory_catalog_cache import InventoryCatalogEntry
+from repositories.inventory_change_publisher import InventoryChangePublisher
+from repositories.inventory_repo import InventoryRepo
+from repositories.member_repo import MemberRepo
+from repositories.table_version_repo import TableVersionRepo
+from repositories.waitlist_repo import WaitlistRepo
+from utils.tracing import traced
+from utils.utilities import Singleton, new_reference, reference_time
+
+logger = logging.getLogger(__name__)
+
+BOOKING_TABLES = (DbBooking.__tablename__, DbInventory.__tablename__, DbMember.__tablename__)
+BULK_CANCEL_CHUNK_SIZE = 5000
+# A booking is created after its reference, allow for the clocks of different workers when a hold is confirmed
+REFERENCE_CLOCK_SKEW = timedelta(minutes=5)
+EPOCH = datetime(1970, 1, 1)
+
+# Deletes the member's booking and restores both counters in a single round trip.
+# The final select returns no row if the member does not exist and a NULL inventory_id if the booking does not.
+CANCEL_BY_REFERENCE_STATEMENT = text("""
+    WITH member AS (
+        SELECT id FROM "Members" WHERE name LIKE :member_name AND surname LIKE :member_surname LIMIT 1
+    ), deleted AS (
+        DELETE FROM "Bookings" USING member
+        WHERE "Bookings".booking_reference = :reference AND "Bookings".booked_at >= :booked_after
+          AND "Bookings".member_id = member.id
+        RETURNING "Bookings".member_id, "Bookings".inventory_id
+    ), inventory AS (
+        UPDATE "Inventory" SET remaining_count = "Inventory".remaining_count + 1
+        FROM deleted WHERE "Inventory".id = deleted.inventory_id
+        RETURNING "Inventory".id, "Inventory".title, "Inventory".expiration_date, "Inventory".remaining_count
+    ), updated_member AS (
+        UPDATE "Members" SET booking_count = "Members".booking_count - 1
+        FROM deleted WHERE "Members".id = deleted.member_id
+        RETURNING "Members".id
+    )
+    SELECT member.id AS member_id, inventory.id AS inventory_id, inventory.title,
+           inventory.expiration_date, inventory.remaining_count
+    FROM member LEFT JOIN inventory ON TRUE
+""")
+
+# Built once, see MEMBER_BY_NAME_STATEMENT in repositories.member_repo
+BOOKING_BY_REFERENCE_STATEMENT = select(DbBooking).where(DbBooking.booking_reference.like(bindparam("reference")),
+                                                         DbBooking.booked_at >= bindparam("booked_after")).limit(1)
 
 
 class BookingRepo(metaclass=Singleton):
@@ -16,6 +62,21 @@ class BookingRepo(metaclass=Singleton):
        Repository for handling booking operations.
     """
 
+    def __init__(self):
+        """
+                Initializes the BookingRepo with the table version repository used to invalidate listings,
+                the publisher keeping the in-process inventory read models up to date, the member and inventory
+                repositories, the waitlist repository receiving released units and the analytics repository
+                maintaining the booking rollups.
+        """
+        self.table_version_repo = TableVersionRepo()
+        self.change_publisher = InventoryChangePublisher()
+        self.member_repo = MemberRepo()
+        self.inventory_repo = InventoryRepo()
+        self.waitlist_repo = WaitlistRepo()
+        self.stats_repo = BookingStatsRepo()
+
+    @traced
     async def get_booking_from_reference(self, reference:str,db:Session):
         """
                 Retrieve a booking by its reference.
@@ -25,8 +86,25 @@ class BookingRepo(metaclass=Singleton):
                 :return: The booking object if found, else None.
         """
 
-        return db.query(DbBooking).filter(DbBooking.booking_reference.like(reference)).first()
+        return db.execute(BOOKING_BY_REFERENCE_STATEMENT, {"reference": reference,
+                                                           "booked_after": self.booked_after([reference])}) \
+            .scalars().first()
+
+    @staticmethod
+    def booked_after(references: List[str]) -> datetime:
+        """
+                Lower bound of the booking time of the given references, derived from the creation time embedded in
+                them, letting the database skip the older partitions of the bookings table.
+
+                :param references: The booking references.
+                :return: The bound, the epoch if a reference does not embed its creation time.
+        """
+        times = [reference_time(reference) for reference in references]
+        if not times or None in times:
+            return EPOCH
+        return min(times) - REFERENCE_CLOCK_SKEW
 
+    @traced
     async def book_an_item(self, member:DbMember, item:DbInventory,db:Session):
         """
                 Book an item for a member.
@@ -38,26 +116,34 @@ class BookingRepo(metaclass=Singleton):
 
                 :raises Exception: If an error occurs during the transaction.
         """
-        logging.info(f"Booking item {item.id} for member {member.id}")
+        logger.debug("Booking item %s for member %s", item.id, member.id)
+        item_id = item.id
 
         # Proceed with booking
         try:
-            booking = DbBooking(member_id=member.id, inventory_id=item.id, booking_reference=uuid.uuid4())
+            now = datetime.utcnow()
+            booking = DbBooking(member_id=member.id, inventory_id=item.id, booked_at=now,
+                                booking_reference=new_reference(now))
             db.add(booking)
 
             # Update counts
             member.booking_count += 1
             item.remaining_count -= 1
+            await self.stats_repo.record({item_id: 1}, BOOKED, now, db)
+            catalog_entry = InventoryCatalogEntry.from_inventory(item)
 
             # Commit the transaction
-            db.commit()
-            logging.info(f"Booking successful: {booking.booking_reference}")
+            versions = await self.table_version_repo.commit_with_versions(BOOKING_TABLES, db)
+            self.change_publisher.item_changed(catalog_entry, -1, versions)
+            logger.info("Booking successful: %s", booking.booking_reference)
         except Exception as ex:
             db.rollback()
-            logging.error(f"Booking failed: {ex}")
+            self.change_publisher.item_failed(item_id)
+            logger.error("Booking failed: %s", ex)
             raise Exception(ex)
         return booking
 
+    @traced
     async def cancel_an_item(self, member:DbMember, booking:DbBooking, item:DbInventory,db:Session):
         """
                 Cancel a booking for an item.
@@ -69,31 +155,187 @@ class BookingRepo(metaclass=Singleton):
 
                 :raises Exception: If an error occurs during the transaction.
         """
-        logging.info(f"Cancelling booking {booking.booking_reference} for member {member.id}")
+        logger.debug("Cancelling booking %s for member %s", booking.booking_reference, member.id)
+        item_id = item.id
 
         try:
             # Update counts
             member.booking_count -= 1
             item.remaining_count += 1
             db.delete(booking)
+            await self.stats_repo.record({item_id: 1}, CANCELLED, datetime.utcnow(), db)
+            assigned = await self.waitlist_repo.assign_released_units({item_id: 1}, db)
+            catalog_entry = InventoryCatalogEntry.from_inventory(item)
 
             # Commit the transaction
-            db.commit()
-            logging.info(f"Cancellation successful: {booking.booking_reference}")
+            versions = await self.table_version_repo.commit_with_versions(BOOKING_TABLES, db)
+            self.change_publisher.item_changed(catalog_entry, 1 - assigned[item_id], versions)
+            logger.info("Cancellation successful: %s", booking.booking_reference)
         except Exception as ex:
             db.rollback()
-            logging.error(f"Cancellation failed: {ex}")
+            self.change_publisher.item_failed(item_id)
+            logger.error("Cancellation failed: %s", ex)
             raise Exception(ex)
 
-    async def get_all_bookings(self,db:Session)-> list[Type[DbBooking]]:
+    @traced
+    async def join_waitlist(self, member:DbMember, item:DbInventory, db:Session):
         """
-                Retrieve a booking by its reference.
+                Put a member on the waitlist of an item. Units the item has in stock, released since the member
+                was told it is depleted, are assigned to the head of the waitlist in the same transaction.
 
-                :param reference: The booking reference string.
+                :param member: The member object.
+                :param item: The inventory item object, locked by the caller with its live remaining count.
                 :param db: The database session.
-                :return: The booking object if found, else None.
+                :return: The waitlist entry of the member, assigned if it got one of the units.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        item_id = item.id
+
+        try:
+            entry = await self.waitlist_repo.add_entry(member.id, item_id, db)
+            assigned = Counter()
+            if item.remaining_count > 0:
+                assigned = await self.waitlist_repo.assign_released_units({item_id: item.remaining_count}, db)
+            catalog_entry = InventoryCatalogEntry.from_inventory(item)
+
+            # Commit the transaction
+            if not assigned:
+                db.commit()
+            else:
+                versions = await self.table_version_repo.commit_with_versions(BOOKING_TABLES, db)
+                self.change_publisher.item_changed(catalog_entry, -assigned[item_id], versions)
+                logger.info("Assigned %d units of item %s in stock to its waitlist", assigned[item_id], item_id)
+        except Exception as ex:
+            db.rollback()
+            self.change_publisher.item_failed(item_id)
+            logger.error("Joining the waitlist failed: %s", ex)
+            raise Exception(ex)
+        return entry
+
+    def supports_cancel_by_reference(self, db:Session) -> bool:
+        """
+                Whether the database supports the data-modifying CTE used by cancel_by_reference.
+
+                :param db: The database session.
+                :return: True on PostgreSQL.
+        """
+        return db.get_bind().dialect.name == "postgresql"
+
+    @traced
+    async def cancel_by_reference(self, member_name:str, member_surname:str, reference:str, db:Session):
+        """
+                Cancel a booking of a member with a single DELETE ... RETURNING statement, without loading
+                the member, the booking or the item first.
+
+                :param member_name: The name of the member owning the booking.
+                :param member_surname: The surname of the member owning the booking.
+                :param reference: The booking reference.
+                :param db: The database session.
+                :return: None if the member was not found, else a row whose inventory_id is None if the member
+                         has no booking with this reference.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        logger.debug("Cancelling booking %s for member %s %s", reference, member_name, member_surname)
+
+        try:
+            result = db.execute(CANCEL_BY_REFERENCE_STATEMENT, {"member_name": member_name,
+                                                                "member_surname": member_surname,
+                                                                "reference": reference,
+                                                                "booked_after": self.booked_after([reference])}
+                                ).first()
+            if result is None or result.inventory_id is None:
+                db.rollback()
+                return result
+            await self.stats_repo.record({result.inventory_id: 1}, CANCELLED, datetime.utcnow(), db)
+            assigned = await self.waitlist_repo.assign_released_units({result.inventory_id: 1}, db)
+
+            # Commit the transaction
+            versions = await self.table_version_repo.commit_with_versions(BOOKING_TABLES, db)
+            delta = 1 - assigned[result.inventory_id]
+            self.change_publisher.item_changed(InventoryCatalogEntry(result.inventory_id, result.title,
+                                                                     result.expiration_date,
+                                                                     result.remaining_count - assigned[result.inventory_id]),
+                                               delta, versions)
+            logger.info("Cancellation successful: %s", reference)
+        except Exception as ex:
+            db.rollback()
+            logger.error("Cancellation failed: %s", ex)
+            raise Exception(ex)
+        return result
+
+    async def cancel_bookings(self, criteria:list, db:Session) -> List[str]:
+        """
+                Cancel every booking matching the criteria in one transaction, restoring the member and item counts
+                with set-based aggregate UPDATEs.
+
+                :param criteria: SQLAlchemy filter expressions on DbBooking.
+                :param db: The database session.
+                :return: The references of the cancelled bookings.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        try:
+            rows = db.query(DbBooking.id, DbBooking.booking_reference, DbBooking.inventory_id) \
+                .filter(*criteria).with_for_update().all()
+            if not rows:
+                db.rollback()
+                return []
+            logger.debug("Cancelling %d bookings", len(rows))
+
+            booking_ids = [row.id for row in rows]
+            for start in range(0, len(booking_ids), BULK_CANCEL_CHUNK_SIZE):
+                chunk = booking_ids[start:start + BULK_CANCEL_CHUNK_SIZE]
+                await self.member_repo.release_booking_counts(DbBooking, chunk, db)
+                await self.inventory_repo.restock_items(DbBooking, chunk, db)
+                db.query(DbBooking).filter(DbBooking.id.in_(chunk)).delete(synchronize_session=False)
+            released = Counter(row.inventory_id for row in rows)
+            await self.stats_repo.record(released, CANCELLED, datetime.utcnow(), db)
+            released.subtract(await self.waitlist_repo.assign_released_units(released, db))
+            changes = await self.inventory_repo.get_availability([DbInventory.id.in_(released)], db)
+
+            # Commit the transaction
+            versions = await self.table_version_repo.commit_with_versions(BOOKING_TABLES, db)
+            self.change_publisher.items_released(released, changes, versions)
+            logger.info("Cancellation of %d bookings successful", len(rows))
+        except Exception as ex:
+            db.rollback()
+            logger.error("Bulk cancellation failed: %s", ex)
+            raise Exception(ex)
+        return [row.booking_reference for row in rows]
+
+    async def get_bookings_versions(self, joined_table_names:List[str], db:Session) -> Dict[str, int]:
         """
+                Retrieve in one query the version counters of the bookings table and of the tables joined to it.
 
-        return db.query(DbBooking).all()
+                :param joined_table_names: The names of the joined tables.
+                :param db: The database session.
+                :return: The version counter per table name.
+        """
+        return await self.table_version_repo.get_versions([DbBooking.__tablename__, *joined_table_names], db)
 
+    async def get_all_bookings(self,db:Session, criteria:list, member_criteria:list, inventory_criteria:list,
+                               with_details:bool=False)-> list[Type[DbBooking]]:
+        """
+                Retrieve the bookings matching the criteria, ordered by booking time.
+                The member and the item are joined only when filtered on or requested, and then loaded by the same
+                query instead of one lazy load per booking.
 
+                :param db: The database session.
+                :param criteria: SQLAlchemy filter expressions on DbBooking.
+                :param member_criteria: SQLAlchemy filter expressions on the booking's DbMember.
+                :param inventory_criteria: SQLAlchemy filter expressions on the booking's DbInventory.
+                :param with_details: Load the member and the item of every booking.
+                :return: The booking objects.
+        """
+        query = db.query(DbBooking).filter(*criteria)
+        if member_criteria or with_details:
+            query = query.join(DbBooking.member).filter(*member_criteria)
+            if with_details:
+                query = query.options(contains_eager(DbBooking.member))
+        if inventory_criteria or with_details:
+            query = query.join(DbBooking.inventory).filter(*inventory_criteria)
+            if with_details:
+                query = query.options(contains_eager(DbBooking.inventory))
+        return query.order_by(DbBooking.booked_at, DbBooking.id).all()
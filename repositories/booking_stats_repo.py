@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.db_booking_stats import DbBookingStats
+from models.db_bookings import DbBooking
+from utils.utilities import Singleton, get_dialect_insert
+
+HOUR = "hour"
+DAY = "day"
+GRANULARITIES = (HOUR, DAY)
+BOOKED = "booked"
+CANCELLED = "cancelled"
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Returns the first instant of the hour or of the day of the given time."""
+    if granularity == DAY:
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class BookingStatsRepo(metaclass=Singleton):
+    """
+       Repository for the booking analytics rollups: the bookings and cancellations per item per hour and per day
+       are incremented inside the booking transactions, so reports read a row per bucket instead of the bookings.
+       The active bookings per member are counted from the bookings table, which keeps the active bookings only.
+    """
+
+    async def record(self, counts: Dict[int, int], column: str, at: datetime, db: Session):
+        """
+                Add the given counts to the hourly and daily buckets of the items inside the caller's transaction.
+                The caller is responsible for committing.
+
+                :param counts: The number of bookings or cancellations per item id.
+                :param column: BOOKED or CANCELLED.
+                :param at: The time of the bookings or cancellations.
+                :param db: The database session.
+        """
+        # a fixed order keeps concurrent transactions from locking the same buckets in opposite orders
+        rows = [{"inventory_id": inventory_id, "granularity": granularity,
+                 "bucket_start": bucket_start(at, granularity), BOOKED: 0, CANCELLED: 0, column: count}
+                for inventory_id, count in sorted(counts.items()) if count > 0
+                for granularity in GRANULARITIES]
+        if not rows:
+            return
+        target = getattr(DbBookingStats, column)
+        insert = get_dialect_insert(db)
+        if insert is not None:
+            stmt = insert(DbBookingStats).values(rows)
+            stmt = stmt.on_conflict_do_update(index_elements=[DbBookingStats.inventory_id,
+                                                              DbBookingStats.granularity,
+                                                              DbBookingStats.bucket_start],
+                                              set_={column: target + getattr(stmt.excluded, column)})
+            db.execute(stmt)
+            return
+
+        for row in rows:
+            updated = db.query(DbBookingStats).filter(DbBookingStats.inventory_id == row["inventory_id"],
+                                                      DbBookingStats.granularity == row["granularity"],
+                                                      DbBookingStats.bucket_start == row["bucket_start"]) \
+                .update({target: target + row[column]}, synchronize_session=False)
+            if not updated:
+                db.add(DbBookingStats(**row))
+                db.flush()
+
+    async def get_buckets(self, granularity: str, criteria: list, db: Session) -> List[DbBookingStats]:
+        """
+                Retrieve the buckets of the given granularity matching the criteria.
+
+                :param granularity: HOUR or DAY.
+                :param criteria: SQLAlchemy filter expressions on DbBookingStats.
+                :param db: The database session.
+                :return: The buckets, ordered by start and item.
+        """
+        return db.query(DbBookingStats).filter(DbBookingStats.granularity == granularity, *criteria) \
+            .order_by(DbBookingStats.bucket_start, DbBookingStats.inventory_id).all()
+
+    async def get_active_bookings(self, criteria: list, limit: int, db: Session) -> list:
+        """
+                Retrieve the members with active bookings matching the criteria, busiest first, counting their rows
+                in the bookings table through its member index. Holds and the booking counts imported with the
+                members are not bookings and are left out.
+
+                :param criteria: SQLAlchemy filter expressions on DbBooking.
+                :param limit: Maximum number of members returned.
+                :param db: The database session.
+                :return: Rows of member_id and active_bookings.
+        """
+        active_bookings = func.count()
+        return db.query(DbBooking.member_id.label("member_id"), active_bookings.label("active_bookings")) \
+            .filter(DbBooking.member_id.isnot(None), *criteria).group_by(DbBooking.member_id) \
+            .order_by(active_bookings.desc(), DbBooking.member_id).limit(limit).all()
@@ -0,0 +1,198 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy.orm import Session
+
+from models.db_bookings import DbBooking
+from models.db_holds import DbHold
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.availability_event_bus import AvailabilityChange
+from repositories.booking_stats_repo import BookingStatsRepo, BOOKED
+from repositories.inventory_catalog_cache import InventoryCatalogEntry
+from repositories.inventory_change_publisher import InventoryChangePublisher
+from repositories.inventory_repo import InventoryRepo
+from repositories.member_repo import MemberRepo
+from repositories.table_version_repo import TableVersionRepo
+from repositories.waitlist_repo import WaitlistRepo
+from utils.tracing import traced
+from utils.utilities import Singleton, new_reference
+
+logger = logging.getLogger(__name__)
+
+HOLD_TABLES = (DbInventory.__tablename__, DbMember.__tablename__)
+BOOKING_TABLES = (DbBooking.__tablename__,) + HOLD_TABLES
+
+
+class HoldRelease(NamedTuple):
+    """Holds released by one transaction: their references, the units given back per item, the items' new
+    availability and the table versions produced."""
+    references: List[str]
+    released: Counter
+    changes: List[AvailabilityChange]
+    versions: Dict[str, int]
+
+
+class HoldRepo(metaclass=Singleton):
+    """
+       Repository for handling time-bounded reservation holds.
+       A hold takes one unit of an item and counts towards the member's booking limit until it is confirmed into
+       a booking, released, or reclaimed after it expired.
+    """
+
+    def __init__(self):
+        """
+                Initializes the HoldRepo with the repositories and the publisher shared with the bookings, the
+                waitlist repository receiving released units and the analytics repository counting confirmations.
+        """
+        self.table_version_repo = TableVersionRepo()
+        self.change_publisher = InventoryChangePublisher()
+        self.member_repo = MemberRepo()
+        self.inventory_repo = InventoryRepo()
+        self.waitlist_repo = WaitlistRepo()
+        self.stats_repo = BookingStatsRepo()
+
+    @traced
+    async def get_hold_from_reference(self, reference:str, db:Session):
+        """
+                Retrieve and lock a hold by its reference.
+
+                :param reference: The hold reference string.
+                :param db: The database session.
+                :return: The hold object if found, else None.
+        """
+        return db.query(DbHold).filter(DbHold.hold_reference == reference).with_for_update().first()
+
+    @traced
+    async def hold_an_item(self, member:DbMember, item:DbInventory, ttl_seconds:int, db:Session):
+        """
+                Reserve one unit of an item for a member.
+
+                :param member: The member object.
+                :param item: The inventory item object.
+                :param ttl_seconds: Number of seconds before the hold expires.
+                :param db: The database session.
+                :return: The created hold object.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        logger.debug("Holding item %s for member %s", item.id, member.id)
+        item_id = item.id
+
+        try:
+            now = datetime.utcnow()
+            hold = DbHold(member_id=member.id, inventory_id=item.id, created_at=now,
+                          expires_at=now + timedelta(seconds=ttl_seconds), hold_reference=new_reference(now))
+            db.add(hold)
+
+            # Update counts
+            member.booking_count += 1
+            item.remaining_count -= 1
+            catalog_entry = InventoryCatalogEntry.from_inventory(item)
+
+            # Commit the transaction
+            versions = await self.table_version_repo.commit_with_versions(HOLD_TABLES, db)
+            self.change_publisher.item_changed(catalog_entry, -1, versions)
+            logger.info("Hold successful: %s", hold.hold_reference)
+        except Exception as ex:
+            db.rollback()
+            self.change_publisher.item_failed(item_id)
+            logger.error("Hold failed: %s", ex)
+            raise Exception(ex)
+        return hold
+
+    @traced
+    async def confirm_hold(self, hold:DbHold, db:Session):
+        """
+                Turn a hold into a booking with the same reference, the counts were already taken by the hold.
+
+                :param hold: The hold object.
+                :param db: The database session.
+                :return: The created booking object.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        logger.debug("Confirming hold %s", hold.hold_reference)
+
+        try:
+            now = datetime.utcnow()
+            booking = DbBooking(member_id=hold.member_id, inventory_id=hold.inventory_id, booked_at=now,
+                                booking_reference=hold.hold_reference)
+            db.delete(hold)
+            db.add(booking)
+            await self.stats_repo.record({hold.inventory_id: 1}, BOOKED, now, db)
+
+            # Commit the transaction
+            await self.table_version_repo.commit_with_versions([DbBooking.__tablename__], db)
+            logger.info("Confirmation successful: %s", booking.booking_reference)
+        except Exception as ex:
+            db.rollback()
+            logger.error("Confirmation failed: %s", ex)
+            raise Exception(ex)
+        return booking
+
+    async def release_holds(self, criteria:list, limit:int, db:Session) -> List[str]:
+        """
+                Release the holds matching the criteria, giving their units back to the items and the members,
+                with set-based aggregate UPDATEs in one transaction.
+                Holds locked by another transaction are skipped on databases supporting SKIP LOCKED.
+
+                :param criteria: SQLAlchemy filter expressions on DbHold.
+                :param limit: Maximum number of holds released.
+                :param db: The database session.
+                :return: The references of the released holds.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        release = await self.release_holds_unpublished(criteria, limit, db)
+        self.publish_release(release)
+        return release.references
+
+    async def release_holds_unpublished(self, criteria:list, limit:int, db:Session) -> HoldRelease:
+        """
+                Release the holds matching the criteria like release_holds, without publishing the released units,
+                for the callers running outside of the event loop thread the publisher must be used from.
+
+                :param criteria: SQLAlchemy filter expressions on DbHold.
+                :param limit: Maximum number of holds released.
+                :param db: The database session.
+                :return: The released holds, to be passed to publish_release on the event loop thread.
+
+                :raises Exception: If an error occurs during the transaction.
+        """
+        try:
+            rows = db.query(DbHold.id, DbHold.hold_reference, DbHold.inventory_id).filter(*criteria) \
+                .order_by(DbHold.expires_at).limit(limit).with_for_update(skip_locked=True).all()
+            if not rows:
+                db.rollback()
+                return HoldRelease([], Counter(), [], {})
+
+            hold_ids = [row.id for row in rows]
+            await self.member_repo.release_booking_counts(DbHold, hold_ids, db)
+            await self.inventory_repo.restock_items(DbHold, hold_ids, db)
+            db.query(DbHold).filter(DbHold.id.in_(hold_ids)).delete(synchronize_session=False)
+            released = Counter(row.inventory_id for row in rows)
+            assigned = await self.waitlist_repo.assign_released_units(released, db)
+            released.subtract(assigned)
+            changes = await self.inventory_repo.get_availability([DbInventory.id.in_(released)], db)
+
+            # Commit the transaction
+            tables = BOOKING_TABLES if assigned else HOLD_TABLES
+            versions = await self.table_version_repo.commit_with_versions(tables, db)
+            logger.info("Released %d holds", len(rows))
+        except Exception as ex:
+            db.rollback()
+            logger.error("Hold release failed: %s", ex)
+            raise Exception(ex)
+        return HoldRelease([row.hold_reference for row in rows], released, changes, versions)
+
+    def publish_release(self, release: HoldRelease):
+        """
+                Publish the units given back by a committed release, on the event loop thread.
+
+                :param release: The released holds.
+        """
+        if release.references:
+            self.change_publisher.items_released(release.released, release.changes, release.versions)
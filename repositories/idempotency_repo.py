@@ -0,0 +1,97 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from configuration.config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_PENDING_TIMEOUT_SECONDS
+from models.db_idempotency_key import DbIdempotencyKey
+from utils.utilities import Singleton, get_dialect_insert
+
+PENDING_RESPONSE = ""  # response of a key whose request is still running
+
+
+class IdempotencyRepo(metaclass=Singleton):
+    """Repository class for the stored results of idempotent requests, shared by all workers."""
+
+    def __init__(self):
+        """Initializes the IdempotencyRepo with a logger."""
+        self.logger = logging.getLogger(__name__)
+
+    async def get_result(self, key: str, db: Session) -> Optional[DbIdempotencyKey]:
+        """Retrieves the stored result of a key if it did not outlive the idempotency TTL, pending keys have none."""
+        oldest = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+        return db.query(DbIdempotencyKey).filter(DbIdempotencyKey.key == key,
+                                                 DbIdempotencyKey.response != PENDING_RESPONSE,
+                                                 DbIdempotencyKey.created_at > oldest).first()
+
+    async def claim_key(self, key: str, request_hash: str, db: Session) -> bool:
+        """
+        Stores a pending row for a key before its request runs, so that the other workers wait for it.
+        A result that outlived the TTL and a pending row abandoned by its worker are taken over.
+
+        Returns:
+            bool: False if another request holds the key.
+        """
+        now = datetime.utcnow()
+        values = dict(key=key, request_hash=request_hash, response=PENDING_RESPONSE, created_at=now)
+        abandoned = now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+        reusable = or_(DbIdempotencyKey.created_at <= now - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+                       and_(DbIdempotencyKey.response == PENDING_RESPONSE, DbIdempotencyKey.created_at <= abandoned))
+        try:
+            insert = get_dialect_insert(db)
+            if insert is not None:
+                stmt = insert(DbIdempotencyKey).values(**values)
+                stmt = stmt.on_conflict_do_update(index_elements=[DbIdempotencyKey.key], set_=values, where=reusable)
+                claimed = db.execute(stmt).rowcount == 1
+            else:
+                db.query(DbIdempotencyKey).filter(DbIdempotencyKey.key == key, reusable) \
+                    .delete(synchronize_session=False)
+                db.add(DbIdempotencyKey(**values))
+                db.flush()
+                claimed = True
+            db.commit()
+            return claimed
+        except IntegrityError:
+            db.rollback()
+            return False
+        except Exception:
+            db.rollback()
+            raise
+
+    async def save_result(self, key: str, request_hash: str, response: str, db: Session):
+        """Stores the result of a key on its pending row."""
+        try:
+            updated = db.query(DbIdempotencyKey).filter(DbIdempotencyKey.key == key,
+                                                        DbIdempotencyKey.request_hash == request_hash,
+                                                        DbIdempotencyKey.response == PENDING_RESPONSE) \
+                .update({DbIdempotencyKey.response: response}, synchronize_session=False)
+            db.commit()
+            if not updated:
+                self.logger.warning("Idempotency key %s was taken over before its result was stored", key)
+        except Exception as ex:
+            db.rollback()
+            self.logger.error("Failed to store the result of idempotency key %s due to: %s", key, ex)
+
+    async def release_key(self, key: str, db: Session):
+        """Deletes the pending row of a key whose request failed, so that the client can retry it."""
+        try:
+            # the failed request may have left its transaction open
+            db.rollback()
+            db.query(DbIdempotencyKey).filter(DbIdempotencyKey.key == key,
+                                              DbIdempotencyKey.response == PENDING_RESPONSE) \
+                .delete(synchronize_session=False)
+            db.commit()
+        except Exception as ex:
+            db.rollback()
+            self.logger.error("Failed to release idempotency key %s due to: %s", key, ex)
+
+    async def delete_expired(self, db: Session) -> int:
+        """Deletes the results that outlived the idempotency TTL."""
+        oldest = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+        deleted = db.query(DbIdempotencyKey).filter(DbIdempotencyKey.created_at <= oldest) \
+            .delete(synchronize_session=False)
+        db.commit()
+        return deleted
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Set
+
+from configuration.config import INVENTORY_CACHE_MAX_SIZE, INVENTORY_CACHE_TTL_SECONDS
+from models.db_inventory import DbInventory
+from utils.ttl_cache import TTLCache
+from utils.utilities import Singleton
+
+
+class InventoryCatalogEntry(NamedTuple):
+    id: int
+    title: str
+    expiration_date: datetime
+    remaining_count: int
+
+    @classmethod
+    def from_inventory(cls, inventory: DbInventory) -> "InventoryCatalogEntry":
+        return cls(inventory.id, inventory.title, inventory.expiration_date, inventory.remaining_count)
+
+
+class InventoryCatalogCache(metaclass=Singleton):
+    """
+       In-process cache of inventory metadata keyed by the item name used in booking requests.
+       The remaining count is approximate: it is refreshed by the bookings done through this process and
+       otherwise bounded in staleness by the TTL.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(INVENTORY_CACHE_MAX_SIZE, INVENTORY_CACHE_TTL_SECONDS)
+        # item id -> item names cached for it, may still hold names already evicted from the cache
+        self.keys_by_id: Dict[int, Set[str]] = {}
+
+    def get(self, item_name: str) -> Optional[InventoryCatalogEntry]:
+        return self.cache.get(item_name)
+
+    def put(self, item_name: str, entry: InventoryCatalogEntry):
+        self.cache.set(item_name, entry)
+        if len(self.keys_by_id) > 2 * self.cache.max_size:
+            self._rebuild_index()
+        self.keys_by_id.setdefault(entry.id, set()).add(item_name)
+
+    def refresh(self, entry: InventoryCatalogEntry):
+        """Writes the latest known state of an item through every name that resolves to it."""
+        for key in self._live_keys(entry.id):
+            self.cache.set(key, entry)
+
+    def invalidate_item(self, inventory_id: int):
+        for key in self._live_keys(inventory_id):
+            self.cache.invalidate(key)
+        self.keys_by_id.pop(inventory_id, None)
+
+    def clear(self):
+        self.cache.clear()
+        self.keys_by_id.clear()
+
+    def _live_keys(self, inventory_id: int):
+        keys = self.keys_by_id.get(inventory_id)
+        if not keys:
+            return []
+        live = [key for key in keys if (cached := self.cache.get(key)) is not None and cached.id == inventory_id]
+        self.keys_by_id[inventory_id] = set(live)
+        return live
+
+    def _rebuild_index(self):
+        self.keys_by_id = {}
+        for key in self.cache.keys():
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.keys_by_id.setdefault(cached.id, set()).add(key)
@@ -0,0 +1,78 @@
+from typing import Dict, List
+
+from models.db_inventory import DbInventory
+from repositories.availability_event_bus import AvailabilityChange, AvailabilityEventBus, AvailabilityNotifyBridge
+from repositories.availability_snapshot import AvailabilitySnapshot
+from repositories.inventory_catalog_cache import InventoryCatalogCache, InventoryCatalogEntry
+from utils.utilities import Singleton
+
+
+class InventoryChangePublisher(metaclass=Singleton):
+    """
+       Propagates committed changes of inventory remaining counts to the in-process read models.
+       Repositories call it right after the commit of a transaction that changed remaining counts, the changes are
+       also published on the availability event bus and notified to the other workers.
+    """
+
+    def __init__(self):
+        self.catalog_cache = InventoryCatalogCache()
+        self.availability_snapshot = AvailabilitySnapshot()
+        self.event_bus = AvailabilityEventBus()
+        self.notify_bridge = AvailabilityNotifyBridge()
+
+    def item_changed(self, catalog_entry: InventoryCatalogEntry, delta: int, versions: Dict[str, int]):
+        """
+                Publish a committed change of one item's remaining count.
+
+                :param catalog_entry: The state of the item after the change.
+                :param delta: The change of the item's remaining count.
+                :param versions: The table versions produced by the change, empty if they could not be bumped.
+        """
+        self.catalog_cache.refresh(catalog_entry)
+        self.availability_snapshot.apply_delta(catalog_entry.id, delta, versions.get(DbInventory.__tablename__))
+        self._publish_availability([AvailabilityChange(catalog_entry.id, catalog_entry.title,
+                                                       catalog_entry.remaining_count)])
+
+    def items_released(self, released: Dict[int, int], changes: List[AvailabilityChange], versions: Dict[str, int]):
+        """
+                Publish committed releases of several items.
+
+                :param released: The number of units released per item id.
+                :param changes: The remaining counts of the items after the release.
+                :param versions: The table versions produced by the change, empty if they could not be bumped.
+        """
+        for inventory_id in released:
+            self.catalog_cache.invalidate_item(inventory_id)
+        self.availability_snapshot.apply_deltas(dict(released), versions.get(DbInventory.__tablename__))
+        self._publish_availability(changes)
+
+    def items_added(self, changes: List[AvailabilityChange]):
+        """
+                Publish committed inventory uploads, the snapshot picks them up from the bumped table version.
+
+                :param changes: The remaining counts of the uploaded items.
+        """
+        self.catalog_cache.clear()
+        self._publish_availability(changes)
+
+    def remote_items_changed(self, changes: List[AvailabilityChange]):
+        """
+                Publish changes committed by another worker, received from the notify bridge.
+
+                :param changes: The remaining counts of the changed items.
+        """
+        for change in changes:
+            self.catalog_cache.invalidate_item(change.id)
+        self.event_bus.publish(changes)
+
+    def item_failed(self, inventory_id: int):
+        """
+                Forget the cached state of an item whose transaction was rolled back.
+
+                :param inventory_id: The id of the item.
+        """
+        self.catalog_cache.invalidate_item(inventory_id)
+
+    def _publish_availability(self, changes: List[AvailabilityChange]):
+        self.event_bus.publish(changes)
+        self.notify_bridge.notify(changes)
@@ -1,54 +1,173 @@
-from logging import Logger
+import logging
+from datetime import datetime
 from typing import List
 
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from configuration.database_config import get_db
 from models.db_inventory import DbInventory
-from utils.utilities import Singleton
+from repositories.availability_event_bus import AvailabilityChange
+from repositories.inventory_catalog_cache import InventoryCatalogCache, InventoryCatalogEntry
+from repositories.inventory_change_publisher import InventoryChangePublisher
+from repositories.table_version_repo import TableVersionRepo
+from utils.tracing import traced
+from utils.utilities import Singleton, log_rejected_rows
+
+# Built once, see MEMBER_BY_NAME_STATEMENT in repositories.member_repo. Only live items, neither marked as expired
+# by the sweeper nor sold out, are locked for a booking
+INVENTORY_BY_TITLE_STATEMENT = select(DbInventory) \
+    .where(DbInventory.title.like(bindparam("title")), ~DbInventory.is_expired, DbInventory.remaining_count > 0) \
+    .limit(1).with_for_update()
 
 
 class InventoryRepo(metaclass=Singleton):
     """Repository class for handling inventory-related database operations."""
 
     def __init__(self):
-        """Initializes the InventoryRepo with a logger."""
-        self.logger = Logger("InventoryRepo")
+        """Initializes the InventoryRepo with a logger, the table version repository, the catalog cache and the
+        change publisher."""
+        self.table_version_repo = TableVersionRepo()
+        self.catalog_cache = InventoryCatalogCache()
+        self.change_publisher = InventoryChangePublisher()
+        self.logger = logging.getLogger(__name__)
+
+    def add_expiry_column(self, engine: Engine):
+        """
+                Adds the is_expired column to an Inventory table created before it existed, create_all only creates
+                the missing tables. Runs before the indexes are created, ix_inventory_live depends on it.
+
+                :param engine: The SQLAlchemy engine.
+        """
+        columns = {column["name"] for column in inspect(engine).get_columns(DbInventory.__tablename__)}
+        if DbInventory.is_expired.key in columns:
+            return
+        table = engine.dialect.identifier_preparer.format_table(DbInventory.__table__)
+        column = CreateColumn(DbInventory.__table__.c.is_expired).compile(dialect=engine.dialect)
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column}"))
+        self.logger.info("Added the is_expired column to the %s table", DbInventory.__tablename__)
 
+    @traced
     async def get_inventory_from_name(self, item_name, db: Session):
-        """Retrieves inventory by item name."""
-        return db.query(DbInventory).filter(DbInventory.title.like(item_name)).with_for_update().first()
+        """Retrieves and locks a live item by name, writing its current state through the catalog cache. Returns
+        None when the item is missing, expired or sold out, after reloading its catalog cache entry."""
+        inventory = db.execute(INVENTORY_BY_TITLE_STATEMENT, {"title": item_name}).scalars().first()
+        if inventory:
+            self.catalog_cache.put(item_name, InventoryCatalogEntry.from_inventory(inventory))
+        else:
+            self._load_catalog_entry(item_name, db)
+        return inventory
+
+    @traced
+    async def get_inventory_catalog_entry(self, item_name, db: Session):
+        """Retrieves the cached catalog entry of an item, reading it without locks on a cache miss."""
+        entry = self.catalog_cache.get(item_name)
+        if entry is None:
+            entry = self._load_catalog_entry(item_name, db)
+        return entry
+
+    def _load_catalog_entry(self, item_name, db: Session):
+        row = db.query(DbInventory.id, DbInventory.title, DbInventory.expiration_date, DbInventory.remaining_count) \
+            .filter(DbInventory.title.like(item_name)).first()
+        if row is None:
+            return None
+        entry = InventoryCatalogEntry(*row)
+        self.catalog_cache.put(item_name, entry)
+        return entry
 
+    @traced
     async def get_inventory(self, id, db: Session):
         """Retrieves inventory by ID."""
         return db.query(DbInventory).filter(DbInventory.id == id).with_for_update().first()
 
+    async def restock_items(self, source_model, source_ids: List[int], db: Session):
+        """Increments remaining_count of every item by the number of its rows among the given bookings or holds,
+        with a single set-based UPDATE inside the caller's transaction."""
+        released = select(func.count()).where(source_model.inventory_id == DbInventory.id,
+                                              source_model.id.in_(source_ids)).scalar_subquery()
+        db.execute(update(DbInventory)
+                   .where(DbInventory.id.in_(select(source_model.inventory_id).where(source_model.id.in_(source_ids))))
+                   .values(remaining_count=DbInventory.remaining_count + released))
+
+    async def get_availability(self, criteria: list, db: Session) -> List[AvailabilityChange]:
+        """Retrieves the remaining count of the items matching the criteria, for the availability events."""
+        rows = db.query(DbInventory.id, DbInventory.title, DbInventory.remaining_count).filter(*criteria).all()
+        return [AvailabilityChange(*row) for row in rows]
+
+    async def mark_expired_items(self, now: datetime, limit: int, db: Session) -> int:
+        """Marks up to limit live items whose expiration date passed as expired, in one transaction found through
+        the live items index. Items locked by another transaction are left for the next batch."""
+        try:
+            ids = [row.id for row in db.query(DbInventory.id)
+                   .filter(~DbInventory.is_expired, DbInventory.remaining_count > 0,
+                           DbInventory.expiration_date <= now)
+                   .order_by(DbInventory.expiration_date).limit(limit).with_for_update(skip_locked=True).all()]
+            if not ids:
+                db.rollback()
+                return 0
+            # is_expired is not part of the listings, the table version is left alone so the snapshot is not reloaded
+            db.execute(update(DbInventory).where(DbInventory.id.in_(ids)).values(is_expired=True))
+            db.commit()
+        except Exception as ex:
+            db.rollback()
+            self.logger.error("Failed to mark expired items due to: %s", ex)
+            raise Exception(ex)
+        return len(ids)
+
     async def add_inventory_bulk(self, inventory: List[DbInventory], db: Session, failure_records: List):
         """Adds multiple inventory items to the database in bulk."""
         try:
             db.bulk_save_objects(inventory)
-            db.commit()
+            await self.table_version_repo.commit_with_versions([DbInventory.__tablename__], db)
         except Exception as ex:
             db.rollback()
-            self.logger.error("Failed to Bulk update data due to: " + str(ex))
+            self.logger.error("Failed to Bulk update data due to: %s", ex)
             failure_records.append("Failed to insert whole document. Rollback whole insertion")
+            return
+        await self._publish_added([inv.title for inv in inventory], db)
 
     async def add_inventory_synchronously(self, inventories: List[DbInventory], db: Session, failure_records):
-        """Adds inventory items to the database one by one."""
+        """Adds inventory items to the database one by one, in one transaction with a savepoint per item so that the
+        rows failing to insert are left out without rolling back the others."""
+        added_titles = []
+        failed = []
         for inv in inventories:
+            title = inv.title
             try:
-                db.add(inv)
-                db.commit()
+                with db.begin_nested():
+                    db.add(inv)
+                added_titles.append(title)
             except Exception as ex:
-                db.rollback()
-                self.logger.error("Failed to insert the row: " + str(inv.__dict__) + " due to: " + str(ex))
+                failed.append(f"{title}: {type(ex).__name__}")
                 failure_records.append("Failed to insert the row: " + str(inv.__dict__) + " due to: " + str(ex)[:20])
+        try:
+            await self.table_version_repo.commit_with_versions([DbInventory.__tablename__], db)
+        except Exception as ex:
+            db.rollback()
+            self.logger.error("Failed to commit the inventory rows due to: %s", ex)
+            failure_records.append("Failed to insert whole document. Rollback whole insertion")
+            return
+        log_rejected_rows(self.logger, "inventory rows", len(inventories), {"failed to insert": failed})
+        await self._publish_added(added_titles, db)
 
     async def add_item_sync(self, inventory: DbInventory, db: Session):
         """Adds a single inventory item to the database synchronously."""
+        title = inventory.title
         db.add(inventory)
-        db.commit()
+        await self.table_version_repo.commit_with_versions([DbInventory.__tablename__], db)
+        await self._publish_added([title], db)
+
+    async def _publish_added(self, titles: List[str], db: Session):
+        """Publishes the availability of the uploaded items, read back by title as bulk inserts return no ids."""
+        titles = list(dict.fromkeys(titles))
+        changes = []
+        for start in range(0, len(titles), 5000):
+            changes.extend(await self.get_availability([DbInventory.title.in_(titles[start:start + 5000])], db))
+        self.change_publisher.items_added(changes)
 
     async def add_single_item_asynch(self, item: DbInventory, db: AsyncSession):
         """Inserts a record and returns the data on success, None on failure."""
@@ -59,9 +178,13 @@ class InventoryRepo(metaclass=Singleton):
             return None
         except Exception as e:
             await db.rollback()
-            print(f"Error inserting record: {item.__dict__}, Error: {e}")  # Log error for debugging
+            self.logger.error("Error inserting item %s: %s", item.title, e)
             return f"Unable to insert record: {item.__dict__} due to Error: {e}"
 
 
+    async def get_inventories_version(self, db: Session) -> int:
+        """Retrieves the version counter of the inventory table."""
+        return await self.table_version_repo.get_version(DbInventory.__tablename__, db)
+
     async def get_all_inventories(self, db: Session):
         return db.query(DbInventory).all()
\ No newline at end of file
@@ -1,51 +1,80 @@
-from logging import Logger
+import logging
 from typing import List
 
+from sqlalchemy import bindparam, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from configuration.database_config import get_db
 from models.db_member import DbMember
-from utils.utilities import Singleton
+from repositories.table_version_repo import TableVersionRepo
+from utils.tracing import traced
+from utils.utilities import Singleton, log_rejected_rows
+
+# Built once: executing a prebuilt statement skips the construction of the query and reuses its cache key,
+# only the bound parameters change between the calls
+MEMBER_BY_NAME_STATEMENT = select(DbMember).where(DbMember.name.like(bindparam("member_name")),
+                                                  DbMember.surname.like(bindparam("member_surname"))) \
+    .limit(1).with_for_update()
 
 
 class MemberRepo(metaclass=Singleton):
     """Repository class for handling member-related database operations. Utilizes Singleton pattern to ensure a single instance."""
 
     def __init__(self):
-        """Initializes the MemberRepo with a logger."""
-        self.logger = Logger("MemberRepo")
+        """Initializes the MemberRepo with a logger and the table version repository."""
+        self.table_version_repo = TableVersionRepo()
+        self.logger = logging.getLogger(__name__)
 
+    @traced
     async def get_member_from_name(self, member_name, member_surname, db: Session):
         """Retrieves a member from the database by name and surname."""
-        return db.query(DbMember).filter(DbMember.name.like(member_name), DbMember.surname.like(member_surname)).with_for_update().first()
+        return db.execute(MEMBER_BY_NAME_STATEMENT, {"member_name": member_name,
+                                                     "member_surname": member_surname}).scalars().first()
+
+    async def release_booking_counts(self, source_model, source_ids: List[int], db: Session):
+        """Decrements booking_count of every member by the number of their rows among the given bookings or holds,
+        with a single set-based UPDATE inside the caller's transaction."""
+        released = select(func.count()).where(source_model.member_id == DbMember.id,
+                                              source_model.id.in_(source_ids)).scalar_subquery()
+        db.execute(update(DbMember)
+                   .where(DbMember.id.in_(select(source_model.member_id).where(source_model.id.in_(source_ids))))
+                   .values(booking_count=DbMember.booking_count - released))
 
     async def add_members_bulk(self, members: List[DbMember], db: Session, failure_records: List):
         """Adds multiple members to the database in bulk."""
         try:
             db.bulk_save_objects(members)
-            db.commit()
+            await self.table_version_repo.commit_with_versions([DbMember.__tablename__], db)
         except Exception as ex:
             db.rollback()
-            self.logger.error(f"Failed to Bulk update data due to: {ex}")
+            self.logger.error("Failed to Bulk update data due to: %s", ex)
             failure_records.append("Failed to bulk upload whole csv. Rollback whole insertion")
 
     async def add_member_synchronously(self, members: List[DbMember], db: Session, failure_records):
-        """Adds members to the database one by one."""
+        """Adds members to the database one by one, in one transaction with a savepoint per member so that the rows
+        failing to insert are left out without rolling back the others."""
+        failed = []
         for mem in members:
             try:
-                db.add(mem)
-                db.commit()
-                db.refresh(mem)
+                with db.begin_nested():
+                    db.add(mem)
             except Exception as ex:
-                db.rollback()
-                self.logger.error(f"Failed to insert the row: {mem.__dict__} due to: {ex}")
+                failed.append(f"{mem.name} {mem.surname}: {type(ex).__name__}")
                 failure_records.append(f"Failed to insert the row: {mem.__dict__} due to: {str(ex)[:20]}")
+        try:
+            await self.table_version_repo.commit_with_versions([DbMember.__tablename__], db)
+        except Exception as ex:
+            db.rollback()
+            self.logger.error("Failed to commit the member rows due to: %s", ex)
+            failure_records.append("Failed to bulk upload whole csv. Rollback whole insertion")
+            return
+        log_rejected_rows(self.logger, "member rows", len(members), {"failed to insert": failed})
 
     async def add_member_sync(self, member: DbMember, db: Session):
         """Adds a single member to the database synchronously."""
         db.add(member)
-        db.commit()
+        await self.table_version_repo.commit_with_versions([DbMember.__tablename__], db)
 
     async def add_single_member_async(self, member: DbMember, db: AsyncSession):
         """Inserts a single member record asynchronously and returns the result."""
@@ -56,8 +85,12 @@ class MemberRepo(metaclass=Singleton):
             return None
         except Exception as e:
             await db.rollback()
-            print(f"Error inserting record: {member.__dict__}, Error: {e}")  # Log error for debugging
+            self.logger.error("Error inserting member %s %s: %s", member.name, member.surname, e)
             return f"Unable to insert record: {member.__dict__} due to Error: {e}"
 
+    async def get_members_version(self, db: Session) -> int:
+        """Retrieves the version counter of the members table."""
+        return await self.table_version_repo.get_version(DbMember.__tablename__, db)
+
     async def get_all_members(self, db: Session):
         return db.query(DbMember).all()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy.orm import Session
+
+from models.db_table_version import DbTableVersion
+from utils.utilities import Singleton, get_dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+class TableVersionRepo(metaclass=Singleton):
+    """
+       Repository for the per-table version counters used to validate cached listings (ETags).
+    """
+
+    async def get_version(self, table_name: str, db: Session) -> int:
+        """
+                Retrieve the current version of a table.
+
+                :param table_name: The name of the table.
+                :param db: The database session.
+                :return: The version counter, 0 if the table was never written through the repositories.
+        """
+        version = db.query(DbTableVersion.version).filter(DbTableVersion.table_name == table_name).scalar()
+        return version or 0
+
+    async def get_versions(self, table_names: Iterable[str], db: Session) -> Dict[str, int]:
+        """
+                Retrieve the current versions of several tables in one query.
+
+                :param table_names: The names of the tables.
+                :param db: The database session.
+                :return: The version counter per table name, 0 for the tables never written through the repositories.
+        """
+        table_names = list(table_names)
+        rows = db.query(DbTableVersion.table_name, DbTableVersion.version) \
+            .filter(DbTableVersion.table_name.in_(table_names)).all()
+        versions = dict.fromkeys(table_names, 0)
+        versions.update({row.table_name: row.version for row in rows})
+        return versions
+
+    async def bump_versions(self, table_names: Iterable[str], db: Session) -> Dict[str, int]:
+        """
+                Increment the version of the given tables inside the caller's transaction.
+                The caller is responsible for committing, so the bump becomes visible together with the write.
+
+                :param table_names: The names of the tables that were modified.
+                :param db: The database session.
+                :return: The new version of every bumped table.
+        """
+        insert = get_dialect_insert(db)
+        # sorted so that concurrent transactions lock the counters in the same order
+        table_names = sorted(set(table_names))
+        if insert is not None and table_names:
+            stmt = insert(DbTableVersion).values([{"table_name": table_name, "version": 1}
+                                                  for table_name in table_names])
+            stmt = stmt.on_conflict_do_update(index_elements=[DbTableVersion.table_name],
+                                              set_={"version": DbTableVersion.version + 1})
+            return dict(db.execute(stmt.returning(DbTableVersion.table_name, DbTableVersion.version)).all())
+
+        versions = {}
+        for table_name in table_names:
+            updated = db.query(DbTableVersion).filter(DbTableVersion.table_name == table_name) \
+                .update({DbTableVersion.version: DbTableVersion.version + 1}, synchronize_session=False)
+            if not updated:
+                db.add(DbTableVersion(table_name=table_name, version=1))
+                db.flush()
+            versions[table_name] = await self.get_version(table_name, db)
+        return versions
+
+    async def commit_with_versions(self, table_names: Iterable[str], db: Session) -> Dict[str, int]:
+        """
+                Increment the version of the given tables as the last statement of the caller's write transaction and
+                commit it, so that the write and the new versions become visible together or not at all. The counter
+                rows are shared by every write, bumping them last keeps them locked for the commit only.
+                Every repository writing a versioned table commits through it.
+
+                :param table_names: The names of the tables that were modified.
+                :param db: The database session, with the write pending.
+                :return: The new version of every bumped table.
+
+                :raises Exception: If the bump or the commit fails, the caller rolls the write back.
+        """
+        versions = await self.bump_versions(table_names, db)
+        db.commit()
+        return versions
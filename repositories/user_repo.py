@@ -1,19 +1,52 @@
+import threading
 from typing import Optional, Type
 
 from fastapi.params import Depends
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
+from configuration.config import AUTH_USER_CACHE_MAX_SIZE, AUTH_USER_CACHE_TTL_SECONDS
 from configuration.database_config import get_db
 from dto.auth_dto import AuthenticationCreationRequestBody
 from models.db_user import DbUser
 from utils.hash import Hash
+from utils.ttl_cache import TTLCache
 from utils.utilities import Singleton
 
+# Built once, see MEMBER_BY_NAME_STATEMENT in repositories.member_repo
+USER_BY_USERNAME_STATEMENT = select(DbUser).where(DbUser.username.like(bindparam("username"))).limit(1)
+
 
 class UserRepository(metaclass=Singleton):
 
+    def __init__(self):
+        # users of the validated tokens, read from the threadpool the sync dependencies run in
+        self.token_users = TTLCache(AUTH_USER_CACHE_MAX_SIZE, AUTH_USER_CACHE_TTL_SECONDS)
+        self._token_users_lock = threading.Lock()
+
     def get_user(self, username:str,db:Session)-> Optional[Type[DbUser]]:
-        return db.query(DbUser).filter(DbUser.username.like(username)).first()
+        return db.execute(USER_BY_USERNAME_STATEMENT, {"username": username}).scalars().first()
+
+    def get_token_user(self, username:str, db:Session) -> Optional[DbUser]:
+        """
+                Retrieve the user of a validated token, cached for AUTH_USER_CACHE_TTL_SECONDS so that most requests
+                are authenticated without a database round trip. The session only connects on a cache miss.
+                The cached user is detached from the session, its columns can be read.
+
+                :param username: The username of the token.
+                :param db: The database session used on a cache miss.
+                :return: The user if found, else None.
+        """
+        with self._token_users_lock:
+            user = self.token_users.get(username)
+        if user is None:
+            user = self.get_user(username, db)
+            if user is None:
+                return None
+            db.expunge(user)
+            with self._token_users_lock:
+                self.token_users.set(username, user)
+        return user
 
     def create_user(self, request: AuthenticationCreationRequestBody,db:Session):
         new_user = DbUser(
@@ -0,0 +1,154 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from configuration.config import MAX_BOOKINGS, WAITLIST_SCAN_LIMIT
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from models.db_waitlist import DbWaitlistEntry
+from repositories.booking_stats_repo import BookingStatsRepo, BOOKED
+from utils.utilities import Singleton, new_reference, get_dialect_insert
+
+logger = logging.getLogger(__name__)
+
+WAITING = "waiting"
+ASSIGNED = "assigned"
+
+
+class WaitlistRepo(metaclass=Singleton):
+    """
+       Repository for the per-item waitlists of depleted items.
+       Units released by cancellations are handed to the head of the waitlist inside the releasing transaction.
+    """
+
+    def __init__(self):
+        """Initializes the WaitlistRepo with the analytics repository counting the assigned bookings."""
+        self.stats_repo = BookingStatsRepo()
+
+    async def get_entry(self, entry_id:int, db:Session) -> Optional[DbWaitlistEntry]:
+        """
+                Retrieve a waitlist entry by its id.
+
+                :param entry_id: The id of the entry.
+                :param db: The database session.
+                :return: The entry if found, else None.
+        """
+        return db.query(DbWaitlistEntry).filter(DbWaitlistEntry.id == entry_id).first()
+
+    async def get_waiting_entry(self, member_id:int, inventory_id:int, db:Session) -> Optional[DbWaitlistEntry]:
+        """
+                Retrieve the entry of a member still waiting for an item.
+
+                :param member_id: The id of the member.
+                :param inventory_id: The id of the item.
+                :param db: The database session.
+                :return: The entry if found, else None.
+        """
+        return db.query(DbWaitlistEntry).filter(DbWaitlistEntry.member_id == member_id,
+                                                DbWaitlistEntry.inventory_id == inventory_id,
+                                                DbWaitlistEntry.status == WAITING).first()
+
+    async def get_position(self, entry:DbWaitlistEntry, db:Session) -> int:
+        """
+                Number of entries waiting for the same item ahead of the given entry, plus one.
+
+                :param entry: The waiting entry.
+                :param db: The database session.
+                :return: The 1-based position of the entry in the waitlist.
+        """
+        ahead = db.query(func.count(DbWaitlistEntry.id)).filter(DbWaitlistEntry.inventory_id == entry.inventory_id,
+                                                               DbWaitlistEntry.status == WAITING,
+                                                               DbWaitlistEntry.id < entry.id).scalar()
+        return ahead + 1
+
+    async def add_entry(self, member_id:int, inventory_id:int, db:Session) -> DbWaitlistEntry:
+        """
+                Append a member to the waitlist of an item inside the caller's transaction, unless the member is
+                already waiting for it. The partial unique index on the waiting entries keeps concurrent requests
+                from adding twice.
+
+                :param member_id: The id of the member.
+                :param inventory_id: The id of the item.
+                :param db: The database session.
+                :return: The waiting entry of the member, the created one or the existing one.
+        """
+        insert = get_dialect_insert(db)
+        if insert is not None:
+            stmt = insert(DbWaitlistEntry).values(member_id=member_id, inventory_id=inventory_id, status=WAITING,
+                                                  enqueued_at=datetime.utcnow())
+            stmt = stmt.on_conflict_do_nothing(index_elements=[DbWaitlistEntry.member_id,
+                                                               DbWaitlistEntry.inventory_id],
+                                               index_where=DbWaitlistEntry.status == WAITING)
+            db.execute(stmt)
+        elif not await self.get_waiting_entry(member_id, inventory_id, db):
+            db.add(DbWaitlistEntry(member_id=member_id, inventory_id=inventory_id, status=WAITING))
+            db.flush()
+        return await self.get_waiting_entry(member_id, inventory_id, db)
+
+    async def assign_released_units(self, released:Dict[int, int], db:Session) -> Counter:
+        """
+                Book released units for the members at the head of the items' waitlists, inside the caller's
+                transaction. Entries of members that reached MAX_BOOKINGS are passed over and keep their place, the
+                waitlist is read WAITLIST_SCAN_LIMIT entries at a time until the units are assigned or no entry is
+                left. Members whose row is locked by another transaction are skipped as well.
+
+                :param released: The number of units released per item id.
+                :param db: The database session.
+                :return: The number of units assigned per item id.
+        """
+        assigned = Counter()
+        for inventory_id, units in released.items():
+            if units > 0:
+                assigned[inventory_id] = await self._assign_item_units(inventory_id, units, db)
+        assigned = +assigned
+        if assigned:
+            db.flush()
+            await self.stats_repo.record(assigned, BOOKED, datetime.utcnow(), db)
+        return assigned
+
+    async def _assign_item_units(self, inventory_id:int, units:int, db:Session) -> int:
+        item = None
+        assigned = 0
+        last_id = 0
+        while assigned < units:
+            entries = db.query(DbWaitlistEntry) \
+                .join(DbMember, DbMember.id == DbWaitlistEntry.member_id) \
+                .filter(DbWaitlistEntry.inventory_id == inventory_id, DbWaitlistEntry.status == WAITING,
+                        DbWaitlistEntry.id > last_id, DbMember.booking_count < int(MAX_BOOKINGS)) \
+                .order_by(DbWaitlistEntry.id).limit(WAITLIST_SCAN_LIMIT) \
+                .with_for_update(skip_locked=True, of=DbWaitlistEntry).all()
+            if not entries:
+                break
+
+            if item is None:
+                item = db.query(DbInventory).filter(DbInventory.id == inventory_id).populate_existing() \
+                    .with_for_update().first()
+                if item.expiration_date <= datetime.utcnow():
+                    break
+
+            for entry in entries:
+                if assigned >= units or item.remaining_count <= 0:
+                    return assigned
+                member = db.query(DbMember).filter(DbMember.id == entry.member_id).populate_existing() \
+                    .with_for_update(skip_locked=True).first()
+                if not member or member.booking_count >= int(MAX_BOOKINGS):
+                    continue
+
+                now = datetime.utcnow()
+                booking = DbBooking(member_id=member.id, inventory_id=item.id, booked_at=now,
+                                    booking_reference=new_reference(now))
+                db.add(booking)
+                member.booking_count += 1
+                item.remaining_count -= 1
+                entry.status = ASSIGNED
+                entry.booking_reference = booking.booking_reference
+                entry.assigned_at = now
+                assigned += 1
+                logger.info("Assigned item %s to waiting member %s: %s", item.id, member.id, booking.booking_reference)
+            last_id = entries[-1].id
+        return assigned
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -10,4 +11,80 @@ class BookingBase(BaseModel):
         booking_reference: str
 
         class Config():
-            from_attributes = True
\ No newline at end of file
+            from_attributes = True
+
+
+class BookingMember(BaseModel):
+        id: int
+        name: str
+        surname: str
+
+        class Config():
+            from_attributes = True
+
+
+class BookingItem(BaseModel):
+        id: int
+        title: str
+        expiration_date: datetime
+
+        class Config():
+            from_attributes = True
+
+
+class BookingDetails(BookingBase):
+        member: BookingMember
+        inventory: BookingItem
+
+
+class HoldBase(BaseModel):
+        member_id: int
+        inventory_id: int
+        created_at: datetime
+        expires_at: datetime
+        hold_reference: str
+
+        class Config():
+            from_attributes = True
+
+
+class BulkCancelResult(BaseModel):
+        booking_reference: str
+        status: str
+
+
+class WaitlistEntryBase(BaseModel):
+        id: int
+        member_id: int
+        inventory_id: int
+        enqueued_at: datetime
+        status: str
+        booking_reference: Optional[str] = None
+        position: Optional[int] = None
+
+        class Config():
+            from_attributes = True
+
+
+class BookingStatsBucket(BaseModel):
+        inventory_id: int
+        bucket_start: datetime
+        booked: int
+        cancelled: int
+
+        class Config():
+            from_attributes = True
+
+
+class MemberActiveBookings(BaseModel):
+        member_id: int
+        active_bookings: int
+
+        class Config():
+            from_attributes = True
+
+
+class BookingStats(BaseModel):
+        granularity: str
+        buckets: List[BookingStatsBucket]
+        members: List[MemberActiveBookings]
@@ -0,0 +1,130 @@
+import math
+import time
+from collections import Counter
+from typing import Hashable, Optional
+
+from fastapi import Depends, HTTPException, status
+
+from configuration.config import ADMISSION_RATE_PER_SECOND, ADMISSION_BURST, ADMISSION_MAX_IN_FLIGHT, \
+    ADMISSION_QUEUE_BUDGET_MS, ADMISSION_MAX_PRINCIPALS
+from models.db_user import DbUser
+from services.auth_service import AuthService
+from services.booking_service import BookingService
+from utils.ttl_cache import TTLCache
+from utils.utilities import Singleton
+
+RATE_LIMITED = "rate_limited"
+OVER_CAPACITY = "over_capacity"
+QUEUE_BUDGET = "queue_budget"
+
+auth_service: AuthService = AuthService()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second up to burst tokens, starting full."""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class AdmissionService(metaclass=Singleton):
+    """
+       Service class admitting the booking requests before they queue on the booking lock, so that under overload
+       they are rejected at once with a Retry-After header instead of all timing out:
+       - every user gets ADMISSION_RATE_PER_SECOND requests per second with bursts of ADMISSION_BURST, beyond
+         which it gets a 429,
+       - at most ADMISSION_MAX_IN_FLIGHT admitted requests are served at once, beyond which a 503 is returned,
+       - a 503 is returned as well when the estimated wait for the booking lock exceeds ADMISSION_QUEUE_BUDGET_MS.
+       A limit set to 0 is disabled.
+       Utilizes Singleton pattern to ensure a single instance.
+    """
+    def __init__(self):
+        """
+               Initializes the AdmissionService with the limits and the token buckets of the recent users. The bucket
+               of a user idle long enough to refill is dropped, a new one starts full as well.
+        """
+        self.rate = ADMISSION_RATE_PER_SECOND
+        self.burst = ADMISSION_BURST
+        self.max_in_flight = ADMISSION_MAX_IN_FLIGHT
+        self.queue_budget = ADMISSION_QUEUE_BUDGET_MS / 1000
+        self.buckets = TTLCache(ADMISSION_MAX_PRINCIPALS, self.burst / self.rate if self.rate > 0 else 0)
+        self.booking_service = BookingService()
+        self.in_flight = 0
+        self.rejections = Counter()
+
+    def estimated_wait(self) -> float:
+        """
+               Estimates in seconds how long a request admitted now would wait for the booking lock: the requests
+               waiting for the lock and the one holding it, each for the recent average hold time. Admitted requests
+               that never take the lock, like the fast-path cancellations, are not part of the queue.
+        """
+        queued = self.booking_service.lock_waiters + (1 if self.booking_service.lock.locked() else 0)
+        return queued * self.booking_service.lock_hold_average
+
+    def check(self, principal: Hashable, now: Optional[float] = None) -> Optional[TokenBucket]:
+        """
+               Checks that a request of the principal can be admitted now, without admitting it.
+
+               Args:
+                   principal (Hashable): The user sending the request.
+                   now (float): The monotonic clock, injectable for tests.
+
+               Returns:
+                   TokenBucket: The bucket of the principal to take a token from, None without rate limit.
+
+               Raises:
+                   HTTPException: 429 when the principal is over its rate, 503 when the service is overloaded.
+        """
+        now = time.monotonic() if now is None else now
+        bucket = None
+        if self.rate > 0:
+            bucket = self.buckets.get(principal)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, now)
+            self.buckets.set(principal, bucket)
+            wait = bucket.wait_time(now)
+            if wait > 0:
+                self.reject(RATE_LIMITED, status.HTTP_429_TOO_MANY_REQUESTS, wait)
+
+        if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+            self.reject(OVER_CAPACITY, status.HTTP_503_SERVICE_UNAVAILABLE, self.estimated_wait())
+        if self.queue_budget > 0:
+            wait = self.estimated_wait()
+            if wait > self.queue_budget:
+                self.reject(QUEUE_BUDGET, status.HTTP_503_SERVICE_UNAVAILABLE, wait - self.queue_budget)
+        return bucket
+
+    def reject(self, reason: str, status_code: int, retry_after: float):
+        self.rejections[reason] += 1
+        raise HTTPException(status_code=status_code,
+                            detail="Too many requests" if status_code == status.HTTP_429_TOO_MANY_REQUESTS
+                            else "Service overloaded, retry later",
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    async def admit(self, user: DbUser = Depends(auth_service.validate_token)):
+        """
+               Dependency admitting the request of the authenticated user for as long as it is served.
+
+               Raises:
+                   HTTPException: 429 or 503 with a Retry-After header when the request is not admitted.
+        """
+        bucket = self.check(user.id)
+        if bucket is not None:
+            bucket.take()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
@@ -7,8 +7,8 @@ from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer, HT
 from jose import jwt, JWTError
 from requests import Session
 
-from configuration.config import SECRET_KEY, ALGORITHM
-from configuration.database_config import get_db
+from configuration.config import SECRET_KEY, ALGORITHM, ADMIN_USERNAMES
+from configuration.database_config import get_db, SessionLocal
 from dto.auth_dto import AuthenticationCreationRequestBody
 from models.db_user import DbUser
 from repositories.user_repo import UserRepository
@@ -81,10 +81,10 @@ class AuthService(metaclass=Singleton):
 
     def validate_token(self,token: HTTPAuthorizationCredentials = Depends(jwt_bearer),db:Session=Depends(get_db)):
         """
-               Validate the JWT token.
+               Validate the JWT token, its user is read through the token user cache.
 
                :param token: HTTPAuthorizationCredentials containing the token.
-               :param db: Database session.
+               :param db: Database session, only connected on a cache miss.
                :return: The user object if the token is valid.
                :raises HTTPException: If the token is invalid or the user is not found.
         """
@@ -103,10 +103,56 @@ class AuthService(metaclass=Singleton):
         except JWTError:
             raise credentials_exception
 
-        user = self.user_repo.get_user(username=username,db=db)
+        user = self.user_repo.get_token_user(username,db)
 
         if user is None:
             raise credentials_exception
 
         return user
 
+    def validate_token_in_own_session(self,token: HTTPAuthorizationCredentials = Depends(jwt_bearer)):
+        """
+               Validate the JWT token with a session of its own, closed before the endpoint runs, for the long lived
+               responses such as the availability stream which would otherwise hold a pooled connection until the
+               client disconnects.
+
+               :param token: HTTPAuthorizationCredentials containing the token.
+               :return: The user object if the token is valid.
+               :raises HTTPException: If the token is invalid or the user is not found.
+        """
+        db = SessionLocal()
+        try:
+            return self.validate_token(token, db)
+        finally:
+            db.close()
+
+    def validate_admin(self,token: HTTPAuthorizationCredentials = Depends(jwt_bearer),db:Session=Depends(get_db)):
+        """
+               Validate the JWT token and that its user is an administrator, listed in ADMIN_USERNAMES.
+
+               :param token: HTTPAuthorizationCredentials containing the token.
+               :param db: Database session.
+               :return: The user object if it is an administrator.
+               :raises HTTPException: If the token is invalid or the user is not an administrator.
+        """
+        user = self.validate_token(token, db)
+        if user.username not in ADMIN_USERNAMES:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Administrator access required')
+        return user
+
+    def is_admin_authorization(self, authorization: Optional[str]) -> bool:
+        """
+               Check without a database lookup whether an Authorization header carries a valid token of an
+               administrator, for the middlewares running before the endpoint dependencies.
+
+               :param authorization: The Authorization header value, "Bearer <token>".
+               :return: True if the token is valid and its user is listed in ADMIN_USERNAMES.
+        """
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return False
+        return payload.get("username") in ADMIN_USERNAMES
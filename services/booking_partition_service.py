@@ -0,0 +1,74 @@
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy.orm import Session
+
+from configuration.config import BOOKINGS_PARTITIONS_AHEAD, BOOKINGS_RETENTION_MONTHS, \
+    BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS
+from configuration.database_config import SessionLocal, engine
+from repositories.booking_partition_repo import BookingPartitionRepo, month_start
+from repositories.inventory_change_publisher import InventoryChangePublisher
+from utils.utilities import Singleton
+
+
+class BookingPartitionService(metaclass=Singleton):
+    """
+       Service class maintaining the monthly partitions of the bookings table: the partitions of the coming
+       BOOKINGS_PARTITIONS_AHEAD months are created ahead of time and, when BOOKINGS_RETENTION_MONTHS is set, the
+       partitions older than the retention period are archived.
+       Utilizes Singleton pattern to ensure a single instance.
+    """
+    def __init__(self):
+        """
+               Initializes the BookingPartitionService with the partition repository and a logger.
+        """
+        self.partition_repo = BookingPartitionRepo()
+        self.change_publisher = InventoryChangePublisher()
+        self.logger = logging.getLogger(__name__)
+
+    async def maintain_partitions(self, db: Session):
+        """
+                Creates the upcoming partitions and archives the expired ones.
+
+                Args:
+                    db (Session): The database session.
+
+                Returns:
+                    tuple: The names of the created partitions and the archived partitions, whose released units
+                    are not published yet.
+        """
+        current_month = month_start(datetime.datetime.utcnow())
+        created = await self.partition_repo.create_partitions(current_month, BOOKINGS_PARTITIONS_AHEAD + 1, db)
+        archived = []
+        if BOOKINGS_RETENTION_MONTHS > 0:
+            archived = await self.partition_repo.archive_partitions(
+                month_start(current_month, -BOOKINGS_RETENTION_MONTHS), db)
+        return created, archived
+
+    def _maintain_in_thread(self):
+        db = SessionLocal()
+        try:
+            return asyncio.run(self.maintain_partitions(db))
+        finally:
+            db.close()
+
+    async def run_partition_maintenance(self):
+        """
+                Background task maintaining the partitions at startup and every
+                BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS, when partitioning is enabled. The DDL runs in the
+                default executor, the units released by the archived bookings are published back on the event loop.
+        """
+        if not self.partition_repo.is_enabled(engine):
+            return
+        while True:
+            try:
+                created, archived = await asyncio.get_running_loop().run_in_executor(None, self._maintain_in_thread)
+                for partition in archived:
+                    self.change_publisher.items_released(partition.released, partition.changes, partition.versions)
+                if created or archived:
+                    self.logger.info("Created booking partitions %s, archived %s", created,
+                                     [partition.name for partition in archived])
+            except Exception as ex:
+                self.logger.error("Failed to maintain booking partitions due to: %s", ex)
+            await asyncio.sleep(BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS)
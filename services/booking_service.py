@@ -1,19 +1,37 @@
 import asyncio
+import contextlib
 import datetime
+import json
+import time
+from typing import Optional, Tuple
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from configuration.config import MAX_BOOKINGS
-from dto.booking_dto import ItemBookRequestBody, ItemCancelRequest
+from configuration.config import MAX_BOOKINGS, FAST_CANCEL_ENABLED
+from dto.booking_dto import ItemBookRequestBody, ItemCancelRequest, BulkCancelRequest, BookingQuery, \
+    BookingStatsQuery
+from models.db_booking_stats import DbBookingStats
 from models.db_inventory import DbInventory
 from models.db_member import DbMember
 from repositories.booking_repo import BookingRepo, DbBooking
+from repositories.booking_stats_repo import BookingStatsRepo, bucket_start
 from repositories.inventory_repo import InventoryRepo
 from repositories.member_repo import MemberRepo
+from repositories.waitlist_repo import WaitlistRepo, WAITING
+from schemas.bookings import BulkCancelResult, WaitlistEntryBase, BookingStats, BookingStatsBucket, \
+    MemberActiveBookings
 from utils.exceptions import MemberNotFoundException, MemberExhaustedLimitException, \
-    ItemExpiredException, ItemDepletedException, ItemNotFoundException, BookingNotFoundException
+    ItemExpiredException, ItemDepletedException, ItemNotFoundException, BookingNotFoundException, \
+    WaitlistEntryNotFoundException, DeadlineExceededException
+from utils.deadline import remaining
+from utils.metrics import Histogram
+from utils.tracing import traced, span
 from utils.utilities import Singleton
 
+# Weight of the latest hold in the moving average of the booking lock hold time
+LOCK_HOLD_SMOOTHING = 0.1
+
 
 class BookingService(metaclass=Singleton):
     """
@@ -22,13 +40,55 @@ class BookingService(metaclass=Singleton):
     """
     def __init__(self):
         """
-               Initializes the BookingService with repositories for booking, member, and inventory.
+               Initializes the BookingService with repositories for booking, member, inventory, waitlist and
+               booking analytics.
         """
         self.booking_repo = BookingRepo()
         self.member_repo = MemberRepo()
         self.inventory_repo = InventoryRepo()
+        self.waitlist_repo = WaitlistRepo()
+        self.stats_repo = BookingStatsRepo()
         self.lock = asyncio.Lock()
+        self.lock_wait = Histogram()
+        self.lock_waiters = 0
+        self.lock_hold_average = 0.0
+
+    @contextlib.asynccontextmanager
+    async def locked(self, db:Session):
+        """
+                Holds the booking lock. The session is rolled back before waiting and before releasing, so neither
+                its pooled connection nor its row locks are kept while other requests wait.
+
+                Args:
+                    db (Session): The database session, without pending changes.
+
+                Raises:
+                    DeadlineExceededException: If the request deadline passes while waiting for the lock.
+        """
+        db.rollback()
+        started = time.perf_counter()
+        self.lock_waiters += 1
+        try:
+            with span("booking_lock"):
+                timeout = remaining()
+                if timeout is None:
+                    await self.lock.acquire()
+                else:
+                    await asyncio.wait_for(self.lock.acquire(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceededException("Request deadline exceeded waiting for the booking lock")
+        finally:
+            self.lock_waiters -= 1
+        self.lock_wait.observe(time.perf_counter() - started)
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            db.rollback()
+            self.lock.release()
+            self.lock_hold_average += LOCK_HOLD_SMOOTHING * (time.perf_counter() - acquired - self.lock_hold_average)
 
+    @traced
     async def validate_member_and_items(self, request:ItemBookRequestBody,db:Session):
         """
                Validates the member and item for booking.
@@ -52,8 +112,14 @@ class BookingService(metaclass=Singleton):
             raise MemberNotFoundException("MemberName provided not present in database")
         if member.booking_count>=int(MAX_BOOKINGS):
             raise MemberExhaustedLimitException("Reached maximum booking limit of " + str(MAX_BOOKINGS))
+
+        # Reject items known to be missing, expired or sold out from the catalog cache before locking the item row
+        self._check_catalog_entry(await self.inventory_repo.get_inventory_catalog_entry(request.item_name,db))
+
         inventory:DbInventory = await self.inventory_repo.get_inventory_from_name(request.item_name,db)
         if not inventory:
+            # no live row to lock, the reloaded catalog entry tells why
+            self._check_catalog_entry(await self.inventory_repo.get_inventory_catalog_entry(request.item_name,db))
             raise ItemNotFoundException("ItemName provided not in Database")
         if inventory.expiration_date <= datetime.datetime.utcnow():
             raise ItemExpiredException("item expired")
@@ -61,6 +127,15 @@ class BookingService(metaclass=Singleton):
             raise ItemDepletedException("item depleted")
         return member,inventory
 
+    def _check_catalog_entry(self, catalog_entry):
+        if not catalog_entry:
+            raise ItemNotFoundException("ItemName provided not in Database")
+        if catalog_entry.expiration_date <= datetime.datetime.utcnow():
+            raise ItemExpiredException("item expired")
+        if catalog_entry.remaining_count <= 0:
+            raise ItemDepletedException("item depleted")
+
+    @traced
     async def validate_booking(self,request:ItemCancelRequest,db:Session):
         """
                Validates the booking for cancellation.
@@ -82,7 +157,7 @@ class BookingService(metaclass=Singleton):
             raise MemberNotFoundException("MemberName provided not present in database")
 
         order: DbBooking = await self.booking_repo.get_booking_from_reference(request.booking_reference,db)
-        if not order:
+        if not order or order.member_id != member.id:
             raise BookingNotFoundException("Booking Id provided not in Database")
 
         inventory:DbInventory = await self.inventory_repo.get_inventory(order.inventory_id,db)
@@ -90,6 +165,7 @@ class BookingService(metaclass=Singleton):
         return member,order,inventory
 
 
+    @traced
     async def book_an_item(self, request:ItemBookRequestBody,db:Session):
         """
                 Books an item for a member.
@@ -101,10 +177,11 @@ class BookingService(metaclass=Singleton):
                 Returns:
                     DbBooking: The booking record created.
         """
-        async with self.lock:
+        async with self.locked(db):
             member, item = await self.validate_member_and_items(request,db)
             return await self.booking_repo.book_an_item(member,item,db)
 
+    @traced
     async def cancel_booking(self, request:ItemCancelRequest,db:Session):
         """
                 Cancels a booking for a member.
@@ -116,16 +193,196 @@ class BookingService(metaclass=Singleton):
                 Returns:
                     DbBooking: The booking record cancelled.
         """
-        async with self.lock:
+        if FAST_CANCEL_ENABLED and self.booking_repo.supports_cancel_by_reference(db):
+            # A single atomic statement, the row locks it takes are enough and the service lock is not needed
+            result = await self.booking_repo.cancel_by_reference(request.member_name, request.member_surname,
+                                                                 request.booking_reference, db)
+            if not result:
+                raise MemberNotFoundException("MemberName provided not present in database")
+            if result.inventory_id is None:
+                raise BookingNotFoundException("Booking Id provided not in Database")
+            return result
+
+        async with self.locked(db):
             member, order, inventory = await self.validate_booking(request,db)
             return await self.booking_repo.cancel_an_item(member,order, inventory,db)
 
-    async def view_all_bookings(self, db:Session):
-        return await self.booking_repo.get_all_bookings(db)
+    async def bulk_cancel(self, request:BulkCancelRequest, db:Session):
+        """
+                Cancels every booking matching the given references, member and/or item in one transaction.
+
+                Args:
+                    request (BulkCancelRequest): The references and/or the member and item whose bookings are cancelled,
+                        all given criteria must match.
+                    db (Session): The database session.
 
+                Returns:
+                    list: The outcome per booking reference, requested references that did not match are reported
+                        as not_found.
+        """
+        criteria = []
+        if request.booking_references:
+            criteria.append(DbBooking.booking_reference.in_(set(request.booking_references)))
+            criteria.append(DbBooking.booked_at >= self.booking_repo.booked_after(request.booking_references))
+        if request.member_name:
+            criteria.append(DbBooking.member_id.in_(
+                select(DbMember.id).where(DbMember.name.like(request.member_name),
+                                          DbMember.surname.like(request.member_surname))))
+        if request.item_name:
+            criteria.append(DbBooking.inventory_id.in_(
+                select(DbInventory.id).where(DbInventory.title.like(request.item_name))))
 
+        cancelled = await self.booking_repo.cancel_bookings(criteria, db)
+        results = [BulkCancelResult(booking_reference=reference, status="cancelled") for reference in cancelled]
+        if request.booking_references:
+            cancelled = set(cancelled)
+            results.extend(BulkCancelResult(booking_reference=reference, status="not_found")
+                           for reference in dict.fromkeys(request.booking_references) if reference not in cancelled)
+        return results
 
+    async def join_waitlist(self, request:ItemBookRequestBody, db:Session) -> WaitlistEntryBase:
+        """
+                Puts a member on the waitlist of a depleted item, the next released unit of the item is booked for
+                the member at the head of the waitlist. The item is read again under the booking lock, units back in
+                stock since it was found depleted are assigned to the waitlist right away.
 
+                Args:
+                    request (ItemBookRequestBody): The request body containing member and item details.
+                    db (Session): The database session.
+
+                Raises:
+                    MemberNotFoundException: If the member is not found in the database.
+                    MemberExhaustedLimitException: If the member has reached the maximum booking limit.
+                    ItemNotFoundException: If the item is not found in the database.
 
+                Returns:
+                    WaitlistEntryBase: The waitlist entry of the member, an existing one if already waiting.
+        """
+        async with self.locked(db):
+            member:DbMember = await self.member_repo.get_member_from_name(request.member_name,
+                                                                          request.member_surname,db)
+            if not member:
+                raise MemberNotFoundException("MemberName provided not present in database")
+            if member.booking_count>=int(MAX_BOOKINGS):
+                raise MemberExhaustedLimitException("Reached maximum booking limit of " + str(MAX_BOOKINGS))
+            catalog_entry = await self.inventory_repo.get_inventory_catalog_entry(request.item_name,db)
+            if not catalog_entry:
+                raise ItemNotFoundException("ItemName provided not in Database")
+            # the live remaining count, the catalog cache may still show units booked since
+            item:DbInventory = await self.inventory_repo.get_inventory(catalog_entry.id,db)
+            if not item:
+                raise ItemNotFoundException("ItemName provided not in Database")
+
+            entry = await self.booking_repo.join_waitlist(member, item, db)
+            return await self._waitlist_entry_with_position(entry, db)
+
+    async def get_waitlist_entry(self, entry_id:int, db:Session) -> WaitlistEntryBase:
+        """
+                Returns a waitlist entry with its current position while it is waiting, and the booking reference
+                once a released unit was assigned to it.
 
+                Args:
+                    entry_id (int): The id of the waitlist entry.
+                    db (Session): The database session.
+
+                Raises:
+                    WaitlistEntryNotFoundException: If the entry is not found in the database.
+        """
+        entry = await self.waitlist_repo.get_entry(entry_id, db)
+        if not entry:
+            raise WaitlistEntryNotFoundException("Waitlist entry provided not in Database")
+        return await self._waitlist_entry_with_position(entry, db)
+
+    async def _waitlist_entry_with_position(self, entry, db:Session) -> WaitlistEntryBase:
+        result = WaitlistEntryBase.model_validate(entry)
+        if entry.status == WAITING:
+            result.position = await self.waitlist_repo.get_position(entry, db)
+        return result
+
+    async def get_bookings_listing_version(self, db:Session, query:Optional[BookingQuery]=None) -> Tuple[int, str]:
+        """
+                Identifies the content of a bookings listing, for its ETag.
+
+                Args:
+                    db (Session): The database session.
+                    query (BookingQuery): The query of the listing.
+
+                Returns:
+                    tuple: The bookings table version, and the normalized query with the versions of the members
+                        and inventory tables when their rows are filtered on or part of the listing.
+        """
+        query = query or BookingQuery()
+        joined = []
+        if query.expand or query.member_name or query.member_surname:
+            joined.append(DbMember.__tablename__)
+        if query.expand or query.item_name:
+            joined.append(DbInventory.__tablename__)
+        versions = await self.booking_repo.get_bookings_versions(joined, db)
+        variant = [json.dumps(query.model_dump(mode="json", exclude_defaults=True), sort_keys=True,
+                              separators=(",", ":"))]
+        variant.extend(table_name + "=" + str(versions[table_name]) for table_name in joined)
+        return versions[DbBooking.__tablename__], ";".join(variant)
+
+    async def view_all_bookings(self, db:Session, query:Optional[BookingQuery]=None):
+        """
+                Lists the bookings matching the query.
+
+                Args:
+                    db (Session): The database session.
+                    query (BookingQuery): Optional filters on the member, the item and the booking time range, and
+                        whether to load the member and the item of every booking.
+
+                Returns:
+                    list: The bookings, ordered by booking time.
+        """
+        query = query or BookingQuery()
+        criteria = []
+        if query.member_id is not None:
+            criteria.append(DbBooking.member_id == query.member_id)
+        if query.inventory_id is not None:
+            criteria.append(DbBooking.inventory_id == query.inventory_id)
+        if query.booked_from:
+            criteria.append(DbBooking.booked_at >= query.booked_from)
+        if query.booked_to:
+            criteria.append(DbBooking.booked_at < query.booked_to)
+        member_criteria = []
+        if query.member_name:
+            member_criteria.append(DbMember.name.like(query.member_name))
+        if query.member_surname:
+            member_criteria.append(DbMember.surname.like(query.member_surname))
+        inventory_criteria = []
+        if query.item_name:
+            inventory_criteria.append(DbInventory.title.like(query.item_name))
+        return await self.booking_repo.get_all_bookings(db, criteria, member_criteria, inventory_criteria,
+                                                        query.expand)
+
+    async def get_booking_stats(self, db:Session, query:Optional[BookingStatsQuery]=None) -> BookingStats:
+        """
+                Reports the bookings and cancellations per item and time bucket, and the active bookings per member,
+                from the rollups maintained by the booking transactions.
+
+                Args:
+                    db (Session): The database session.
+                    query (BookingStatsQuery): The bucket granularity, optional filters on the item, the member and
+                        the time range, and the maximum number of members reported.
+
+                Returns:
+                    BookingStats: The buckets, ordered by start, and the members, busiest first.
+        """
+        query = query or BookingStatsQuery()
+        criteria = []
+        if query.inventory_id is not None:
+            criteria.append(DbBookingStats.inventory_id == query.inventory_id)
+        if query.stats_from:
+            criteria.append(DbBookingStats.bucket_start >= bucket_start(query.stats_from, query.granularity))
+        if query.stats_to:
+            criteria.append(DbBookingStats.bucket_start < query.stats_to)
+        member_criteria = []
+        if query.member_id is not None:
+            member_criteria.append(DbBooking.member_id == query.member_id)
 
+        buckets = await self.stats_repo.get_buckets(query.granularity, criteria, db)
+        members = await self.stats_repo.get_active_bookings(member_criteria, query.members_limit, db)
+        return BookingStats(granularity=query.granularity,
+                            buckets=[BookingStatsBucket.model_validate(bucket) for bucket in buckets],
+                            members=[MemberActiveBookings.model_validate(member) for member in members])
@@ -0,0 +1,149 @@
+import asyncio
+import datetime
+import logging
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from configuration.config import HOLD_TTL_SECONDS, HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE
+from configuration.database_config import SessionLocal
+from dto.booking_dto import ItemBookRequestBody, HoldRequest
+from models.db_holds import DbHold
+from models.db_member import DbMember
+from repositories.hold_repo import HoldRepo, HoldRelease
+from repositories.member_repo import MemberRepo
+from services.booking_service import BookingService
+from utils.exceptions import MemberNotFoundException, HoldNotFoundException, HoldExpiredException
+from utils.tracing import traced
+from utils.utilities import Singleton
+
+
+class HoldService(metaclass=Singleton):
+    """
+       Service class for the two-phase booking flow: hold an item, then confirm or release the hold.
+       Expired holds are reclaimed in batches by a background sweeper.
+       Utilizes Singleton pattern to ensure a single instance.
+    """
+    def __init__(self):
+        """
+               Initializes the HoldService with the hold and member repositories and the booking service,
+               whose validation and lock are shared with holds.
+        """
+        self.hold_repo = HoldRepo()
+        self.member_repo = MemberRepo()
+        self.booking_service = BookingService()
+        self.logger = logging.getLogger(__name__)
+
+    @traced
+    async def hold_an_item(self, request:ItemBookRequestBody, db:Session):
+        """
+                Holds an item for a member for HOLD_TTL_SECONDS.
+
+                Args:
+                    request (ItemBookRequestBody): The request body containing member and item details.
+                    db (Session): The database session.
+
+                Returns:
+                    DbHold: The hold record created.
+        """
+        async with self.booking_service.locked(db):
+            member, item = await self.booking_service.validate_member_and_items(request, db)
+            return await self.hold_repo.hold_an_item(member, item, HOLD_TTL_SECONDS, db)
+
+    async def validate_hold(self, request:HoldRequest, db:Session):
+        """
+               Validates that the hold exists and belongs to the member.
+
+               Args:
+                   request (HoldRequest): The request body containing hold reference and member details.
+                   db (Session): The database session.
+
+               Raises:
+                   MemberNotFoundException: If the member is not found in the database.
+                   HoldNotFoundException: If the member has no hold with this reference.
+
+               Returns:
+                   DbHold: The validated hold.
+        """
+        # Lock the hold before the member, in the same order as the sweeper
+        hold: DbHold = await self.hold_repo.get_hold_from_reference(request.hold_reference, db)
+        member: DbMember = await self.member_repo.get_member_from_name(request.member_name, request.member_surname, db)
+        if not member:
+            raise MemberNotFoundException("MemberName provided not present in database")
+        if not hold or hold.member_id != member.id:
+            raise HoldNotFoundException("Hold reference provided not in Database")
+        return hold
+
+    @traced
+    async def confirm_hold(self, request:HoldRequest, db:Session):
+        """
+                Confirms a hold into a booking.
+
+                Args:
+                    request (HoldRequest): The request body containing hold reference and member details.
+                    db (Session): The database session.
+
+                Raises:
+                    HoldExpiredException: If the hold expired, it is released.
+
+                Returns:
+                    DbBooking: The booking record created.
+        """
+        hold = await self.validate_hold(request, db)
+        if hold.expires_at <= datetime.datetime.utcnow():
+            await self.hold_repo.release_holds([DbHold.id == hold.id], 1, db)
+            raise HoldExpiredException("hold expired")
+        return await self.hold_repo.confirm_hold(hold, db)
+
+    async def release_hold(self, request:HoldRequest, db:Session):
+        """
+                Releases a hold, giving the unit back to the item.
+
+                Args:
+                    request (HoldRequest): The request body containing hold reference and member details.
+                    db (Session): The database session.
+        """
+        hold = await self.validate_hold(request, db)
+        await self.hold_repo.release_holds([DbHold.id == hold.id], 1, db)
+
+    async def sweep_expired_holds(self, db:Session) -> List[HoldRelease]:
+        """
+                Releases every expired hold, HOLD_SWEEP_BATCH_SIZE holds per transaction, without publishing them.
+
+                Args:
+                    db (Session): The database session.
+
+                Returns:
+                    list: The holds released by every transaction.
+        """
+        releases = []
+        while True:
+            release = await self.hold_repo.release_holds_unpublished(
+                [DbHold.expires_at <= datetime.datetime.utcnow()], HOLD_SWEEP_BATCH_SIZE, db)
+            releases.append(release)
+            if len(release.references) < HOLD_SWEEP_BATCH_SIZE:
+                return releases
+
+    def _sweep_in_thread(self) -> List[HoldRelease]:
+        db = SessionLocal()
+        try:
+            return asyncio.run(self.sweep_expired_holds(db))
+        finally:
+            db.close()
+
+    async def run_hold_sweeper(self):
+        """
+                Background task reclaiming expired holds every HOLD_SWEEP_INTERVAL_SECONDS. The blocking database
+                work runs in the default executor, the released units are published back on the event loop.
+        """
+        while True:
+            await asyncio.sleep(HOLD_SWEEP_INTERVAL_SECONDS)
+            try:
+                releases = await asyncio.get_running_loop().run_in_executor(None, self._sweep_in_thread)
+                for release in releases:
+                    self.hold_repo.publish_release(release)
+                released = sum(len(release.references) for release in releases)
+                if released:
+                    self.logger.info("Released %d expired holds", released)
+            except Exception as ex:
+                self.logger.error("Failed to release expired holds due to: %s", ex)
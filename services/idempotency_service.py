@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from configuration.config import IDEMPOTENCY_BACKEND, IDEMPOTENCY_CACHE_MAX_SIZE, IDEMPOTENCY_TTL_SECONDS, \
+    IDEMPOTENCY_PENDING_POLL_SECONDS
+from dto.base_dto import BaseDTO
+from repositories.idempotency_repo import IdempotencyRepo
+from utils.ttl_cache import TTLCache
+from utils.utilities import Singleton
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+EXPIRED_KEYS_CLEANUP_INTERVAL = 1000
+
+
+class IdempotencyService(metaclass=Singleton):
+    """
+       Service class replaying the result of requests repeated with the same Idempotency-Key.
+       Results are kept in a bounded in-memory LRU cache and, with IDEMPOTENCY_BACKEND=database,
+       in a table shared by all workers, where a key is claimed by a pending row before its request runs.
+       Utilizes Singleton pattern to ensure a single instance.
+    """
+    def __init__(self):
+        """
+               Initializes the IdempotencyService with the in-memory result cache and the idempotency repository.
+        """
+        self.results = TTLCache(IDEMPOTENCY_CACHE_MAX_SIZE, IDEMPOTENCY_TTL_SECONDS)
+        self.idempotency_repo = IdempotencyRepo()
+        self.use_database = IDEMPOTENCY_BACKEND == "database"
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.saved_count = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def execute(self, idempotency_key: str, scope: str, request: BaseModel,
+                      handler: Callable[[], Awaitable[BaseDTO]], db: Session) -> BaseDTO:
+        """
+               Runs the handler once per key and returns its original result for every repetition of the key.
+               Results with a 5xx status and failed handlers are not stored so the request can be retried.
+
+               Args:
+                   idempotency_key (str): The Idempotency-Key header sent by the client.
+                   scope (str): Namespace of the key, e.g. the endpoint and the user sending it.
+                   request (BaseModel): The request body, a key reused with a different body is rejected.
+                   handler (Callable): Coroutine function producing the result.
+                   db (Session): The database session.
+
+               Returns:
+                   BaseDTO: The result of the first execution of the key.
+        """
+        if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return BaseDTO(status=400, message="Idempotency-Key must not be longer than "
+                                               + str(MAX_IDEMPOTENCY_KEY_LENGTH) + " characters")
+
+        key = scope + ":" + idempotency_key
+        request_hash = hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+        while True:
+            # A request with the same key is still running, wait for its result instead of running it again
+            while key in self.in_flight:
+                await asyncio.shield(self.in_flight[key])
+
+            stored = await self._get_stored(key, db)
+            if stored is not None:
+                stored_hash, result = stored
+                if stored_hash != request_hash:
+                    return BaseDTO(status=422, message="Idempotency-Key was already used with a different request")
+                return result
+
+            if not self.use_database or await self.idempotency_repo.claim_key(key, request_hash, db):
+                break
+            # Another worker is running the request, poll until it stores its result or releases the key
+            await asyncio.sleep(IDEMPOTENCY_PENDING_POLL_SECONDS)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        completed = False
+        try:
+            result = await handler()
+            if result.status < 500:
+                await self._store(key, request_hash, result, db)
+                completed = True
+            return result
+        finally:
+            if self.use_database and not completed:
+                await self.idempotency_repo.release_key(key, db)
+            del self.in_flight[key]
+            future.set_result(None)
+
+    async def _get_stored(self, key: str, db: Session):
+        stored = self.results.get(key)
+        if stored is None and self.use_database:
+            row = await self.idempotency_repo.get_result(key, db)
+            if row is not None:
+                stored = (row.request_hash, BaseDTO.model_validate_json(row.response))
+                self.results.set(key, stored)
+        return stored
+
+    async def _store(self, key: str, request_hash: str, result: BaseDTO, db: Session):
+        self.results.set(key, (request_hash, result))
+        if not self.use_database:
+            return
+        await self.idempotency_repo.save_result(key, request_hash, result.model_dump_json(), db)
+        self.saved_count += 1
+        if self.saved_count % EXPIRED_KEYS_CLEANUP_INTERVAL == 0:
+            deleted = await self.idempotency_repo.delete_expired(db)
+            self.logger.info("Deleted %d expired idempotency keys", deleted)
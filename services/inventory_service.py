@@ -1,19 +1,26 @@
 import asyncio
 import csv
+import json
+import logging
 from datetime import datetime
-from logging import Logger
 
 from fastapi import UploadFile
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from configuration.config import AVAILABILITY_STREAM_KEEPALIVE_SECONDS, INVENTORY_EXPIRY_SWEEP_INTERVAL_SECONDS, \
+    INVENTORY_EXPIRY_SWEEP_BATCH_SIZE
+from configuration.database_config import engine, SessionLocal
 from models.db_inventory import DbInventory
 from models.db_member import DbMember
+from repositories.availability_event_bus import AvailabilityEventBus, AvailabilityNotifyBridge
+from repositories.availability_snapshot import AvailabilitySnapshot
+from repositories.inventory_change_publisher import InventoryChangePublisher
 from repositories.inventory_repo import InventoryRepo
 from utils.exceptions import InvalidFileException
-from utils.utilities import Singleton, validate_csv_return_dataframe
+from utils.utilities import Singleton, validate_csv_return_dataframe, log_rejected_rows
 
 
 class InventoryService(metaclass=Singleton):
@@ -23,10 +30,13 @@ class InventoryService(metaclass=Singleton):
     """
     def __init__(self):
         """
-                Initializes the InventoryService with an inventory repository and a logger.
+                Initializes the InventoryService with an inventory repository, the availability snapshot, the
+                availability event bus and a logger.
         """
         self.inventory_repo = InventoryRepo()
-        self.logger = Logger("InventoryService")
+        self.availability_snapshot = AvailabilitySnapshot()
+        self.event_bus = AvailabilityEventBus()
+        self.logger = logging.getLogger(__name__)
 
     def validate_inventory_data(self, df):
         """
@@ -41,6 +51,7 @@ class InventoryService(metaclass=Singleton):
 
         inventories = []
         failed_items = []
+        rejected = {"with an invalid format": [], "with missing columns": []}
         headers=["title","description","remaining_count","expiration_date"]
         for _, row in df.iterrows():
             try:
@@ -53,16 +64,17 @@ class InventoryService(metaclass=Singleton):
                 row["remaining_count"] = int(row["remaining_count"])
                 row["expiration_date"] = datetime.strptime(row["expiration_date"], "%d/%m/%Y")
             except ValueError:
-                self.logger.info(msg="Invalid data format for item: " + str(row["title"]) + " and row no:" + str(_))
+                rejected["with an invalid format"].append(_)
                 failed_items.append(row.to_dict())
                 continue
-            except Exception as ex:
-                self.logger.error(msg="Header missing in the row no:" + str(_) +" due to: " + str(ex)[:20])
+            except Exception:
+                rejected["with missing columns"].append(_)
                 failed_items.append(row.to_dict())
                 continue
             inventory = DbInventory(title=row["title"], description=row["description"], remaining_count=row["remaining_count"],
                                     expiration_date=row["expiration_date"])
             inventories.append(inventory)
+        log_rejected_rows(self.logger, "inventory rows", len(df), rejected)
         return inventories,failed_items
 
     async def add_inventories(self, file: UploadFile,bulk_update, db:Session):
@@ -98,6 +110,121 @@ class InventoryService(metaclass=Singleton):
         # results.extend(failed_items)
         # return results
 
+    async def get_inventories_version(self, db: Session) -> int:
+        return await self.inventory_repo.get_inventories_version(db)
+
+    async def get_inventories_listing(self, db: Session, live_only: bool = False):
+        """
+                Returns the serialized inventory listing from the availability snapshot.
+
+                Args:
+                    db (Session): The database session.
+                    live_only (bool): List only the items neither expired nor sold out.
+
+                Returns:
+                    tuple: The inventory table version the listing reflects, or the live listing tag, and the
+                        serialized response body.
+        """
+        version = await self.inventory_repo.get_inventories_version(db)
+        if live_only:
+            return await self.availability_snapshot.get_live_listing(version, db)
+        return await self.availability_snapshot.get_listing(version, db)
+
+    async def sweep_expired_items(self, db: Session) -> int:
+        """
+                Marks every item whose expiration date passed as expired, INVENTORY_EXPIRY_SWEEP_BATCH_SIZE items per
+                transaction.
+
+                Args:
+                    db (Session): The database session.
+
+                Returns:
+                    int: The number of items marked as expired.
+        """
+        expired = 0
+        while True:
+            marked = await self.inventory_repo.mark_expired_items(datetime.utcnow(), INVENTORY_EXPIRY_SWEEP_BATCH_SIZE,
+                                                                  db)
+            expired += marked
+            if marked < INVENTORY_EXPIRY_SWEEP_BATCH_SIZE:
+                return expired
+
+    def _sweep_in_thread(self) -> int:
+        db = SessionLocal()
+        try:
+            return asyncio.run(self.sweep_expired_items(db))
+        finally:
+            db.close()
+
+    async def run_expiration_sweeper(self):
+        """
+                Background task marking expired items every INVENTORY_EXPIRY_SWEEP_INTERVAL_SECONDS, the blocking
+                database work runs in the default executor.
+        """
+        while True:
+            await asyncio.sleep(INVENTORY_EXPIRY_SWEEP_INTERVAL_SECONDS)
+            try:
+                expired = await asyncio.get_running_loop().run_in_executor(None, self._sweep_in_thread)
+                if expired:
+                    self.logger.info("Marked %d items as expired", expired)
+            except Exception as ex:
+                self.logger.error("Failed to mark expired items due to: %s", ex)
+
+    async def stream_availability(self, last_event_id: Optional[str]) -> AsyncIterator[str]:
+        """
+                Streams the availability changes as Server-Sent Events, each event carries the latest remaining count
+                of every item changed since the previous one.
+                A reconnecting client sending the id of the last event it received gets the changes it missed, a
+                reset event asks it to reload /view-all when they cannot be known (another worker, a restart).
+                An empty comment is sent every AVAILABILITY_STREAM_KEEPALIVE_SECONDS on idle streams.
+
+                Args:
+                    last_event_id (Optional[str]): The Last-Event-ID header of a reconnecting client.
+
+                Returns:
+                    AsyncIterator[str]: The serialized events.
+        """
+        sequence = self.event_bus.sequence
+        if last_event_id:
+            worker_id, _, last_sequence = last_event_id.partition(":")
+            if worker_id == self.event_bus.worker_id and last_sequence.isdigit() \
+                    and int(last_sequence) <= self.event_bus.sequence:
+                sequence = int(last_sequence)
+            else:
+                yield self._format_event("reset", sequence, {})
+
+        self.event_bus.subscribers += 1
+        try:
+            while True:
+                changed = self.event_bus.changed
+                sequence, changes = self.event_bus.changes_since(sequence)
+                if changes:
+                    yield self._format_event("availability", sequence, [change._asdict() for change in changes])
+                else:
+                    yield ": keepalive\n\n"
+                await changed.wait()
+        finally:
+            self.event_bus.subscribers -= 1
+
+    def _format_event(self, event: str, sequence: int, data) -> str:
+        return "id: " + self.event_bus.worker_id + ":" + str(sequence) + "\nevent: " + event + \
+            "\ndata: " + json.dumps(data, separators=(",", ":")) + "\n\n"
+
+    def start_availability_bridge(self):
+        """
+                Starts receiving the availability changes of the other workers, when LISTEN/NOTIFY is configured.
+        """
+        AvailabilityNotifyBridge().start(engine, InventoryChangePublisher().remote_items_changed)
+
+    async def run_availability_heartbeat(self):
+        """
+                Background task waking the idle availability streams every AVAILABILITY_STREAM_KEEPALIVE_SECONDS,
+                one timer for all the subscribers instead of one per stream.
+        """
+        while True:
+            await asyncio.sleep(AVAILABILITY_STREAM_KEEPALIVE_SECONDS)
+            self.event_bus.heartbeat()
+
     async def get_all_inventories(self, db: Session):
         return await self.inventory_repo.get_all_inventories(db)
 
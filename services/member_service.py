@@ -1,13 +1,13 @@
 import asyncio
+import logging
 from datetime import datetime
-from logging import Logger
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from models.db_member import DbMember
 from repositories.member_repo import MemberRepo
-from utils.utilities import Singleton, validate_csv_return_dataframe
+from utils.utilities import Singleton, validate_csv_return_dataframe, log_rejected_rows
 
 
 class MemberService(metaclass=Singleton):
@@ -20,7 +20,7 @@ class MemberService(metaclass=Singleton):
                Initializes the MemberService with a member repository and a logger.
         """
         self.member_repo = MemberRepo()
-        self.logger = Logger("MemberServiceLogger")
+        self.logger = logging.getLogger(__name__)
 
     def validate_member_data(self, df):
         """
@@ -35,6 +35,7 @@ class MemberService(metaclass=Singleton):
 
         members = []
         failed_members=[]
+        rejected = {"with an invalid format": [], "with missing columns": []}
         headers = ["name", "surname", "booking_count", "date_joined"]
         for _, row in df.iterrows():
             try:
@@ -47,16 +48,17 @@ class MemberService(metaclass=Singleton):
                 row["booking_count"] = int(row["booking_count"])
                 row["date_joined"] = datetime.strptime(row["date_joined"], "%Y-%m-%dT%H:%M:%S")
             except ValueError:
-                self.logger.error(msg="Invalid data format for user: " + str(row["name"]) +" and row no:" + str(_))
+                rejected["with an invalid format"].append(_)
                 failed_members.append(row.to_dict())
                 continue
-            except Exception as ex:
-                self.logger.error(msg="Header missing in the row no:" + str(_) +" due to: " + str(ex)[:20])
+            except Exception:
+                rejected["with missing columns"].append(_)
                 failed_members.append(row.to_dict())
                 continue
             member = DbMember(name=row["name"], surname=row["surname"], booking_count=row["booking_count"],
                               date_joined=row["date_joined"])
             members.append(member)
+        log_rejected_rows(self.logger, "member rows", len(df), rejected)
         return members, failed_members
 
     async def add_members(self, file: UploadFile,bulk_update, db:Session):
@@ -93,6 +95,9 @@ class MemberService(metaclass=Singleton):
         # results.extend(failed_members)
         # return results
 
+    async def get_members_version(self, db: Session) -> int:
+        return await self.member_repo.get_members_version(db)
+
     async def get_all_members(self, db: Session):
         return await self.member_repo.get_all_members(db)
 
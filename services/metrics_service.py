@@ -0,0 +1,80 @@
+from typing import List
+
+from sqlalchemy.pool import QueuePool
+
+from configuration.database_pool import PoolMetrics
+from services.admission_service import AdmissionService
+from services.booking_service import BookingService
+from utils.logging_setup import dropped_records
+from utils.metrics import RequestMetrics, render_histograms, render_samples
+from utils.utilities import Singleton
+
+
+class MetricsService(metaclass=Singleton):
+    """
+       Service class rendering the measurements of this worker in the Prometheus text exposition format.
+       Everything is collected while serving, rendering only reads the current values.
+       Utilizes Singleton pattern to ensure a single instance.
+    """
+    def __init__(self):
+        self.request_metrics = RequestMetrics()
+        self.pool_metrics = PoolMetrics()
+        self.booking_service = BookingService()
+        self.admission_service = AdmissionService()
+
+    def render(self) -> str:
+        """
+                Renders the request, database, connection pool, booking lock, admission control and logging metrics.
+
+                Returns:
+                    str: The metrics in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        requests = self.request_metrics
+        render_histograms(lines, "http_request_duration_seconds", "Latency of the HTTP requests.",
+                          sorted(list(requests.latency.items())))
+        render_histograms(lines, "http_request_db_queries", "Number of database queries run per HTTP request.",
+                          sorted(list(requests.queries.items())))
+        render_histograms(lines, "http_request_db_seconds", "Time spent in database queries per HTTP request.",
+                          sorted(list(requests.db_time.items())))
+        render_samples(lines, "http_requests_in_flight", "gauge", "HTTP requests being served.",
+                       [((), requests.in_flight)])
+        render_samples(lines, "db_queries_total", "counter", "Database queries run, in requests or not.",
+                       sorted(list(requests.engine_queries.items())))
+        render_samples(lines, "db_query_seconds_total", "counter", "Time spent in database queries.",
+                       sorted(list(requests.engine_time.items())))
+
+        pools = sorted(self.pool_metrics.pools.items())
+        queue_pools = [(name, stats.engine.pool) for name, stats in pools if isinstance(stats.engine.pool, QueuePool)]
+        render_samples(lines, "db_pool_size", "gauge", "Connections kept open by the pool.",
+                       [((("pool", name),), pool.size()) for name, pool in queue_pools])
+        render_samples(lines, "db_pool_checked_out", "gauge", "Connections checked out of the pool.",
+                       [((("pool", name),), pool.checkedout()) for name, pool in queue_pools])
+        render_samples(lines, "db_pool_overflow", "gauge", "Connections opened beyond the pool size.",
+                       [((("pool", name),), max(pool.overflow(), 0)) for name, pool in queue_pools])
+        render_samples(lines, "db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.",
+                       [((("pool", name),), stats.timeouts) for name, stats in pools])
+        render_histograms(lines, "db_pool_wait_seconds", "Time waited for a connection of the pool.",
+                          [((("pool", name),), stats.wait_time) for name, stats in pools])
+        render_histograms(lines, "db_pool_checkout_seconds", "Time connections were kept checked out per endpoint.",
+                          [((("pool", name), ("endpoint", endpoint)), histogram) for name, stats in pools
+                           for endpoint, histogram in sorted(list(stats.checkout_time.items()))])
+
+        render_samples(lines, "booking_lock_waiters", "gauge", "Requests queued on the booking lock.",
+                       [((), self.booking_service.lock_waiters)])
+        render_histograms(lines, "booking_lock_wait_seconds", "Time waited for the booking lock.",
+                          [((), self.booking_service.lock_wait)])
+        render_samples(lines, "booking_lock_hold_seconds_average", "gauge",
+                       "Moving average of the time the booking lock is held.",
+                       [((), self.booking_service.lock_hold_average)])
+
+        render_samples(lines, "admission_in_flight", "gauge", "Admitted booking requests being served.",
+                       [((), self.admission_service.in_flight)])
+        render_samples(lines, "admission_rejections_total", "counter",
+                       "Booking requests rejected by the admission control.",
+                       [((("reason", reason),), count)
+                        for reason, count in sorted(self.admission_service.rejections.items())])
+
+        render_samples(lines, "log_records_dropped_total", "counter", "Log records dropped as the log queue was full.",
+                       [((), dropped_records())])
+        return "\n".join(lines) + "\n"
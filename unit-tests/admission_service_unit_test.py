@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException
+
+from services.admission_service import AdmissionService, TokenBucket, RATE_LIMITED, OVER_CAPACITY, QUEUE_BUDGET
+from utils.ttl_cache import TTLCache
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_bucket_allows_bursts_then_refills_at_rate(self):
+        bucket = TokenBucket(rate=2, burst=3, now=0)
+        for _ in range(3):
+            self.assertEqual(bucket.wait_time(0), 0)
+            bucket.take()
+
+        self.assertAlmostEqual(bucket.wait_time(0), 0.5)
+        self.assertEqual(bucket.wait_time(0.5), 0)
+
+    def test_bucket_does_not_refill_above_burst(self):
+        bucket = TokenBucket(rate=10, burst=2, now=0)
+        bucket.wait_time(100)
+
+        self.assertEqual(bucket.tokens, 2)
+
+
+class TestAdmissionService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.admission_service = AdmissionService()
+        self.admission_service.rate, self.admission_service.burst = 1, 2
+        self.admission_service.buckets = TTLCache(100, 2)
+        self.admission_service.max_in_flight = 2
+        self.admission_service.queue_budget = 0
+        self.admission_service.in_flight = 0
+        self.admission_service.rejections.clear()
+        self.admission_service.booking_service = MagicMock(lock_hold_average=0.0, lock_waiters=0)
+        self.admission_service.booking_service.lock.locked.return_value = False
+
+    def test_user_over_its_rate_gets_429_with_retry_after(self):
+        for _ in range(2):
+            self.admission_service.check("alice", now=0).take()
+
+        with self.assertRaises(HTTPException) as raised:
+            self.admission_service.check("alice", now=0.25)
+
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(raised.exception.headers["Retry-After"], "1")
+        self.assertEqual(self.admission_service.rejections[RATE_LIMITED], 1)
+        self.admission_service.check("bob", now=0.25)
+
+    async def test_requests_beyond_the_in_flight_cap_get_503(self):
+        admitted = [self.admission_service.admit(MagicMock(id=user)) for user in (1, 2)]
+        for admission in admitted:
+            await admission.__anext__()
+
+        with self.assertRaises(HTTPException) as raised:
+            await self.admission_service.admit(MagicMock(id=3)).__anext__()
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(self.admission_service.rejections[OVER_CAPACITY], 1)
+
+        await admitted[0].aclose()
+        self.assertEqual(self.admission_service.in_flight, 1)
+        await self.admission_service.admit(MagicMock(id=3)).__anext__()
+
+    def test_requests_over_the_queue_budget_get_503(self):
+        self.admission_service.max_in_flight = 0
+        self.admission_service.queue_budget = 1
+        self.admission_service.booking_service.lock_hold_average = 0.2
+        self.admission_service.booking_service.lock_waiters = 4
+        self.admission_service.booking_service.lock.locked.return_value = True
+        self.admission_service.check("alice", now=0)
+
+        self.admission_service.booking_service.lock_waiters = 7
+        with self.assertRaises(HTTPException) as raised:
+            self.admission_service.check("alice", now=0)
+
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(raised.exception.headers["Retry-After"], "1")
+        self.assertEqual(self.admission_service.rejections[QUEUE_BUDGET], 1)
+
+    def test_requests_not_waiting_for_the_lock_are_not_part_of_the_queue_budget(self):
+        self.admission_service.max_in_flight = 0
+        self.admission_service.queue_budget = 1
+        self.admission_service.booking_service.lock_hold_average = 0.2
+        # fast-path cancellations in flight, the booking lock idle
+        self.admission_service.in_flight = 50
+
+        self.admission_service.check("alice", now=0)
+        self.assertEqual(self.admission_service.estimated_wait(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
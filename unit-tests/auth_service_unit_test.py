@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base, get_db
+from controllers.inventory_controller import stream_router
+from models.db_user import DbUser
+from repositories.user_repo import UserRepository
+from services.auth_service import AuthService
+from utils.ttl_cache import TTLCache
+
+
+def dependency_calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from dependency_calls(dependency)
+
+
+class TestAuthService(unittest.TestCase):
+
+    def setUp(self):
+        self.auth_service = AuthService()
+        self.token = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=self.auth_service.create_access_token({"username": "ann"}))
+
+    @patch('services.auth_service.SessionLocal')
+    def test_validate_token_in_own_session_closes_the_session(self, session_local):
+        user = MagicMock(username="ann")
+        with patch.object(self.auth_service.user_repo, 'get_token_user', return_value=user) as get_token_user:
+            self.assertIs(self.auth_service.validate_token_in_own_session(self.token), user)
+
+        get_token_user.assert_called_once_with("ann", session_local.return_value)
+        session_local.return_value.close.assert_called_once()
+
+    def test_availability_stream_does_not_hold_a_session(self):
+        route = next(route for route in stream_router.routes if route.path == "/view-all/stream")
+        calls = list(dependency_calls(route.dependant))
+
+        self.assertIn(self.auth_service.validate_token_in_own_session, calls)
+        self.assertNotIn(get_db, calls)
+
+
+class TestTokenUserCache(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[DbUser.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(DbUser(id=1, username="ann", fullname="Ann", password="x"))
+        self.db.commit()
+        self.now = datetime(2026, 1, 1).timestamp()
+        self.user_repo = UserRepository()
+        patcher = patch.object(self.user_repo, 'token_users', TTLCache(10, 30, clock=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        token = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=AuthService().create_access_token({"username": "ann"}))
+        self.validate = lambda db: AuthService().validate_token(token, db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_cached_user_is_returned_without_the_database(self):
+        user = self.validate(self.db)
+        db = MagicMock()
+
+        self.assertIs(self.validate(db), user)
+        self.assertEqual((user.id, user.username), (1, "ann"))
+        db.execute.assert_not_called()
+
+    def test_user_is_read_again_once_the_ttl_passed(self):
+        self.validate(self.db)
+        self.db.query(DbUser).delete()
+        self.db.commit()
+        self.now += 31
+
+        with self.assertRaises(HTTPException):
+            self.validate(self.db)
+
+    def test_unknown_users_are_not_cached(self):
+        self.db.query(DbUser).delete()
+        self.db.commit()
+
+        with self.assertRaises(HTTPException):
+            self.validate(self.db)
+        self.assertEqual(len(self.user_repo.token_users), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import queue
+import unittest
+from unittest.mock import MagicMock
+
+from repositories.availability_event_bus import AvailabilityChange, AvailabilityEventBus, AvailabilityNotifyBridge, \
+    NOTIFY_PAYLOAD_LIMIT
+
+
+class TestAvailabilityEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = AvailabilityEventBus()
+        self.bus.latest.clear()
+        self.start = self.bus.sequence
+
+    def test_changes_since_returns_latest_change_per_item(self):
+        self.bus.publish([AvailabilityChange(1, "Book", 4)])
+        self.bus.publish([AvailabilityChange(2, "Pen", 9)])
+        self.bus.publish([AvailabilityChange(1, "Book", 3)])
+
+        sequence, changes = self.bus.changes_since(self.start)
+
+        self.assertEqual(sequence, self.start + 3)
+        self.assertEqual(changes, [AvailabilityChange(2, "Pen", 9), AvailabilityChange(1, "Book", 3)])
+
+    def test_changes_since_skips_changes_already_seen(self):
+        self.bus.publish([AvailabilityChange(1, "Book", 4)])
+        seen, _ = self.bus.changes_since(self.start)
+        self.bus.publish([AvailabilityChange(2, "Pen", 9)])
+
+        _, changes = self.bus.changes_since(seen)
+
+        self.assertEqual(changes, [AvailabilityChange(2, "Pen", 9)])
+        self.assertEqual(self.bus.changes_since(self.bus.sequence)[1], [])
+
+    def test_publish_wakes_waiting_subscribers(self):
+        changed = self.bus.changed
+        self.bus.publish([AvailabilityChange(1, "Book", 4)])
+
+        self.assertTrue(changed.is_set())
+        self.assertIsNot(self.bus.changed, changed)
+
+
+class TestAvailabilityNotifyBridge(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = AvailabilityNotifyBridge()
+        self.bridge.__init__()
+        self.bridge.channel = "availability"
+        self.bridge._engine = MagicMock()
+
+    def queued(self):
+        payloads = []
+        while True:
+            try:
+                payloads.append(self.bridge._outbox.get_nowait())
+            except queue.Empty:
+                return payloads
+
+    def test_notify_queues_the_changes_without_touching_the_database(self):
+        self.bridge.notify([AvailabilityChange(1, "Book", 4), AvailabilityChange(2, "Pen", 9)])
+
+        payloads = self.queued()
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(json.loads(payloads[0])["changes"], [[1, "Book", 4], [2, "Pen", 9]])
+        self.bridge._engine.begin.assert_not_called()
+
+    def test_notify_splits_the_changes_at_the_payload_limit(self):
+        changes = [AvailabilityChange(i, "x" * 100, i) for i in range(200)]
+
+        self.bridge.notify(changes)
+
+        payloads = self.queued()
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload) <= NOTIFY_PAYLOAD_LIMIT for payload in payloads))
+        self.assertEqual([change[0] for payload in payloads for change in json.loads(payload)["changes"]],
+                         list(range(200)))
+
+    def test_send_notifies_the_queued_payloads_in_one_transaction(self):
+        connection = self.bridge._engine.begin.return_value.__enter__.return_value
+
+        self.bridge._send(["a", "b"])
+
+        self.bridge._engine.begin.assert_called_once()
+        self.assertEqual([call.args[1]["payload"] for call in connection.execute.call_args_list], ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from models.db_bookings import DbBooking  # noqa: F401, mapped by the relationships of DbInventory
+from models.db_inventory import DbInventory
+from models.db_member import DbMember  # noqa: F401
+from repositories.availability_snapshot import AvailabilitySnapshot
+
+
+class TestAvailabilitySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[DbInventory.__table__])
+        self.db = sessionmaker(bind=engine)()
+        future = datetime.utcnow() + timedelta(days=1)
+        self.db.add_all([DbInventory(id=1, title="Book", description="d", remaining_count=2, expiration_date=future),
+                         DbInventory(id=2, title="Pen", description="d", remaining_count=0, expiration_date=future),
+                         DbInventory(id=3, title="Old", description="d", remaining_count=5,
+                                     expiration_date=datetime(2000, 1, 1))])
+        self.db.commit()
+        # the snapshot is a singleton, start every test from an empty one
+        self.snapshot = AvailabilitySnapshot()
+        self.snapshot.__init__()
+
+    def tearDown(self):
+        self.db.close()
+
+    def listing(self, version: int) -> dict:
+        tag, body = asyncio.run(self.snapshot.get_listing(version, self.db))
+        return {"version": tag, "counts": {row["title"]: row["remaining_count"] for row in json.loads(body)["data"]}}
+
+    def set_count(self, inventory_id: int, count: int):
+        self.db.get(DbInventory, inventory_id).remaining_count = count
+        self.db.commit()
+
+    def test_consecutive_deltas_are_applied_without_reload(self):
+        self.assertEqual(self.listing(5), {"version": 5, "counts": {"Book": 2, "Pen": 0, "Old": 5}})
+        self.set_count(1, 0)  # not reloaded, the delta below is what the listing reflects
+
+        self.snapshot.apply_deltas({1: -1, 2: 1}, 6)
+
+        self.assertEqual(self.listing(6), {"version": 6, "counts": {"Book": 1, "Pen": 1, "Old": 5}})
+
+    def test_a_missed_version_reloads_the_snapshot(self):
+        self.listing(5)
+        self.set_count(1, 0)
+
+        self.snapshot.apply_delta(1, -1, 7)
+
+        self.assertIsNone(self.snapshot.version)
+        self.assertEqual(self.listing(7), {"version": 7, "counts": {"Book": 0, "Pen": 0, "Old": 5}})
+
+    def test_an_unknown_version_or_item_reloads_the_snapshot(self):
+        self.listing(5)
+        self.snapshot.apply_delta(1, -1, None)
+        self.assertIsNone(self.snapshot.version)
+
+        self.listing(5)
+        self.snapshot.apply_delta(99, 1, 6)
+        self.assertIsNone(self.snapshot.version)
+
+    def test_an_older_version_from_a_replica_does_not_go_back(self):
+        self.listing(5)
+        self.snapshot.apply_delta(1, -1, 6)
+
+        self.assertEqual(self.listing(4), {"version": 6, "counts": {"Book": 1, "Pen": 0, "Old": 5}})
+
+    def test_live_listing_skips_expired_and_sold_out_items(self):
+        tag, body = asyncio.run(self.snapshot.get_live_listing(5, self.db))
+
+        self.assertEqual([row["title"] for row in json.loads(body)["data"]], ["Book"])
+        self.snapshot.apply_delta(2, 1, 6)
+        tag_after, body = asyncio.run(self.snapshot.get_live_listing(6, self.db))
+        self.assertNotEqual(tag, tag_after)
+        self.assertEqual([row["title"] for row in json.loads(body)["data"]], ["Book", "Pen"])
+
+    def test_live_listing_tag_depends_on_the_content_only(self):
+        tag, _ = asyncio.run(self.snapshot.get_live_listing(5, self.db))
+        # another worker, or this one after a restart, loading the same content
+        self.snapshot.__init__()
+        self.assertEqual(asyncio.run(self.snapshot.get_live_listing(5, self.db))[0], tag)
+
+        self.set_count(1, 1)
+        self.snapshot.__init__()
+        self.assertNotEqual(asyncio.run(self.snapshot.get_live_listing(5, self.db))[0], tag)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from dto.booking_dto import BookingQuery
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.table_version_repo import TableVersionRepo
+from services.booking_service import BookingService
+from utils.utilities import build_etag
+
+
+class TestBookingListing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([DbMember(id=1, name="Ann", surname="A", booking_count=2, date_joined=datetime.utcnow()),
+                         DbMember(id=2, name="Bob", surname="B", booking_count=1, date_joined=datetime.utcnow()),
+                         DbInventory(id=1, title="Pen", description="d", remaining_count=1,
+                                     expiration_date=datetime(2099, 1, 1)),
+                         DbInventory(id=2, title="Lamp", description="d", remaining_count=1,
+                                     expiration_date=datetime(2099, 1, 1)),
+                         DbBooking(id=1, member_id=1, inventory_id=1, booked_at=datetime(2026, 1, 10),
+                                   booking_reference="r1"),
+                         DbBooking(id=2, member_id=2, inventory_id=1, booked_at=datetime(2026, 2, 10),
+                                   booking_reference="r2"),
+                         DbBooking(id=3, member_id=1, inventory_id=2, booked_at=datetime(2026, 3, 10),
+                                   booking_reference="r3")])
+        self.db.commit()
+        self.statements = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.booking_service = BookingService()
+
+    def tearDown(self):
+        self.db.close()
+
+    async def references(self, **filters):
+        return [booking.booking_reference
+                for booking in await self.booking_service.view_all_bookings(self.db, BookingQuery(**filters))]
+
+    async def test_filters_on_the_booking_columns_do_not_join(self):
+        self.assertEqual(await self.references(member_id=1), ["r1", "r3"])
+        self.assertEqual(await self.references(inventory_id=1, booked_from=datetime(2026, 2, 1)), ["r2"])
+        self.assertEqual(await self.references(booked_to=datetime(2026, 2, 10)), ["r1"])
+        self.assertFalse(any("JOIN" in statement for statement in self.statements))
+
+    async def test_filters_on_the_member_and_the_item_join_their_table_only(self):
+        self.assertEqual(await self.references(member_name="Ann"), ["r1", "r3"])
+        self.assertIn('JOIN "Members"', self.statements[-1])
+        self.assertNotIn('JOIN "Inventory"', self.statements[-1])
+
+        self.assertEqual(await self.references(member_name="Ann", item_name="Lamp"), ["r3"])
+        self.assertIn('JOIN "Inventory"', self.statements[-1])
+
+    async def test_expand_loads_the_member_and_the_item_in_the_same_query(self):
+        bookings = await self.booking_service.view_all_bookings(self.db, BookingQuery(expand=True))
+        queries = len(self.statements)
+
+        self.assertEqual([(booking.member.name, booking.inventory.title) for booking in bookings],
+                         [("Ann", "Pen"), ("Bob", "Pen"), ("Ann", "Lamp")])
+        self.assertEqual(len(self.statements), queries)
+
+    async def test_etag_depends_on_the_query(self):
+        async def etag(query):
+            return build_etag(DbBooking.__tablename__,
+                              *await self.booking_service.get_bookings_listing_version(self.db, query))
+
+        self.assertEqual(await etag(BookingQuery(member_id=1)), await etag(BookingQuery(member_id=1, expand=False)))
+        self.assertNotEqual(await etag(BookingQuery(member_id=1)), await etag(BookingQuery(member_id=2)))
+
+        expanded = await etag(BookingQuery(expand=True))
+        await TableVersionRepo().bump_versions([DbMember.__tablename__], self.db)
+        self.db.commit()
+        self.assertNotEqual(await etag(BookingQuery(expand=True)), expanded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from collections import Counter
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.orm import Session
+
+from repositories.booking_partition_repo import BookingPartitionRepo, month_start, SET_LOCK_TIMEOUT_STATEMENT
+
+
+class TestBookingPartitionRepo(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.partition_repo = BookingPartitionRepo()
+        self.db = MagicMock(spec=Session)
+
+    def partitions(self, *names):
+        self.db.execute.return_value.scalars.return_value = list(names)
+
+    def statements(self):
+        return [str(call.args[0]) for call in self.db.execute.call_args_list]
+
+    def test_month_start(self):
+        self.assertEqual(month_start(datetime(2026, 10, 19, 16, 30)), datetime(2026, 10, 1))
+        self.assertEqual(month_start(datetime(2026, 11, 5), 2), datetime(2027, 1, 1))
+        self.assertEqual(month_start(datetime(2026, 1, 31), -13), datetime(2024, 12, 1))
+
+    def test_partition_month(self):
+        self.assertEqual(BookingPartitionRepo.partition_month("Bookings_2026_03"), datetime(2026, 3, 1))
+        self.assertIsNone(BookingPartitionRepo.partition_month("Bookings_default"))
+        self.assertEqual(BookingPartitionRepo.partition_name("Bookings", datetime(2026, 3, 1)), "Bookings_2026_03")
+
+    async def test_create_partitions_skips_the_existing_months(self):
+        self.partitions("Bookings_default", "Bookings_2026_10")
+
+        created = await self.partition_repo.create_partitions(datetime(2026, 10, 1), 3, self.db)
+
+        self.assertEqual(created, ["Bookings_2026_11", "Bookings_2026_12"])
+        self.assertEqual(self.db.commit.call_count, 2)
+        statements = self.statements()
+        self.assertEqual(statements.count(str(SET_LOCK_TIMEOUT_STATEMENT)), 2)
+        self.assertIn('CREATE TABLE "Bookings_2026_12" (LIKE "Bookings" INCLUDING DEFAULTS)', statements)
+        self.assertIn('ALTER TABLE "Bookings" ATTACH PARTITION "Bookings_2026_12" '
+                      "FOR VALUES FROM ('2026-12-01T00:00:00') TO ('2027-01-01T00:00:00')", statements)
+
+    async def test_create_partitions_stops_at_the_first_failure(self):
+        self.partitions()
+        self.db.commit.side_effect = Exception("lock timeout")
+
+        with self.assertRaises(Exception):
+            await self.partition_repo.create_partitions(datetime(2026, 10, 1), 3, self.db)
+
+        self.db.rollback.assert_called()
+        self.assertEqual(self.db.commit.call_count, 1)
+
+    @patch('repositories.inventory_repo.InventoryRepo.get_availability', new_callable=AsyncMock, return_value=[])
+    @patch('repositories.waitlist_repo.WaitlistRepo.assign_released_units', new_callable=AsyncMock,
+           return_value=Counter({1: 1}))
+    @patch('repositories.table_version_repo.TableVersionRepo.bump_versions', new_callable=AsyncMock)
+    async def test_archive_partitions_moves_the_months_before_the_retention(self, bump_versions, assign, _):
+        self.partitions("Bookings_default", "Bookings_2026_09", "Bookings_2026_08", "Bookings_2026_10")
+        # units given back per item by the archived bookings
+        self.db.execute.return_value.all.return_value = [(1, 3), (2, 1)]
+
+        archived = await self.partition_repo.archive_partitions(datetime(2026, 10, 1), self.db)
+
+        self.assertEqual([partition.name for partition in archived], ["Bookings_2026_08", "Bookings_2026_09"])
+        self.assertEqual(archived[0].released, Counter({1: 2, 2: 1}))
+        self.assertEqual(assign.await_count, 2)
+        self.assertEqual(self.db.commit.call_count, 2)
+        self.assertEqual(bump_versions.await_count, 2)
+        statements = self.statements()
+        self.assertEqual(sum('UPDATE "Members" SET booking_count' in statement and 'FROM "Bookings_2026_08"'
+                             in statement for statement in statements), 1)
+        self.assertEqual(sum('UPDATE "Inventory" SET remaining_count' in statement and 'FROM "Bookings_2026_08"'
+                             in statement for statement in statements), 1)
+        self.assertEqual(statements.count(str(SET_LOCK_TIMEOUT_STATEMENT)), 2)
+        self.assertIn('ALTER TABLE "Bookings" DETACH PARTITION "Bookings_2026_08"', statements)
+        self.assertIn('ALTER TABLE "Bookings_2026_08" RENAME TO "BookingsArchive_2026_08"', statements)
+        self.assertIn('ALTER TABLE "BookingsArchive" ATTACH PARTITION "BookingsArchive_2026_08" '
+                      "FOR VALUES FROM ('2026-08-01T00:00:00') TO ('2026-09-01T00:00:00')", statements)
+        self.assertFalse(any("Bookings_2026_10" in statement or "Bookings_default" in statement
+                             for statement in statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import uuid
+from datetime import datetime
+
+from repositories.booking_repo import BookingRepo, EPOCH, REFERENCE_CLOCK_SKEW
+from utils.utilities import new_reference, reference_time
+
+
+class TestBookingReference(unittest.TestCase):
+
+    def test_reference_embeds_its_creation_time(self):
+        now = datetime(2024, 5, 17, 10, 30, 15, 123456)
+
+        self.assertEqual(reference_time(new_reference(now)), datetime(2024, 5, 17, 10, 30, 15, 123000))
+        self.assertEqual(uuid.UUID(new_reference(now)).version, 7)
+
+    def test_other_references_have_no_creation_time(self):
+        self.assertIsNone(reference_time(str(uuid.uuid4())))
+        self.assertIsNone(reference_time("not-a-reference"))
+
+    def test_booked_after_is_the_earliest_reference_time(self):
+        first = new_reference(datetime(2024, 1, 10))
+        second = new_reference(datetime(2024, 3, 10))
+
+        self.assertEqual(BookingRepo.booked_after([second, first]), datetime(2024, 1, 10) - REFERENCE_CLOCK_SKEW)
+        self.assertEqual(BookingRepo.booked_after([first, str(uuid.uuid4())]), EPOCH)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from collections import Counter
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.orm import Session
+
+from dto.booking_dto import ItemCancelRequest
+from repositories.booking_repo import BookingRepo, BOOKING_TABLES
+from services.booking_service import BookingService
+from utils.exceptions import MemberNotFoundException, BookingNotFoundException
+
+
+class TestCancelByReference(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.booking_repo = BookingRepo()
+        self.db = MagicMock(spec=Session)
+        for name in ("stats_repo", "waitlist_repo", "table_version_repo", "change_publisher"):
+            collaborator = patch.object(self.booking_repo, name)
+            self.addCleanup(collaborator.stop)
+            setattr(self, name, collaborator.start())
+        self.stats_repo.record = AsyncMock()
+        self.waitlist_repo.assign_released_units = AsyncMock(return_value=Counter())
+        self.table_version_repo.commit_with_versions = AsyncMock(return_value={"Inventory": 2})
+
+    def returning(self, row):
+        self.db.execute.return_value.first.return_value = row
+
+    async def test_unknown_member_returns_none_without_writing(self):
+        self.returning(None)
+
+        self.assertIsNone(await self.booking_repo.cancel_by_reference("No", "One", "ref", self.db))
+        self.db.rollback.assert_called_once()
+        self.table_version_repo.commit_with_versions.assert_not_called()
+        self.waitlist_repo.assign_released_units.assert_not_called()
+
+    async def test_unknown_reference_returns_a_row_without_inventory(self):
+        self.returning(MagicMock(member_id=1, inventory_id=None))
+
+        result = await self.booking_repo.cancel_by_reference("John", "Doe", "ref", self.db)
+
+        self.assertIsNone(result.inventory_id)
+        self.db.rollback.assert_called_once()
+        self.table_version_repo.commit_with_versions.assert_not_called()
+
+    async def test_released_unit_is_published_when_nobody_waits(self):
+        self.returning(MagicMock(member_id=1, inventory_id=7, title="Book", expiration_date=datetime(2099, 1, 1),
+                                 remaining_count=3))
+
+        await self.booking_repo.cancel_by_reference("John", "Doe", "ref", self.db)
+
+        self.waitlist_repo.assign_released_units.assert_awaited_once_with({7: 1}, self.db)
+        self.table_version_repo.commit_with_versions.assert_awaited_once_with(BOOKING_TABLES, self.db)
+        entry, delta, versions = self.change_publisher.item_changed.call_args.args
+        self.assertEqual((entry.id, entry.remaining_count, delta, versions), (7, 3, 1, {"Inventory": 2}))
+
+    async def test_released_unit_assigned_to_the_waitlist_is_not_published_as_available(self):
+        self.returning(MagicMock(member_id=1, inventory_id=7, title="Book", expiration_date=datetime(2099, 1, 1),
+                                 remaining_count=3))
+        self.waitlist_repo.assign_released_units.return_value = Counter({7: 1})
+
+        await self.booking_repo.cancel_by_reference("John", "Doe", "ref", self.db)
+
+        entry, delta, _ = self.change_publisher.item_changed.call_args.args
+        self.assertEqual((entry.remaining_count, delta), (2, 0))
+
+
+class TestFastCancel(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.booking_service = BookingService()
+        self.db = MagicMock(spec=Session)
+        self.request = ItemCancelRequest(member_name="John", member_surname="Doe", booking_reference="ref")
+        enabled = patch('services.booking_service.FAST_CANCEL_ENABLED', True)
+        enabled.start()
+        self.addCleanup(enabled.stop)
+        supported = patch.object(BookingRepo, "supports_cancel_by_reference", return_value=True)
+        supported.start()
+        self.addCleanup(supported.stop)
+
+    @patch('repositories.booking_repo.BookingRepo.cancel_by_reference', new_callable=AsyncMock)
+    async def test_unknown_member_and_unknown_reference(self, mock_cancel):
+        mock_cancel.return_value = None
+        with self.assertRaises(MemberNotFoundException):
+            await self.booking_service.cancel_booking(self.request, self.db)
+
+        mock_cancel.return_value = MagicMock(inventory_id=None)
+        with self.assertRaises(BookingNotFoundException):
+            await self.booking_service.cancel_booking(self.request, self.db)
+        self.assertFalse(self.booking_service.lock.locked())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,11 +7,18 @@ from utils.exceptions import MemberNotFoundException, MemberExhaustedLimitExcept
     ItemDepletedException, ItemNotFoundException, BookingNotFoundException
 
 
-class TestBookingService(unittest.TestCase):
+class TestBookingService(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
         self.booking_service = BookingService()
         self.db = MagicMock(spec=Session)
+        # every item is live in the catalog cache, the tests decide what the locked inventory row looks like
+        catalog_patch = patch('repositories.inventory_repo.InventoryRepo.get_inventory_catalog_entry',
+                              new_callable=AsyncMock, return_value=MagicMock(
+                                  expiration_date=datetime.datetime.utcnow() + datetime.timedelta(days=1),
+                                  remaining_count=1))
+        catalog_patch.start()
+        self.addCleanup(catalog_patch.stop)
 
     @patch('repositories.member_repo.MemberRepo.get_member_from_name', new_callable=AsyncMock)
     @patch('repositories.inventory_repo.InventoryRepo.get_inventory_from_name', new_callable=AsyncMock)
@@ -74,12 +81,37 @@ class TestBookingService(unittest.TestCase):
         with self.assertRaises(ItemDepletedException):
             await self.booking_service.validate_member_and_items(request, self.db)
 
+    @patch('repositories.member_repo.MemberRepo.get_member_from_name', new_callable=AsyncMock)
+    @patch('repositories.inventory_repo.InventoryRepo.get_inventory_catalog_entry', new_callable=AsyncMock)
+    async def test_validate_member_and_items_unknown_member_of_sold_out_item(self, mock_get_entry, mock_get_member):
+        mock_get_member.return_value = None
+        mock_get_entry.return_value = MagicMock(
+            expiration_date=datetime.datetime.utcnow() + datetime.timedelta(days=1), remaining_count=0)
+
+        request = ItemBookRequestBody(member_name="John", member_surname="Doe", item_name="Book")
+        with self.assertRaises(MemberNotFoundException):
+            await self.booking_service.validate_member_and_items(request, self.db)
+
+    @patch('repositories.member_repo.MemberRepo.get_member_from_name', new_callable=AsyncMock)
+    @patch('repositories.inventory_repo.InventoryRepo.get_inventory_catalog_entry', new_callable=AsyncMock)
+    @patch('repositories.inventory_repo.InventoryRepo.get_inventory_from_name', new_callable=AsyncMock)
+    async def test_validate_member_and_items_sold_out_in_catalog_cache(self, mock_get_inventory, mock_get_entry,
+                                                                       mock_get_member):
+        mock_get_member.return_value = MagicMock(booking_count=0)
+        mock_get_entry.return_value = MagicMock(
+            expiration_date=datetime.datetime.utcnow() + datetime.timedelta(days=1), remaining_count=0)
+
+        request = ItemBookRequestBody(member_name="John", member_surname="Doe", item_name="Book")
+        with self.assertRaises(ItemDepletedException):
+            await self.booking_service.validate_member_and_items(request, self.db)
+        mock_get_inventory.assert_not_called()
+
     @patch('repositories.member_repo.MemberRepo.get_member_from_name', new_callable=AsyncMock)
     @patch('repositories.booking_repo.BookingRepo.get_booking_from_reference', new_callable=AsyncMock)
     @patch('repositories.inventory_repo.InventoryRepo.get_inventory', new_callable=AsyncMock)
     async def test_validate_booking_success(self, mock_get_inventory, mock_get_booking, mock_get_member):
-        mock_get_member.return_value = MagicMock()
-        mock_get_booking.return_value = MagicMock()
+        mock_get_member.return_value = MagicMock(id=1)
+        mock_get_booking.return_value = MagicMock(member_id=1)
         mock_get_inventory.return_value = MagicMock()
 
         request = ItemCancelRequest(member_name="John", member_surname="Doe", booking_reference="12345")
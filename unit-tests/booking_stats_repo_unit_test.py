@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from models.db_booking_stats import DbBookingStats
+from models.db_bookings import DbBooking
+from models.db_holds import DbHold
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.booking_stats_repo import BookingStatsRepo, BOOKED, CANCELLED, DAY, HOUR, bucket_start
+
+
+class TestBookingStatsRepo(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.repo = BookingStatsRepo()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_bucket_start_truncates_to_the_granularity(self):
+        value = datetime(2024, 5, 17, 10, 30, 15, 123)
+
+        self.assertEqual(bucket_start(value, HOUR), datetime(2024, 5, 17, 10))
+        self.assertEqual(bucket_start(value, DAY), datetime(2024, 5, 17))
+
+    def test_record_increments_hourly_and_daily_buckets(self):
+        asyncio.run(self.repo.record({1: 2, 2: 1}, BOOKED, datetime(2024, 5, 17, 10, 5), self.db))
+        asyncio.run(self.repo.record({1: 1}, BOOKED, datetime(2024, 5, 17, 11, 5), self.db))
+        asyncio.run(self.repo.record({1: 1, 2: 0}, CANCELLED, datetime(2024, 5, 17, 11, 30), self.db))
+
+        days = asyncio.run(self.repo.get_buckets(DAY, [], self.db))
+        hours = asyncio.run(self.repo.get_buckets(HOUR, [DbBookingStats.inventory_id == 1], self.db))
+
+        self.assertEqual([(b.inventory_id, b.bucket_start, b.booked, b.cancelled) for b in days],
+                         [(1, datetime(2024, 5, 17), 3, 1), (2, datetime(2024, 5, 17), 1, 0)])
+        self.assertEqual([(b.bucket_start, b.booked, b.cancelled) for b in hours],
+                         [(datetime(2024, 5, 17, 10), 2, 0), (datetime(2024, 5, 17, 11), 1, 1)])
+
+    def test_active_bookings_are_counted_from_the_bookings(self):
+        # Ann's count was imported with the members and Bob's includes a hold, neither is a booking
+        self.db.add_all([DbMember(id=1, name="Ann", surname="A", booking_count=2, date_joined=datetime(2024, 1, 1)),
+                         DbMember(id=2, name="Bob", surname="B", booking_count=2, date_joined=datetime(2024, 1, 1)),
+                         DbMember(id=3, name="Cid", surname="C", booking_count=2, date_joined=datetime(2024, 1, 1)),
+                         DbInventory(id=1, title="Pen", description="d", remaining_count=1,
+                                     expiration_date=datetime(2099, 1, 1))])
+        self.db.add_all([DbBooking(member_id=member_id, inventory_id=1, booked_at=datetime(2024, 5, 17),
+                                   booking_reference="r" + str(i))
+                         for i, member_id in enumerate((2, 3, 3))])
+        self.db.add(DbHold(member_id=2, inventory_id=1, hold_reference="h", expires_at=datetime(2099, 1, 1)))
+        self.db.commit()
+
+        members = asyncio.run(self.repo.get_active_bookings([], 10, self.db))
+        self.assertEqual([(member.member_id, member.active_bookings) for member in members], [(3, 2), (2, 1)])
+        members = asyncio.run(self.repo.get_active_bookings([DbBooking.member_id == 2], 10, self.db))
+        self.assertEqual([(member.member_id, member.active_bookings) for member in members], [(2, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
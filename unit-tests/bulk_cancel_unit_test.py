@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from controllers.booking_controller import cancel_bookings_in_bulk, router
+from dto.booking_dto import BulkCancelRequest
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from services.auth_service import AuthService
+
+
+class TestBulkCancel(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        now = datetime.utcnow()
+        self.db.add_all([DbMember(id=1, name="Ann", surname="A", booking_count=2, date_joined=now),
+                         DbMember(id=2, name="Bob", surname="B", booking_count=1, date_joined=now),
+                         DbInventory(id=1, title="Pen", description="d", remaining_count=5,
+                                     expiration_date=datetime(2099, 1, 1)),
+                         DbInventory(id=2, title="Lamp", description="d", remaining_count=5,
+                                     expiration_date=datetime(2099, 1, 1)),
+                         DbBooking(member_id=1, inventory_id=1, booked_at=now, booking_reference="ann-pen"),
+                         DbBooking(member_id=1, inventory_id=2, booked_at=now, booking_reference="ann-lamp"),
+                         DbBooking(member_id=2, inventory_id=1, booked_at=now, booking_reference="bob-pen")])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def counts(self):
+        self.db.expire_all()
+        return ({member.name: member.booking_count for member in self.db.query(DbMember)},
+                {item.title: item.remaining_count for item in self.db.query(DbInventory)},
+                sorted(booking.booking_reference for booking in self.db.query(DbBooking)))
+
+    async def test_all_criteria_must_match_and_counters_are_restored(self):
+        response = await cancel_bookings_in_bulk(BulkCancelRequest(member_name="Ann", member_surname="A",
+                                                                   item_name="Pen"), self.db)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual([(r.booking_reference, r.status) for r in response.data], [("ann-pen", "cancelled")])
+        self.assertEqual(self.counts(), ({"Ann": 1, "Bob": 1}, {"Pen": 6, "Lamp": 5}, ["ann-lamp", "bob-pen"]))
+
+    async def test_references_not_matching_give_a_partial_result(self):
+        response = await cancel_bookings_in_bulk(BulkCancelRequest(
+            booking_references=["ann-pen", "ann-lamp", "nope"], item_name="Pen"), self.db)
+
+        self.assertEqual(response.status, 206)
+        self.assertEqual(sorted((r.booking_reference, r.status) for r in response.data),
+                         [("ann-lamp", "not_found"), ("ann-pen", "cancelled"), ("nope", "not_found")])
+        self.assertEqual(self.counts(), ({"Ann": 1, "Bob": 1}, {"Pen": 6, "Lamp": 5}, ["ann-lamp", "bob-pen"]))
+
+    async def test_an_item_releases_the_bookings_of_every_member(self):
+        response = await cancel_bookings_in_bulk(BulkCancelRequest(item_name="Pen"), self.db)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.counts(), ({"Ann": 1, "Bob": 0}, {"Pen": 7, "Lamp": 5}, ["ann-lamp"]))
+
+    def test_bulk_cancel_is_reserved_to_administrators(self):
+        auth_service = AuthService()
+        with patch.object(AuthService, "validate_token", return_value=MagicMock(username="someone")), \
+                patch("services.auth_service.ADMIN_USERNAMES", ["admin"]):
+            with self.assertRaises(HTTPException) as raised:
+                auth_service.validate_admin(MagicMock(), self.db)
+        self.assertEqual(raised.exception.status_code, 403)
+        route = next(route for route in router.routes if route.path == "/cancel-bulk")
+        self.assertIn(auth_service.validate_admin, [dependency.call for dependency in route.dependant.dependencies])
+
+
+if __name__ == '__main__':
+    unittest.main()
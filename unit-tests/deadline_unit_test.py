@@ -0,0 +1,65 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy.orm import Session
+
+from services.booking_service import BookingService
+from utils.deadline import current_deadline, parse_timeout, apply_deadline
+from utils.exceptions import DeadlineExceededException
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.token = current_deadline.set(None)
+
+    def tearDown(self):
+        current_deadline.reset(self.token)
+
+    def test_parse_timeout(self):
+        self.assertEqual(parse_timeout(b"2.5"), 2.5)
+        self.assertIsNone(parse_timeout(b"soon"))
+        self.assertIsNone(parse_timeout(b"-1"))
+        self.assertIsNone(parse_timeout(None))
+
+    def test_transactions_get_the_remaining_time_as_statement_and_lock_timeouts(self):
+        connection = MagicMock()
+        connection.dialect.name = "postgresql"
+        apply_deadline(None, None, connection)
+        connection.exec_driver_sql.assert_not_called()
+
+        current_deadline.set(time.monotonic() + 2)
+        apply_deadline(None, None, connection)
+
+        statements = [call.args[0] for call in connection.exec_driver_sql.call_args_list]
+        self.assertEqual([statement.rsplit(" ", 1)[0] for statement in statements],
+                         ["SET LOCAL statement_timeout =", "SET LOCAL lock_timeout ="])
+        self.assertTrue(all(1900 < int(statement.rsplit(" ", 1)[1]) <= 2000 for statement in statements))
+
+    def test_transactions_are_refused_after_the_deadline(self):
+        current_deadline.set(time.monotonic() - 1)
+
+        with self.assertRaises(DeadlineExceededException):
+            apply_deadline(None, None, MagicMock())
+
+    async def test_lock_wait_is_abandoned_at_the_deadline(self):
+        booking_service = BookingService()
+        db = MagicMock(spec=Session)
+        await booking_service.lock.acquire()
+        try:
+            current_deadline.set(time.monotonic() + 0.05)
+            with self.assertRaises(DeadlineExceededException):
+                async with booking_service.locked(db):
+                    self.fail("the lock is held by another request")
+            self.assertEqual(booking_service.lock_waiters, 0)
+        finally:
+            booking_service.lock.release()
+
+        current_deadline.set(time.monotonic() + 1)
+        async with booking_service.locked(db):
+            self.assertTrue(booking_service.lock.locked())
+
+
+if __name__ == '__main__':
+    unittest.main()
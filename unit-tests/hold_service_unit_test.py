@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from dto.booking_dto import ItemBookRequestBody, HoldRequest
+from models.db_bookings import DbBooking
+from models.db_holds import DbHold
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.inventory_catalog_cache import InventoryCatalogCache
+from services.hold_service import HoldService
+from utils.exceptions import HoldExpiredException, HoldNotFoundException
+
+
+class TestHoldService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([DbMember(id=1, name="Ann", surname="A", booking_count=0, date_joined=datetime.utcnow()),
+                         DbMember(id=2, name="Bob", surname="B", booking_count=0, date_joined=datetime.utcnow()),
+                         DbInventory(id=1, title="Pen", description="d", remaining_count=2,
+                                     expiration_date=datetime(2099, 1, 1))])
+        self.db.commit()
+        InventoryCatalogCache().clear()
+        self.hold_service = HoldService()
+
+    def tearDown(self):
+        self.db.close()
+
+    def counts(self):
+        self.db.expire_all()
+        return (self.db.get(DbMember, 1).booking_count, self.db.get(DbInventory, 1).remaining_count,
+                self.db.query(DbHold).count(), self.db.query(DbBooking).count())
+
+    async def hold(self, name="Ann", surname="A") -> HoldRequest:
+        hold = await self.hold_service.hold_an_item(
+            ItemBookRequestBody(member_name=name, member_surname=surname, item_name="Pen"), self.db)
+        return HoldRequest(member_name=name, member_surname=surname, hold_reference=hold.hold_reference)
+
+    async def test_hold_takes_a_unit_and_confirm_books_it_under_the_same_reference(self):
+        request = await self.hold()
+        self.assertEqual(self.counts(), (1, 1, 1, 0))
+
+        booking = await self.hold_service.confirm_hold(request, self.db)
+
+        self.assertEqual(booking.booking_reference, request.hold_reference)
+        self.assertEqual(self.counts(), (1, 1, 0, 1))
+
+    async def test_release_gives_the_unit_back(self):
+        request = await self.hold()
+
+        await self.hold_service.release_hold(request, self.db)
+
+        self.assertEqual(self.counts(), (0, 2, 0, 0))
+
+    async def test_only_the_member_holding_it_can_confirm_or_release(self):
+        request = await self.hold()
+
+        with self.assertRaises(HoldNotFoundException):
+            await self.hold_service.release_hold(HoldRequest(member_name="Bob", member_surname="B",
+                                                             hold_reference=request.hold_reference), self.db)
+        self.assertEqual(self.counts(), (1, 1, 1, 0))
+
+    async def test_an_expired_hold_is_released_instead_of_confirmed(self):
+        request = await self.hold()
+        self.db.query(DbHold).update({DbHold.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        self.db.commit()
+
+        with self.assertRaises(HoldExpiredException):
+            await self.hold_service.confirm_hold(request, self.db)
+        self.assertEqual(self.counts(), (0, 2, 0, 0))
+
+    async def test_sweeper_releases_the_expired_holds_in_batches(self):
+        await self.hold()
+        await self.hold("Bob", "B")
+        self.db.query(DbHold).update({DbHold.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        self.db.commit()
+
+        with patch("services.hold_service.HOLD_SWEEP_BATCH_SIZE", 1):
+            releases = await self.hold_service.sweep_expired_holds(self.db)
+
+        self.assertEqual([len(release.references) for release in releases], [1, 1, 0])
+        self.assertEqual(sum(release.released[1] for release in releases), 2)
+        self.assertEqual(self.counts(), (0, 2, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
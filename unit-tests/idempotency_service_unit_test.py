@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from configuration.database_config import Base
+from dto.base_dto import BaseDTO
+from dto.booking_dto import ItemBookRequestBody
+from models.db_idempotency_key import DbIdempotencyKey
+from repositories.idempotency_repo import PENDING_RESPONSE
+from services.idempotency_service import IdempotencyService
+
+
+class TestIdempotencyService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.idempotency_service = IdempotencyService()
+        self.idempotency_service.results.clear()
+        self.db = MagicMock(spec=Session)
+        self.request = ItemBookRequestBody(member_name="John", member_surname="Doe", item_name="Book")
+        self.calls = 0
+
+    async def handler(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return BaseDTO(data="booking " + str(self.calls))
+
+    async def test_repeated_key_returns_original_result(self):
+        first = await self.idempotency_service.execute("key-1", "book:1", self.request, self.handler, self.db)
+        second = await self.idempotency_service.execute("key-1", "book:1", self.request, self.handler, self.db)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first, second)
+
+    async def test_concurrent_requests_with_same_key_run_once(self):
+        results = await asyncio.gather(
+            *[self.idempotency_service.execute("key-2", "book:1", self.request, self.handler, self.db)
+              for _ in range(3)])
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result.data == "booking 1" for result in results))
+
+    async def test_key_reused_with_different_request_is_rejected(self):
+        await self.idempotency_service.execute("key-3", "book:1", self.request, self.handler, self.db)
+        other_request = ItemBookRequestBody(member_name="Jane", member_surname="Doe", item_name="Book")
+        result = await self.idempotency_service.execute("key-3", "book:1", other_request, self.handler, self.db)
+
+        self.assertEqual(result.status, 422)
+        self.assertEqual(self.calls, 1)
+
+    async def test_server_errors_are_not_stored(self):
+        async def failing_handler():
+            self.calls += 1
+            return BaseDTO(status=500, message="failed")
+
+        await self.idempotency_service.execute("key-4", "book:1", self.request, failing_handler, self.db)
+        result = await self.idempotency_service.execute("key-4", "book:1", self.request, self.handler, self.db)
+
+        self.assertEqual(result.status, 200)
+        self.assertEqual(self.calls, 2)
+
+    async def test_keys_are_scoped(self):
+        await self.idempotency_service.execute("key-5", "book:1", self.request, self.handler, self.db)
+        await self.idempotency_service.execute("key-5", "book:2", self.request, self.handler, self.db)
+
+        self.assertEqual(self.calls, 2)
+
+
+@patch('services.idempotency_service.IDEMPOTENCY_PENDING_POLL_SECONDS', 0)
+class TestDatabaseIdempotency(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[DbIdempotencyKey.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.idempotency_service = IdempotencyService()
+        self.idempotency_service.results.clear()
+        patcher = patch.object(self.idempotency_service, 'use_database', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = ItemBookRequestBody(member_name="John", member_surname="Doe", item_name="Book")
+        self.calls = 0
+
+    def tearDown(self):
+        self.db.close()
+
+    async def handler(self):
+        self.calls += 1
+        return BaseDTO(data="booking " + str(self.calls))
+
+    async def execute(self):
+        return await self.idempotency_service.execute("key-1", "book:1", self.request, self.handler, self.db)
+
+    def add_pending_row(self, created_at):
+        request_hash = self.db.query(DbIdempotencyKey).one().request_hash
+        self.db.query(DbIdempotencyKey).update({DbIdempotencyKey.response: PENDING_RESPONSE,
+                                                DbIdempotencyKey.created_at: created_at})
+        self.db.commit()
+        self.idempotency_service.results.clear()
+        return request_hash
+
+    async def test_the_key_is_claimed_before_the_handler_runs(self):
+        async def handler():
+            row = self.db.query(DbIdempotencyKey).one()
+            self.assertEqual(row.response, PENDING_RESPONSE)
+            return await self.handler()
+
+        result = await self.idempotency_service.execute("key-1", "book:1", self.request, handler, self.db)
+
+        self.assertEqual(BaseDTO.model_validate_json(self.db.query(DbIdempotencyKey).one().response).data, result.data)
+
+    async def test_a_key_pending_on_another_worker_is_waited_for(self):
+        await self.execute()
+        self.add_pending_row(datetime.utcnow())
+
+        async def other_worker_completes():
+            await asyncio.sleep(0.01)
+            self.db.query(DbIdempotencyKey).update({DbIdempotencyKey.response: BaseDTO(data="other").model_dump_json()})
+            self.db.commit()
+
+        result, _ = await asyncio.gather(self.execute(), other_worker_completes())
+
+        self.assertEqual(result.data, "other")
+        self.assertEqual(self.calls, 1)
+
+    async def test_a_key_pending_for_longer_than_the_timeout_is_taken_over(self):
+        await self.execute()
+        self.add_pending_row(datetime.utcnow() - timedelta(hours=1))
+
+        result = await self.execute()
+
+        self.assertEqual((result.data, self.calls), ("booking 2", 2))
+
+    async def test_failed_requests_release_the_key(self):
+        async def failing_handler():
+            raise RuntimeError("connection lost")
+
+        with self.assertRaises(RuntimeError):
+            await self.idempotency_service.execute("key-1", "book:1", self.request, failing_handler, self.db)
+        self.assertEqual(self.db.query(DbIdempotencyKey).count(), 0)
+
+        async def server_error():
+            return BaseDTO(status=500, message="failed")
+
+        await self.idempotency_service.execute("key-1", "book:1", self.request, server_error, self.db)
+        self.assertEqual(self.db.query(DbIdempotencyKey).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
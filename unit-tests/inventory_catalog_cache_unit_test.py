@@ -0,0 +1,75 @@
+import unittest, datetime
+
+from repositories.inventory_catalog_cache import InventoryCatalogCache, InventoryCatalogEntry
+from utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, ttl_seconds=10, clock=self.clock)
+
+    def test_get_returns_stored_value(self):
+        self.cache.set("Book", 1)
+        self.assertEqual(self.cache.get("Book"), 1)
+
+    def test_entry_expires_after_ttl(self):
+        self.cache.set("Book", 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("Book"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set("Book", 1)
+        self.cache.set("Pen", 2)
+        self.cache.get("Book")
+        self.cache.set("Lamp", 3)
+
+        self.assertEqual(self.cache.get("Book"), 1)
+        self.assertIsNone(self.cache.get("Pen"))
+        self.assertEqual(self.cache.get("Lamp"), 3)
+
+
+class TestInventoryCatalogCache(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog_cache = InventoryCatalogCache()
+        self.catalog_cache.clear()
+        self.expiration_date = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+
+    def tearDown(self):
+        self.catalog_cache.clear()
+
+    def test_refresh_writes_through_every_name_of_the_item(self):
+        self.catalog_cache.put("Book", InventoryCatalogEntry(1, "Book", self.expiration_date, 2))
+        self.catalog_cache.put("Bo%", InventoryCatalogEntry(1, "Book", self.expiration_date, 2))
+        self.catalog_cache.put("Pen", InventoryCatalogEntry(2, "Pen", self.expiration_date, 5))
+
+        self.catalog_cache.refresh(InventoryCatalogEntry(1, "Book", self.expiration_date, 0))
+
+        self.assertEqual(self.catalog_cache.get("Book").remaining_count, 0)
+        self.assertEqual(self.catalog_cache.get("Bo%").remaining_count, 0)
+        self.assertEqual(self.catalog_cache.get("Pen").remaining_count, 5)
+
+    def test_invalidate_item_drops_only_that_item(self):
+        self.catalog_cache.put("Book", InventoryCatalogEntry(1, "Book", self.expiration_date, 2))
+        self.catalog_cache.put("Pen", InventoryCatalogEntry(2, "Pen", self.expiration_date, 5))
+
+        self.catalog_cache.invalidate_item(1)
+
+        self.assertIsNone(self.catalog_cache.get("Book"))
+        self.assertIsNotNone(self.catalog_cache.get("Pen"))
+
+
+if __name__ == '__main__':
+    unittest.main()
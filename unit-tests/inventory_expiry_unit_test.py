@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from dto.booking_dto import ItemBookRequestBody
+from models.db_bookings import DbBooking  # noqa: F401, configures the inventory mapper
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from repositories.inventory_catalog_cache import InventoryCatalogCache
+from repositories.inventory_repo import InventoryRepo
+from repositories.table_version_repo import TableVersionRepo
+from services.booking_service import BookingService
+from services.inventory_service import InventoryService
+from utils.exceptions import ItemExpiredException
+
+
+class TestInventoryExpiry(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        past, future = datetime.utcnow() - timedelta(days=1), datetime(2099, 1, 1)
+        self.db.add_all([DbInventory(id=1, title="Old", description="d", remaining_count=1, expiration_date=past),
+                         DbInventory(id=2, title="Older", description="d", remaining_count=2, expiration_date=past),
+                         DbInventory(id=3, title="Gone", description="d", remaining_count=0, expiration_date=past),
+                         DbInventory(id=4, title="New", description="d", remaining_count=1, expiration_date=future),
+                         DbMember(id=1, name="Ann", surname="A", booking_count=0, date_joined=datetime.utcnow())])
+        self.db.commit()
+        InventoryCatalogCache().clear()
+
+    def tearDown(self):
+        self.db.close()
+
+    def expired_ids(self):
+        self.db.expire_all()
+        return {item.id for item in self.db.query(DbInventory).filter(DbInventory.is_expired)}
+
+    @patch('services.inventory_service.INVENTORY_EXPIRY_SWEEP_BATCH_SIZE', 1)
+    async def test_sweep_marks_the_expired_live_items_in_batches(self):
+        with patch.object(InventoryRepo(), 'mark_expired_items', wraps=InventoryRepo().mark_expired_items) as mark:
+            expired = await InventoryService().sweep_expired_items(self.db)
+
+        self.assertEqual(expired, 2)
+        self.assertEqual(mark.call_count, 3)
+        # sold out items are outside the live index, they are marked once a release puts stock back
+        self.assertEqual(self.expired_ids(), {1, 2})
+
+    async def test_sweep_leaves_the_inventory_version_alone(self):
+        version = await TableVersionRepo().get_version(DbInventory.__tablename__, self.db)
+
+        await InventoryService().sweep_expired_items(self.db)
+
+        self.assertEqual(await TableVersionRepo().get_version(DbInventory.__tablename__, self.db), version)
+
+    async def test_booking_lookup_skips_the_items_marked_as_expired(self):
+        await InventoryService().sweep_expired_items(self.db)
+
+        self.assertIsNone(await InventoryRepo().get_inventory_from_name("Old", self.db))
+        self.assertIsNotNone(await InventoryRepo().get_inventory_from_name("New", self.db))
+
+    async def test_booking_of_an_item_expired_since_cached_is_rejected_as_expired(self):
+        entry = await InventoryRepo().get_inventory_catalog_entry("Old", self.db)
+        InventoryCatalogCache().put("Old", entry._replace(expiration_date=datetime(2099, 1, 1)))
+        await InventoryService().sweep_expired_items(self.db)
+
+        with self.assertRaises(ItemExpiredException):
+            await BookingService().validate_member_and_items(
+                ItemBookRequestBody(member_name="Ann", member_surname="A", item_name="Old"), self.db)
+
+    def test_add_expiry_column_to_a_table_created_without_it(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.execute(text('CREATE TABLE "Inventory" (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, '
+                                    'description VARCHAR, remaining_count INTEGER NOT NULL, '
+                                    'expiration_date DATETIME NOT NULL)'))
+            connection.execute(text('INSERT INTO "Inventory" VALUES (1, \'Pen\', \'d\', 1, \'2099-01-01\')'))
+
+        InventoryRepo().add_expiry_column(engine)
+        InventoryRepo().add_expiry_column(engine)
+
+        self.assertIn("is_expired", {column["name"] for column in inspect(engine).get_columns("Inventory")})
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text('SELECT is_expired FROM "Inventory"')).scalar(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import logging
+import queue
+import unittest
+from unittest.mock import MagicMock
+
+from utils.logging_setup import DroppingQueueHandler, JsonFormatter, RequestContextFilter, current_request_id
+from utils.utilities import log_rejected_rows
+
+
+class TestLoggingSetup(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = queue.Queue(maxsize=1)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(RequestContextFilter())
+        self.logger = logging.getLogger("logging_setup_unit_test")
+        self.logger.propagate = False
+        self.logger.handlers = [self.handler]
+        self.logger.setLevel(logging.INFO)
+
+    def test_records_are_queued_as_json_with_the_request_id(self):
+        token = current_request_id.set("abc123")
+        try:
+            self.logger.info("Booking successful: %s", "REF-1", extra={"item_id": 7})
+        finally:
+            current_request_id.reset(token)
+
+        entry = json.loads(JsonFormatter().format(self.queue.get_nowait()))
+        self.assertEqual(entry["message"], "Booking successful: REF-1")
+        self.assertEqual(entry["request_id"], "abc123")
+        self.assertEqual(entry["item_id"], 7)
+        self.assertEqual(entry["level"], "INFO")
+
+    def test_records_are_dropped_when_the_queue_is_full(self):
+        self.logger.info("first")
+        self.logger.info("second")
+        self.logger.debug("below the level, never rendered")
+
+        self.assertEqual(self.handler.dropped, 1)
+        self.assertEqual(self.queue.get_nowait().getMessage(), "first")
+
+    def test_rejected_rows_are_logged_in_a_single_summary(self):
+        logger = MagicMock()
+        log_rejected_rows(logger, "member rows", 100, {"with an invalid format": list(range(10)),
+                                                       "with missing columns": []})
+        log_rejected_rows(logger, "member rows", 100, {"with an invalid format": []})
+
+        logger.warning.assert_called_once()
+        self.assertEqual(logger.warning.call_args.args[1:4], (10, 100, "member rows"))
+        self.assertIn("10 with an invalid format (e.g. [0, 1, 2, 3, 4])", logger.warning.call_args.args[4])
+
+
+if __name__ == '__main__':
+    unittest.main()
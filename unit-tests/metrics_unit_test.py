@@ -0,0 +1,42 @@
+import unittest
+
+from utils.metrics import Histogram, render_histograms, render_samples
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_snapshot_reports_cumulative_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        self.assertEqual(snapshot["buckets"], {"0.1": 2, "1": 3, "+Inf": 4})
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 3.65)
+
+    def test_histograms_render_in_prometheus_text_format(self):
+        histogram = Histogram(buckets=(0.5,))
+        histogram.observe(0.25)
+        lines = []
+
+        render_histograms(lines, "latency_seconds", "Latency.", [((("route", "/all"),), histogram)])
+
+        self.assertEqual(lines, ['# HELP latency_seconds Latency.',
+                                 '# TYPE latency_seconds histogram',
+                                 'latency_seconds_bucket{route="/all",le="0.5"} 1',
+                                 'latency_seconds_bucket{route="/all",le="+Inf"} 1',
+                                 'latency_seconds_sum{route="/all"} 0.25',
+                                 'latency_seconds_count{route="/all"} 1'])
+
+    def test_label_values_are_escaped(self):
+        lines = []
+
+        render_samples(lines, "waiters", "gauge", "Waiters.", [((("name", 'a"b\\c'),), 2)])
+
+        self.assertEqual(lines[-1], 'waiters{name="a\\"b\\\\c"} 2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import threading
+import time
+import unittest
+
+from utils.profiling import CPROFILE, Profile, ProfileStore, StackSampler
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_store_keeps_the_latest_profiles(self):
+        store = ProfileStore()
+        ids = [store.new_id() for _ in range(store.profiles.maxlen + 1)]
+        for profile_id in ids:
+            store.add(Profile(profile_id, "POST /book", CPROFILE, 1.0, b""))
+
+        self.assertIsNone(store.get(ids[0]))
+        self.assertEqual(store.get(ids[-1]).filename, f"profile-{ids[-1]}.pstats")
+        self.assertEqual(store.list()[0]["id"], ids[-1])
+
+    def test_sampler_collapses_the_stacks_of_the_thread(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        lines = sampler.stop().decode().splitlines()
+
+        self.assertTrue(lines)
+        self.assertIn("test_sampler_collapses_the_stacks_of_the_thread", lines[0])
+        self.assertTrue(lines[0].rsplit(" ", 1)[1].isdigit())
+
+
+if __name__ == '__main__':
+    unittest.main()
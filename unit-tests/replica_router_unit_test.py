@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from configuration.database_router import ReplicaRouter
+
+
+class TestReplicaRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.fast = MagicMock(is_usable=True, latency=0.001)
+        self.slow = MagicMock(is_usable=True, latency=0.010)
+        self.lagging = MagicMock(is_usable=False, latency=0.0001)
+        self.router.replicas = [self.slow, self.lagging, self.fast]
+
+    def tearDown(self):
+        self.router.replicas = []
+
+    def test_round_robin_skips_unusable_replicas(self):
+        selected = [self.router.select() for _ in range(4)]
+
+        self.assertNotIn(self.lagging, selected)
+        self.assertEqual(selected.count(self.fast), 2)
+        self.assertEqual(selected.count(self.slow), 2)
+
+    @patch('configuration.database_router.REPLICA_SELECTION', "least_latency")
+    def test_least_latency_selects_fastest_usable_replica(self):
+        self.assertIs(self.router.select(), self.fast)
+
+    def test_falls_back_to_primary_without_usable_replica(self):
+        self.fast.is_usable = self.slow.is_usable = False
+
+        self.assertIsNone(self.router.select())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine, text
+
+from utils.slow_query_log import redact, explain_prefix, SlowQueryLog, EXPLAIN_COOLDOWN_SECONDS, \
+    MAX_PENDING_EXPLAINS
+
+
+class TestSlowQueryLog(unittest.TestCase):
+
+    def setUp(self):
+        self.slow_query_log = SlowQueryLog()
+        self.slow_query_log.__init__()
+        self.addCleanup(self.slow_query_log.__init__)
+
+    def test_redact_keeps_parameter_names_and_types_only(self):
+        self.assertEqual(redact({"name_1": "John", "id_1": 4}), {"name_1": "str", "id_1": "int"})
+        self.assertEqual(redact(("John", 4, None)), ["str", "int", "NoneType"])
+
+    def test_explain_analyzes_the_plain_selects_only(self):
+        analyze = "EXPLAIN (ANALYZE, BUFFERS) "
+        self.assertEqual(explain_prefix("postgresql", ' SELECT * FROM "Members" WHERE id = %(id)s'), analyze)
+        for statement in ['SELECT * FROM "Members" WHERE id = 1 FOR UPDATE',
+                          'SELECT * FROM "Members"\nFOR UPDATE SKIP LOCKED',
+                          'SELECT * FROM "Members" FOR NO KEY UPDATE',
+                          'SELECT * FROM "Members" FOR SHARE',
+                          'WITH moved AS (DELETE FROM "Bookings_default" RETURNING *) SELECT count(*) FROM moved',
+                          'UPDATE "Inventory" SET remaining_count = remaining_count - 1']:
+            self.assertEqual(explain_prefix("postgresql", statement), "EXPLAIN ", statement)
+        self.assertEqual(explain_prefix("sqlite", "SELECT 1"), "EXPLAIN QUERY PLAN ")
+        self.assertIsNone(explain_prefix("mysql", "SELECT 1"))
+
+    @patch('utils.slow_query_log.SLOW_QUERY_EXPLAIN', False)
+    def test_only_the_statements_over_the_threshold_are_recorded(self):
+        engine = create_engine("sqlite://")
+        with patch('utils.slow_query_log.SLOW_QUERY_THRESHOLD_MS', 60_000):
+            self.slow_query_log.attach("primary", engine)
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        self.assertEqual(self.slow_query_log.recent(), [])
+
+        engine = create_engine("sqlite://")
+        with patch('utils.slow_query_log.SLOW_QUERY_THRESHOLD_MS', 1e-9):
+            self.slow_query_log.attach("primary", engine)
+            with engine.connect() as connection:
+                connection.execute(text("SELECT :value"), {"value": 1})
+        entry = self.slow_query_log.recent()[0]
+        self.assertEqual((entry["engine"], entry["statement"], entry["parameters"]), ("primary", "SELECT ?", ["int"]))
+
+    @patch('utils.slow_query_log.SLOW_QUERY_EXPLAIN', False)
+    @patch('utils.slow_query_log.SLOW_QUERY_LOG_SIZE', 2)
+    def test_the_log_keeps_the_latest_statements_only(self):
+        self.slow_query_log.__init__()
+        for i in range(3):
+            self.slow_query_log.record("primary", MagicMock(), f"SELECT {i}", (), 1.0, False)
+
+        self.assertEqual([entry["statement"] for entry in self.slow_query_log.recent()], ["SELECT 2", "SELECT 1"])
+
+    @patch('utils.slow_query_log.time.monotonic')
+    def test_a_statement_is_explained_at_most_once_a_minute(self, monotonic):
+        monotonic.return_value = 1000.0
+        self.assertTrue(self.slow_query_log._should_explain("SELECT 1"))
+        self.slow_query_log.pending = 0
+        self.assertFalse(self.slow_query_log._should_explain("SELECT 1"))
+        self.assertTrue(self.slow_query_log._should_explain("SELECT 2"))
+
+        monotonic.return_value += EXPLAIN_COOLDOWN_SECONDS
+        self.slow_query_log.pending = 0
+        self.assertTrue(self.slow_query_log._should_explain("SELECT 1"))
+
+    def test_pending_explains_are_bounded(self):
+        for i in range(MAX_PENDING_EXPLAINS):
+            self.assertTrue(self.slow_query_log._should_explain(f"SELECT {i}"))
+        self.assertFalse(self.slow_query_log._should_explain("SELECT 'one more'"))
+
+    def test_explain_captures_the_plan_on_another_connection(self):
+        engine = create_engine("sqlite://")
+        entry = {"caller": None, "plan": None}
+        self.slow_query_log.pending = 1
+
+        self.slow_query_log._explain(engine, entry, "SELECT ?", (1,))
+
+        self.assertTrue(entry["plan"])
+        self.assertNotIn("plan not captured", entry["plan"][0])
+        self.assertEqual(self.slow_query_log.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
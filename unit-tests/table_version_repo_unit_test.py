@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from models.db_table_version import DbTableVersion
+from repositories.table_version_repo import TableVersionRepo
+from utils.utilities import build_etag, etag_matches
+
+
+class TestEtag(unittest.TestCase):
+
+    def test_build_etag_quotes_the_table_and_version(self):
+        self.assertEqual(build_etag("Inventory", 3), '"Inventory-3"')
+
+    def test_build_etag_tells_the_variants_apart(self):
+        etag = build_etag("Bookings", 3, '{"member_id":1}')
+
+        self.assertTrue(etag.startswith('"Bookings-3-'))
+        self.assertEqual(etag, build_etag("Bookings", 3, '{"member_id":1}'))
+        self.assertNotEqual(etag, build_etag("Bookings", 3, '{"member_id":2}'))
+
+    def test_etag_matches_the_current_etag_only(self):
+        etag = build_etag("Inventory", 3)
+
+        self.assertTrue(etag_matches('"Inventory-3"', etag))
+        self.assertTrue(etag_matches('W/"Inventory-3"', etag))
+        self.assertTrue(etag_matches('"Inventory-1", "Inventory-3"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"Inventory-2"', etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches("", etag))
+
+
+class TestTableVersionRepo(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[DbTableVersion.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.repo = TableVersionRepo()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_bump_versions_increments_every_table_once(self):
+        self.assertEqual(asyncio.run(self.repo.get_version("Bookings", self.db)), 0)
+
+        first = asyncio.run(self.repo.bump_versions(["Members", "Bookings"], self.db))
+        second = asyncio.run(self.repo.bump_versions(["Bookings", "Bookings"], self.db))
+
+        self.assertEqual(first, {"Bookings": 1, "Members": 1})
+        self.assertEqual(second, {"Bookings": 2})
+
+    def test_get_versions_reads_every_table_in_one_query(self):
+        asyncio.run(self.repo.bump_versions(["Members", "Bookings"], self.db))
+
+        self.assertEqual(asyncio.run(self.repo.get_versions(["Bookings", "Inventory"], self.db)),
+                         {"Bookings": 1, "Inventory": 0})
+
+    def test_commit_with_versions_commits_the_write_and_the_versions_together(self):
+        self.db.add(DbTableVersion(table_name="Members", version=7))
+
+        versions = asyncio.run(self.repo.commit_with_versions(["Inventory"], self.db))
+        self.db.rollback()
+
+        self.assertEqual(versions, {"Inventory": 1})
+        self.assertEqual(asyncio.run(self.repo.get_versions(["Inventory", "Members"], self.db)),
+                         {"Inventory": 1, "Members": 7})
+
+    def test_failed_bump_is_raised_to_the_writer(self):
+        db = MagicMock()
+        db.commit.side_effect = RuntimeError("database unavailable")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.repo.commit_with_versions(["Inventory"], db))
+
+
+if __name__ == '__main__':
+    unittest.main()
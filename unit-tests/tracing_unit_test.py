@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+
+from utils.tracing import Trace, current_trace, parse_traceparent, span, traced
+
+
+class Repo:
+    @traced
+    async def load(self):
+        with span("query"):
+            return 1
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_untraced_calls_record_nothing(self):
+        self.assertEqual(asyncio.run(Repo().load()), 1)
+        self.assertIsNone(current_trace.get())
+
+    def test_traced_calls_record_nested_spans(self):
+        trace = Trace()
+
+        async def run():
+            current_trace.set(trace)
+            return await Repo().load()
+
+        self.assertEqual(asyncio.run(run()), 1)
+        spans = {recorded.name: recorded for recorded in trace.spans}
+        self.assertEqual(set(spans), {"Repo.load", "query"})
+        self.assertEqual(spans["query"].parent_id, spans["Repo.load"].span_id)
+        self.assertTrue(trace.server_timing(5).startswith("Repo.load;dur="))
+        self.assertTrue(trace.server_timing(5).endswith("total;dur=5.000"))
+
+    def test_parse_traceparent(self):
+        trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+        self.assertEqual(parse_traceparent(f"00-{trace_id}-{parent_id}-01"), (trace_id, parent_id, True))
+        self.assertEqual(parse_traceparent(f"00-{trace_id}-{parent_id}-00")[2], False)
+        self.assertIsNone(parse_traceparent("garbage"))
+        self.assertIsNone(parse_traceparent(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from configuration.database_config import Base
+from models.db_bookings import DbBooking
+from models.db_inventory import DbInventory
+from models.db_member import DbMember
+from dto.booking_dto import ItemBookRequestBody
+from models.db_waitlist import DbWaitlistEntry
+from repositories.inventory_catalog_cache import InventoryCatalogCache
+from repositories.waitlist_repo import WaitlistRepo, WAITING, ASSIGNED
+from services.booking_service import BookingService
+
+
+class TestWaitlistRepo(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([DbMember(id=1, name="Ann", surname="A", booking_count=0, date_joined=datetime.utcnow()),
+                         DbMember(id=2, name="Bob", surname="B", booking_count=2, date_joined=datetime.utcnow()),
+                         DbMember(id=3, name="Cid", surname="C", booking_count=0, date_joined=datetime.utcnow()),
+                         DbInventory(id=1, title="Pen", description="d", remaining_count=0,
+                                     expiration_date=datetime(2099, 1, 1))])
+        self.db.commit()
+        self.waitlist_repo = WaitlistRepo()
+
+    def tearDown(self):
+        self.db.close()
+
+    async def test_add_entry_keeps_a_single_waiting_entry_per_member_and_item(self):
+        first = await self.waitlist_repo.add_entry(1, 1, self.db)
+        second = await self.waitlist_repo.add_entry(1, 1, self.db)
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(self.db.query(DbWaitlistEntry).count(), 1)
+
+    async def test_add_entry_after_an_assignment_waits_again(self):
+        first = await self.waitlist_repo.add_entry(1, 1, self.db)
+        first.status = ASSIGNED
+        self.db.commit()
+
+        second = await self.waitlist_repo.add_entry(1, 1, self.db)
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(second.status, WAITING)
+
+    async def test_assign_released_units_in_fifo_order_skipping_members_at_the_limit(self):
+        for member_id in (2, 1, 3):
+            await self.waitlist_repo.add_entry(member_id, 1, self.db)
+        self.db.get(DbInventory, 1).remaining_count = 1
+
+        assigned = await self.waitlist_repo.assign_released_units({1: 1}, self.db)
+        self.db.commit()
+
+        self.assertEqual(assigned, {1: 1})
+        statuses = {entry.member_id: entry.status for entry in self.db.query(DbWaitlistEntry)}
+        # Bob is at MAX_BOOKINGS and keeps the place, Ann is next in line, Cid keeps waiting
+        self.assertEqual(statuses, {2: WAITING, 1: ASSIGNED, 3: WAITING})
+        booking = self.db.query(DbBooking).one()
+        self.assertEqual(booking.member_id, 1)
+        self.assertEqual((self.db.get(DbMember, 1).booking_count, self.db.get(DbInventory, 1).remaining_count),
+                         (1, 0))
+
+    @patch('repositories.waitlist_repo.WAITLIST_SCAN_LIMIT', 1)
+    async def test_assign_released_units_pages_past_the_members_at_the_limit(self):
+        self.db.add(DbMember(id=4, name="Dan", surname="D", booking_count=2, date_joined=datetime.utcnow()))
+        for member_id in (2, 4, 1, 3):
+            await self.waitlist_repo.add_entry(member_id, 1, self.db)
+        self.db.get(DbInventory, 1).remaining_count = 2
+
+        assigned = await self.waitlist_repo.assign_released_units({1: 2}, self.db)
+
+        self.assertEqual(assigned, {1: 2})
+        statuses = {entry.member_id: entry.status for entry in self.db.query(DbWaitlistEntry)}
+        self.assertEqual(statuses, {2: WAITING, 4: WAITING, 1: ASSIGNED, 3: ASSIGNED})
+
+    async def test_assign_released_units_is_bounded_by_the_released_units(self):
+        for member_id in (1, 3):
+            await self.waitlist_repo.add_entry(member_id, 1, self.db)
+        self.db.get(DbInventory, 1).remaining_count = 5
+
+        assigned = await self.waitlist_repo.assign_released_units({1: 1}, self.db)
+
+        self.assertEqual(assigned, {1: 1})
+        self.assertEqual(self.db.get(DbInventory, 1).remaining_count, 4)
+        self.assertEqual(self.db.query(DbWaitlistEntry).filter(DbWaitlistEntry.status == WAITING).count(), 1)
+
+    async def test_assign_released_units_without_waiting_members(self):
+        assigned = await self.waitlist_repo.assign_released_units({1: 2}, self.db)
+
+        self.assertEqual(assigned, {})
+        self.assertEqual(self.db.query(DbBooking).count(), 0)
+
+    async def join_waitlist(self, member_name):
+        return await BookingService().join_waitlist(
+            ItemBookRequestBody(member_name=member_name, member_surname=member_name[0], item_name="Pen"), self.db)
+
+    async def test_join_waitlist_of_a_depleted_item_waits(self):
+        entry = await self.join_waitlist("Ann")
+
+        self.assertEqual((entry.status, entry.position), (WAITING, 1))
+        self.assertEqual(self.db.query(DbBooking).count(), 0)
+
+    async def test_join_waitlist_of_an_item_back_in_stock_assigns_it(self):
+        InventoryCatalogCache().clear()
+        await self.join_waitlist("Cid")
+        # a unit cancelled after Ann was told the item is depleted, with the catalog cache still showing none
+        self.db.get(DbInventory, 1).remaining_count = 1
+        self.db.commit()
+
+        entry = await self.join_waitlist("Ann")
+
+        self.assertEqual(entry.status, WAITING)
+        statuses = {entry.member_id: entry.status for entry in self.db.query(DbWaitlistEntry)}
+        self.assertEqual(statuses, {3: ASSIGNED, 1: WAITING})
+        self.assertEqual(self.db.query(DbBooking).one().member_id, 3)
+
+        self.db.get(DbInventory, 1).remaining_count = 1
+        self.db.commit()
+        entry = await self.join_waitlist("Ann")
+
+        self.assertEqual(entry.status, ASSIGNED)
+        self.assertEqual(self.db.get(DbInventory, 1).remaining_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
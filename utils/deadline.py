@@ -0,0 +1,85 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from configuration.config import REQUEST_TIMEOUT_SECONDS, REQUEST_ROUTE_TIMEOUTS
+from utils.exceptions import DeadlineExceededException
+from utils.metrics import current_endpoint
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+# Monotonic time by which the request being served must be answered, None without deadline
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline of the current request, None without deadline."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline():
+    """Raises DeadlineExceededException when the deadline of the current request has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededException("Request deadline exceeded")
+
+
+def parse_timeout(header: Optional[bytes]) -> Optional[float]:
+    """The timeout in seconds of an X-Request-Timeout header, None if it is missing or invalid."""
+    try:
+        timeout = float(header) if header else None
+    except ValueError:
+        return None
+    return timeout if timeout is not None and timeout >= 0 else None
+
+
+def apply_deadline(session, transaction, connection):
+    """
+        Bounds every statement and lock wait of a transaction begun while serving a request to the time the
+        request has left, with SET LOCAL so the pooled connection gets its settings back at the end of the
+        transaction. Transactions begun after the deadline are refused.
+    """
+    left = remaining()
+    if left is None:
+        return
+    if left <= 0:
+        raise DeadlineExceededException("Request deadline exceeded")
+    if connection.dialect.name == "postgresql":
+        milliseconds = max(int(left * 1000), 1)
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {milliseconds}")
+        connection.exec_driver_sql(f"SET LOCAL lock_timeout = {milliseconds}")
+
+
+def attach_deadline(session_factory):
+    """Applies the request deadline to the transactions of the sessions made by the factory."""
+    event.listen(session_factory, "after_begin", apply_deadline)
+
+
+class DeadlineMiddleware:
+    """
+       ASGI middleware giving the request a deadline: the timeout in seconds of its X-Request-Timeout header, or the
+       REQUEST_ROUTE_TIMEOUTS timeout of its route, REQUEST_TIMEOUT_SECONDS otherwise, whichever is the shortest.
+       Runs inside RequestMetricsMiddleware, which resolves the route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeouts = [REQUEST_ROUTE_TIMEOUTS.get(current_endpoint.get(), REQUEST_TIMEOUT_SECONDS) or None,
+                    parse_timeout(dict(scope["headers"]).get(TIMEOUT_HEADER))]
+        timeouts = [timeout for timeout in timeouts if timeout is not None]
+        if not timeouts:
+            await self.app(scope, receive, send)
+            return
+        token = current_deadline.set(time.monotonic() + min(timeouts))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
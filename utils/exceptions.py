@@ -23,4 +23,16 @@ class MemberExhaustedLimitException(Exception):
     pass
 
 class BookingNotFoundException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class HoldNotFoundException(Exception):
+    pass
+
+class HoldExpiredException(Exception):
+    pass
+
+class WaitlistEntryNotFoundException(Exception):
+    pass
+
+class DeadlineExceededException(Exception):
+    pass
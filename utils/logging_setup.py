@@ -0,0 +1,151 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from configuration.config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_QUEUE_SIZE
+from utils.metrics import current_endpoint
+
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+# Id of the request being served, sent by the client in X-Request-ID or generated
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+# Attributes every LogRecord has, the others were passed in extra= and are added to the JSON records
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the records with the id and the endpoint of the request they were logged for."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get()
+        record.endpoint = current_endpoint.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats the records as single line JSON objects, with the values passed in extra= as fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                 "level": record.levelname, "logger": record.name, "message": record.getMessage()}
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and value is not None:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler dropping the records, and counting them, when the queue is full instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.traceback_formatter = logging.Formatter()
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the message and the traceback are rendered here, the formatter runs on the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = self.traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """The queue handler of the root logger and the listener thread writing its records to stderr."""
+
+    def __init__(self, handler: DroppingQueueHandler, listener: QueueListener):
+        self.handler = handler
+        self.listener = listener
+
+
+_pipeline: Optional[LogPipeline] = None
+_lock = threading.Lock()
+
+
+def configure_logging() -> LogPipeline:
+    """
+        Routes the records of every logger through a bounded queue to a background thread, which formats them,
+        as JSON with LOG_FORMAT=json, and writes them to stderr. The request path only renders the message of
+        the records that pass the level of their logger: LOG_LEVEL, or the level LOG_LEVELS gives to the logger
+        or to one of its parents.
+    """
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            return _pipeline
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s %(endpoint)s] %(message)s"))
+        listener = QueueListener(log_queue, stream_handler)
+
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(RequestContextFilter())
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(LOG_LEVEL)
+        for name, level in LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
+
+        listener.start()
+        atexit.register(listener.stop)
+        _pipeline = LogPipeline(handler, listener)
+        return _pipeline
+
+
+def dropped_records() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _pipeline.handler.dropped if _pipeline is not None else 0
+
+
+class RequestIdMiddleware:
+    """
+       ASGI middleware giving every HTTP request an id for its log records, the X-Request-ID header of the request
+       when it has one, which is returned in the X-Request-ID header of the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"")[:MAX_REQUEST_ID_LENGTH].decode("latin-1")
+        request_id = header or os.urandom(8).hex()
+        token = current_request_id.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            current_request_id.reset(token)
@@ -0,0 +1,201 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from utils.utilities import Singleton
+
+# Upper bounds in seconds, from sub-millisecond waits to the default pool timeout
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Route template of the request being served, "background" outside of requests
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="background")
+
+
+class Histogram:
+    """Thread-safe histogram of durations with fixed buckets, reported with cumulative bucket counts."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.total += value
+            self.count += 1
+
+    def cumulative(self) -> Tuple[List[Tuple[float, int]], float, int]:
+        """Returns the cumulative count of every bucket upper bound, the infinite one last, the sum and the count."""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.total, self.count
+        cumulative, buckets = 0, []
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+        return buckets, total, count
+
+    def snapshot(self) -> Dict:
+        buckets, total, count = self.cumulative()
+        return {"count": count, "sum": round(total, 6),
+                "buckets": {format_bound(bound): bucket_count for bound, bucket_count in buckets}}
+
+
+class RequestStats:
+    """Database work done while serving one request."""
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Shared by reference with the threads serving the request, so their queries are accounted to it as well
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class RequestMetrics(metaclass=Singleton):
+    """
+       Per route measurements of the served requests: latency per status, and the number of queries and the time
+       spent in the database per request. Also the totals of the queries of every engine, requests or not.
+    """
+
+    def __init__(self):
+        self.latency: Dict[Labels, Histogram] = {}
+        self.queries: Dict[Labels, Histogram] = {}
+        self.db_time: Dict[Labels, Histogram] = {}
+        self.engine_queries: Dict[Labels, int] = {}
+        self.engine_time: Dict[Labels, float] = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def histogram(self, family: Dict[Labels, Histogram], labels: Labels,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = family.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(labels, Histogram(buckets))
+        return histogram
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        route_labels = (("method", method), ("route", route))
+        self.histogram(self.latency, route_labels + (("status", str(status)),)).observe(duration)
+        self.histogram(self.queries, route_labels, QUERY_COUNT_BUCKETS).observe(stats.queries)
+        self.histogram(self.db_time, route_labels).observe(stats.db_time)
+
+    def observe_query(self, labels: Labels, duration: float):
+        with self._lock:
+            self.engine_queries[labels] = self.engine_queries.get(labels, 0) + 1
+            self.engine_time[labels] = self.engine_time.get(labels, 0.0) + duration
+
+
+def track_queries(name: str, engine: Engine):
+    """Attributes the number and the duration of the queries run on the engine to the current request."""
+    metrics = RequestMetrics()
+    labels = (("engine", name),)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "metrics_started", None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        metrics.observe_query(labels, duration)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += duration
+
+
+class RequestMetricsMiddleware:
+    """
+       ASGI middleware measuring every HTTP request by method, route template (e.g. "/waitlist/{entry_id}") and
+       status. It sets current_endpoint, so measurements taken while serving the request can be attributed to the
+       endpoint, and current_request, collecting the database work of the request.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+        self.metrics = RequestMetrics()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], self.resolve(scope)
+        stats = RequestStats()
+        status_code = 500
+        endpoint_token = current_endpoint.set(method + " " + route)
+        request_token = current_request.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe_request(method, route, status_code, time.perf_counter() - started, stats)
+            current_request.reset(request_token)
+            current_endpoint.reset(endpoint_token)
+
+    def resolve(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else str(bound)
+
+
+def render_samples(lines: List[str], name: str, kind: str, help_text: str, samples: Iterable[Tuple[Labels, float]]):
+    """Appends a counter or gauge family in the Prometheus text exposition format."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {value}")
+
+
+def render_histograms(lines: List[str], name: str, help_text: str, histograms: Iterable[Tuple[Labels, Histogram]]):
+    """Appends a histogram family in the Prometheus text exposition format."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in histograms:
+        buckets, total, count = histogram.cumulative()
+        for bound, bucket_count in buckets:
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', format_bound(bound)),))} {bucket_count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{name}_count{format_labels(labels)} {count}")
@@ -0,0 +1,164 @@
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from configuration.config import PROFILING_SAMPLE_RATE, PROFILING_ENDPOINTS, PROFILING_MODE, PROFILING_STORE_SIZE, \
+    PROFILING_SAMPLER_INTERVAL_SECONDS
+from utils.metrics import current_endpoint
+from utils.utilities import Singleton
+
+CPROFILE = "cprofile"
+SAMPLER = "sampler"
+MODES = (CPROFILE, SAMPLER)
+
+
+class Profile:
+    """The profile of one request: pstats data for cProfile, collapsed stacks for the sampler."""
+
+    def __init__(self, profile_id: int, endpoint: str, mode: str, duration_ms: float, data: bytes):
+        self.id = profile_id
+        self.endpoint = endpoint
+        self.mode = mode
+        self.duration_ms = duration_ms
+        self.data = data
+        self.created_at = datetime.utcnow()
+
+    @property
+    def media_type(self) -> str:
+        return "application/octet-stream" if self.mode == CPROFILE else "text/plain"
+
+    @property
+    def filename(self) -> str:
+        return f"profile-{self.id}." + ("pstats" if self.mode == CPROFILE else "collapsed.txt")
+
+    def summary(self) -> Dict:
+        return {"id": self.id, "endpoint": self.endpoint, "mode": self.mode, "created_at": self.created_at,
+                "duration_ms": round(self.duration_ms, 3), "size": len(self.data)}
+
+
+class ProfileStore(metaclass=Singleton):
+    """The last PROFILING_STORE_SIZE request profiles."""
+
+    def __init__(self):
+        self.profiles = deque(maxlen=PROFILING_STORE_SIZE)
+        self._ids = itertools.count(1)
+
+    def new_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: Profile):
+        self.profiles.append(profile)
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def list(self) -> List[Dict]:
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+
+class StackSampler:
+    """Samples the stack of one thread at a fixed interval from a background thread, counting collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stopped.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+
+def cprofile_data(profile: cProfile.Profile) -> bytes:
+    """The profile in the format written by pstats.Stats.dump_stats, loadable with pstats or snakeviz."""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    return marshal.dumps(stats.stats)
+
+
+class ProfilingMiddleware:
+    """
+       ASGI middleware profiling selected requests, installed only when profiling is enabled so it costs nothing
+       otherwise. A request is profiled when an admin sends the X-Profile header, whose value picks the mode
+       ("cprofile" or "sampler", PROFILING_MODE when empty), or when it is picked by PROFILING_SAMPLE_RATE among the
+       requests of PROFILING_ENDPOINTS (every endpoint when empty).
+       cProfile sees every coroutine running on the event loop meanwhile, so one request is profiled at a time.
+       The profile id is returned in the X-Profile-Id header and the profile is kept in the ProfileStore.
+    """
+
+    def __init__(self, app, is_admin: Callable[[Optional[str]], bool]):
+        self.app = app
+        self.is_admin = is_admin
+        self.store = ProfileStore()
+        self._active = threading.Lock()
+
+    def select_mode(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile")
+        if requested is not None:
+            authorization = headers.get(b"authorization", b"").decode("latin-1")
+            if self.is_admin(authorization):
+                mode = requested.decode("latin-1").strip().lower()
+                return mode if mode in MODES else PROFILING_MODE
+        if PROFILING_SAMPLE_RATE > 0 and (not PROFILING_ENDPOINTS or current_endpoint.get() in PROFILING_ENDPOINTS) \
+                and random.random() < PROFILING_SAMPLE_RATE:
+            return PROFILING_MODE
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self.select_mode(scope) if scope["type"] == "http" else None
+        if mode is None or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.new_id()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(b"x-profile-id", str(profile_id).encode())]}
+            await send(message)
+
+        profiler = cProfile.Profile() if mode == CPROFILE else \
+            StackSampler(threading.get_ident(), PROFILING_SAMPLER_INTERVAL_SECONDS)
+        started = time.perf_counter()
+        try:
+            if mode == CPROFILE:
+                profiler.enable()
+            else:
+                profiler.start()
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if mode == CPROFILE:
+                profiler.disable()
+                data = cprofile_data(profiler)
+            else:
+                data = profiler.stop()
+            self._active.release()
+            self.store.add(Profile(profile_id, current_endpoint.get(), mode,
+                                   (time.perf_counter() - started) * 1000, data))
@@ -0,0 +1,152 @@
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from configuration.config import SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_SIZE, SLOW_QUERY_EXPLAIN
+from utils.metrics import current_endpoint
+from utils.utilities import Singleton
+
+logger = logging.getLogger(__name__)
+
+SKIP_OPTION = "skip_slow_query_log"
+MAX_PENDING_EXPLAINS = 8
+EXPLAIN_COOLDOWN_SECONDS = 60
+EXPLAIN_TIMEOUT_MS = 5000
+
+LOCKING_CLAUSE = re.compile(r"\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b")
+
+
+def explain_prefix(dialect: str, statement: str) -> Optional[str]:
+    """
+        The EXPLAIN prefix for a slow statement: ANALYZE only for the plain SELECTs on PostgreSQL, as it runs the
+        statement again, which must not happen for writes, locking reads or CTEs (WITH ... DELETE). None when the
+        dialect is not supported.
+    """
+    if dialect == "postgresql":
+        upper = statement.lstrip().upper()
+        analyze = upper.startswith("SELECT") and not LOCKING_CLAUSE.search(upper)
+        return "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    if dialect == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return None
+
+
+def redact(parameters) -> object:
+    """Replaces the parameter values by their type, keeping their names or positions."""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) if isinstance(value, (dict, list, tuple)) else type(value).__name__
+                for value in parameters]
+    return type(parameters).__name__
+
+
+def calling_repository_method() -> Optional[str]:
+    """The innermost repository method on the stack, e.g. "BookingRepo.book_an_item"."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").startswith("repositories."):
+            instance = frame.f_locals.get("self")
+            owner = type(instance).__name__ + "." if instance is not None else ""
+            return owner + frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog(metaclass=Singleton):
+    """
+       Opt-in recorder of the statements slower than SLOW_QUERY_THRESHOLD_MS. Each one is logged with its redacted
+       parameters, the endpoint and the repository method that ran it, and kept in a ring of the last
+       SLOW_QUERY_LOG_SIZE slow statements.
+       The plan of the statement is captured afterwards on another connection by a background thread:
+       EXPLAIN (ANALYZE, BUFFERS) for plain SELECTs and EXPLAIN for the others, which must not be run twice,
+       inside a transaction that is rolled back. A statement is explained at most once a minute.
+    """
+
+    def __init__(self):
+        self.entries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self.explained_at: Dict[str, float] = {}
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._lock = threading.Lock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return SLOW_QUERY_THRESHOLD_MS > 0
+
+    def attach(self, name: str, engine: Engine):
+        """Starts recording the slow statements run on the engine, when enabled."""
+        if not self.is_enabled:
+            return
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context.slow_query_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "slow_query_started", None)
+            if started is None:
+                return
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= SLOW_QUERY_THRESHOLD_MS and not context.execution_options.get(SKIP_OPTION):
+                self.record(name, engine, statement, parameters, duration_ms, executemany)
+
+    def record(self, name: str, engine: Engine, statement: str, parameters, duration_ms: float,
+               executemany: bool):
+        entry = {"recorded_at": datetime.utcnow().isoformat(), "engine": name,
+                 "duration_ms": round(duration_ms, 3), "endpoint": current_endpoint.get(),
+                 "caller": calling_repository_method(), "statement": statement,
+                 "parameters": redact(parameters), "plan": None}
+        logger.warning("Slow query (%s ms) in %s for %s: %s with %s", entry["duration_ms"], entry["caller"],
+                       entry["endpoint"], " ".join(statement.split()), entry["parameters"])
+        self.entries.append(entry)
+        if SLOW_QUERY_EXPLAIN and not executemany and self._should_explain(statement):
+            self.executor.submit(self._explain, engine, entry, statement, parameters)
+
+    def _should_explain(self, statement: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self.pending >= MAX_PENDING_EXPLAINS or \
+                    now - self.explained_at.get(statement, -EXPLAIN_COOLDOWN_SECONDS) < EXPLAIN_COOLDOWN_SECONDS:
+                return False
+            if len(self.explained_at) >= 4 * SLOW_QUERY_LOG_SIZE:
+                self.explained_at.clear()
+            self.explained_at[statement] = now
+            self.pending += 1
+            return True
+
+    def _explain(self, engine: Engine, entry: Dict, statement: str, parameters):
+        try:
+            dialect = engine.dialect.name
+            prefix = explain_prefix(dialect, statement)
+            if prefix is None:
+                return
+            with engine.connect() as connection:
+                connection = connection.execution_options(**{SKIP_OPTION: True})
+                with connection.begin() as transaction:
+                    if dialect == "postgresql":
+                        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                    rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+                    transaction.rollback()
+            entry["plan"] = [row[0] if dialect == "postgresql" else row[-1] for row in rows]
+            logger.info("Plan of the slow query in %s:\n%s", entry["caller"], "\n".join(entry["plan"]))
+        except Exception as ex:
+            entry["plan"] = ["plan not captured: " + str(ex)]
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def recent(self) -> List[Dict]:
+        """The recorded slow statements, the most recent first."""
+        return list(reversed(self.entries))
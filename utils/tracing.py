@@ -0,0 +1,238 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from configuration.config import TRACING_SAMPLE_RATE, TRACING_EXPORT_PATH, TRACING_SERVICE_NAME
+from utils.metrics import current_endpoint
+from utils.utilities import Singleton
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], kind: int = SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self, trace_id: str) -> Dict:
+        span = {"traceId": trace_id, "spanId": self.span_id, "name": self.name, "kind": self.kind,
+                "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns or self.start_ns),
+                "attributes": [otlp_attribute(key, value) for key, value in self.attributes.items()]}
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """The spans of one sampled request, appended by every task and thread serving it."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+    def server_timing(self, total_ms: float) -> str:
+        """Server-Timing header value with the total time of every stage, in the order they started."""
+        stages: Dict[str, float] = {}
+        for span in sorted(self.spans, key=lambda span: span.start_ns):
+            if span.kind == SPAN_KIND_INTERNAL:
+                stages[span.name] = stages.get(span.name, 0.0) + span.duration_ms
+        return ", ".join([f"{name};dur={duration:.3f}" for name, duration in stages.items()] +
+                         [f"total;dur={total_ms:.3f}"])
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _SpanScope:
+    __slots__ = ("trace", "span", "token")
+
+    def __init__(self, trace: Trace, name: str, kind: int, attributes):
+        parent = current_span.get()
+        self.trace = trace
+        self.span = Span(name, parent.span_id if parent else None, kind, attributes)
+
+    def __enter__(self) -> Span:
+        self.token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.span.attributes["error"] = exc_type.__name__
+        current_span.reset(self.token)
+        self.trace.spans.append(self.span)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+
+NOOP_SCOPE = _NoopScope()
+
+
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """Context manager timing a stage of the current request, doing nothing when the request is not sampled."""
+    trace = current_trace.get()
+    if trace is None:
+        return NOOP_SCOPE
+    return _SpanScope(trace, name, kind, attributes)
+
+
+def traced(function):
+    """Decorator timing the calls of a method as spans named after its class and name, e.g. BookingRepo.book_an_item."""
+    name = function.__qualname__
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            trace = current_trace.get()
+            if trace is None:
+                return await function(*args, **kwargs)
+            with _SpanScope(trace, name, SPAN_KIND_INTERNAL, None):
+                return await function(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        trace = current_trace.get()
+        if trace is None:
+            return function(*args, **kwargs)
+        with _SpanScope(trace, name, SPAN_KIND_INTERNAL, None):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: Optional[str]):
+    """
+        Returns the trace id, the parent span id and the sampled flag of a W3C traceparent header, None if it is
+        missing or invalid.
+    """
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+
+
+class TraceExporter(metaclass=Singleton):
+    """
+       Writes the finished traces to TRACING_EXPORT_PATH from a background thread, one OTLP/JSON
+       ExportTraceServiceRequest per line, so they can be replayed to an OTLP collector.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=10000)
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        if not TRACING_EXPORT_PATH:
+            return
+        if self.thread is None:
+            with self._lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+                    self.thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping a trace")
+
+    def _write(self):
+        resource = {"attributes": [otlp_attribute("service.name", TRACING_SERVICE_NAME)]}
+        while True:
+            trace = self.queue.get()
+            request = {"resourceSpans": [{"resource": resource, "scopeSpans": [{
+                "scope": {"name": "tracing"},
+                "spans": [span.to_otlp(trace.trace_id) for span in trace.spans]}]}]}
+            try:
+                with open(TRACING_EXPORT_PATH, "a") as file:
+                    file.write(json.dumps(request) + "\n")
+            except OSError as ex:
+                logger.error("Failed to export a trace due to: %s", ex)
+
+
+class TracingMiddleware:
+    """
+       ASGI middleware tracing TRACING_SAMPLE_RATE of the requests, and those sent with a sampled W3C traceparent
+       header. Sampled responses carry a Server-Timing header with the time spent in every stage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.exporter = TraceExporter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = parse_traceparent(dict(scope["headers"]).get(b"traceparent", b"").decode("latin-1"))
+        sampled = traceparent[2] if traceparent else random.random() < TRACING_SAMPLE_RATE
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(traceparent[0] if traceparent else None)
+        trace_token = current_trace.set(trace)
+        # named after the route template when running inside RequestMetricsMiddleware
+        root = _SpanScope(trace, current_endpoint.get(), SPAN_KIND_SERVER,
+                          {"http.method": scope["method"], "http.target": scope["path"]})
+        if traceparent:
+            root.span.parent_id = traceparent[1]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                root.span.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing(root.span.duration_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            with root:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(trace_token)
+            self.exporter.export(trace)
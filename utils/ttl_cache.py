@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+       Bounded in-process cache with least-recently-used eviction and a per-entry time to live.
+       Meant to be used from the event loop, it is not thread safe.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        """
+               Initializes the cache.
+
+               Args:
+                   max_size (int): Maximum number of entries kept, the least recently used entry is evicted first.
+                   ttl_seconds (float): Number of seconds an entry stays valid after it was stored.
+                   clock (Callable): Monotonic clock, injectable for tests.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+               Returns the cached value, or None if the key is missing or its entry expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+               Stores a value, evicting the least recently used entries above max_size.
+        """
+        self._entries[key] = (value, self.clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def __len__(self):
+        return len(self._entries)
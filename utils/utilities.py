@@ -1,12 +1,23 @@
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
 from io import StringIO
-from typing import Optional
+from typing import Dict, List, Optional
 
 import pandas as pd
 from fastapi import UploadFile
 from pandas.core.interchange.dataframe_protocol import DataFrame
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from utils.exceptions import InvalidFileException
 
+logger = logging.getLogger(__name__)
+
+REJECTED_ROW_SAMPLES = 5
+
 
 class Singleton(type):
     _instances = {}
@@ -16,6 +27,59 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+def new_reference(now: datetime) -> str:
+    """ Builds a booking or hold reference, a UUIDv7 embedding the creation time in milliseconds """
+    milliseconds = (now - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+    value = bytearray(milliseconds.to_bytes(6, "big") + os.urandom(10))
+    value[6] = 0x70 | (value[6] & 0x0F)
+    value[8] = 0x80 | (value[8] & 0x3F)
+    return str(uuid.UUID(bytes=bytes(value)))
+
+
+def reference_time(reference: str) -> Optional[datetime]:
+    """ Returns the creation time embedded in a reference built by new_reference, None for other references """
+    try:
+        value = uuid.UUID(reference)
+    except ValueError:
+        return None
+    if value.version != 7:
+        return None
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int.from_bytes(value.bytes[:6], "big"))
+
+
+def get_dialect_insert(db: Session):
+    """ Returns the dialect specific insert construct (supporting ON CONFLICT) for the session's database """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+def build_etag(table_name: str, version: int, variant: Optional[str] = None) -> str:
+    """ Builds the ETag header value for a listing backed by the given table version, the variant (e.g. the query
+    of the listing) tells apart the listings of one table version """
+    if variant:
+        return f'"{table_name}-{version}-{hashlib.sha1(variant.encode("utf-8")).hexdigest()[:16]}"'
+    return f'"{table_name}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Checks an If-None-Match header value against the current ETag """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
 async def validate_csv_return_dataframe(file: UploadFile,type:str):
         """ Validates and parses CSV data """
         invalid_rows=[]
@@ -45,7 +109,7 @@ async def validate_csv_return_dataframe(file: UploadFile,type:str):
             required_headers = ["title","description","remaining_count","expiration_date"]
 
         if not all(header in df.columns for header in required_headers):
-            print("Not all required headers are present in the DataFrame")
+            logger.warning("Not all required headers are present in the %s file", type)
             raise KeyError("All required headers are not present")
 
         df = df[required_headers]
@@ -67,4 +131,22 @@ async def validate_csv_return_dataframe(file: UploadFile,type:str):
 
         df.dropna(inplace=True)  # Drop empty string rows again
 
-        return df,invalid_rows
\ No newline at end of file
+        return df,invalid_rows
+
+def log_rejected_rows(logger: logging.Logger, what: str, total: int, rejected: Dict[str, List]):
+    """
+        Logs a single line for the rows of an upload rejected for each reason, with the first few of them,
+        instead of one line per rejected row.
+
+        Args:
+            logger (Logger): The logger of the caller.
+            what (str): The kind of rows, e.g. "member rows".
+            total (int): The number of rows of the upload.
+            rejected (dict): The row numbers or descriptions of the rejected rows by reason.
+    """
+    count = sum(len(rows) for rows in rejected.values())
+    if count == 0:
+        return
+    logger.warning("Rejected %d of %d %s: %s", count, total, what,
+                   "; ".join(f"{len(rows)} {reason} (e.g. {rows[:REJECTED_ROW_SAMPLES]})"
+                             for reason, rows in rejected.items() if rows))